@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -------------------------------------------------------------
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+# -------------------------------------------------------------
+
+# Measures the time taken by the matrix API (systemml.defmatrix) to generate the
+# DML script for lazily evaluated DAGs of increasing size. The script is only
+# generated (execute=False), hence this isolates the Python-side overhead.
+#
+# To run:
+#   spark-submit --driver-class-path SystemML.jar matrix_dag_emit.py --sizes 1000 10000 100000
+
+import argparse
+import time
+
+import numpy as np
+from pyspark.context import SparkContext
+import systemml as sml
+
+
+def chain_dag(X, size):
+    """
+    Returns a DAG with 2*size operators of the form m = m*0.5 + X.
+    """
+    m = X
+    for i in range(size):
+        m = m * 0.5 + X
+    return m
+
+
+def time_emission(X, size):
+    m = chain_dag(X, size)
+    start = time.time()
+    script = sml.eval([m], execute=False)
+    return time.time() - start, len(script)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark DML script generation of the matrix API')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                        help='Number of loop iterations used to build the chain DAGs')
+    args = parser.parse_args()
+
+    sc = SparkContext.getOrCreate()
+    X = sml.matrix(np.ones((10, 10)))
+    print('{:>10} {:>12} {:>14} {:>12}'.format('iterations', 'script_len', 'emit_time(s)', 'us/node'))
+    for size in args.sizes:
+        elapsed, script_len = time_emission(X, size)
+        print('{:>10} {:>12} {:>14.3f} {:>12.2f}'.format(size, script_len, elapsed, elapsed * 1e6 / (2 * size)))
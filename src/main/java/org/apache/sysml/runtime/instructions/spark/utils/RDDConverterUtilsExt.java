@@ -51,6 +51,7 @@ import org.apache.sysml.runtime.matrix.MatrixCharacteristics;
 import org.apache.sysml.runtime.matrix.data.MatrixBlock;
 import org.apache.sysml.runtime.matrix.data.MatrixCell;
 import org.apache.sysml.runtime.matrix.data.MatrixIndexes;
+import org.apache.sysml.runtime.matrix.data.SparseBlock;
 import org.apache.sysml.runtime.matrix.mapred.IndexedMatrixValue;
 import org.apache.sysml.runtime.matrix.mapred.ReblockBuffer;
 import org.apache.sysml.runtime.util.FastStringTokenizer;
@@ -247,6 +248,67 @@ public class RDDConverterUtilsExt
 		return ret;
 	}
 
+	/**
+	 * Convert a MatrixBlock into the three buffers of a SciPy CSR matrix without densifying it.
+	 *
+	 * @param mb matrix block (sparse or dense)
+	 * @return values (doubles), column indices (ints) and row pointers (ints) in native byte order
+	 */
+	public static byte [][] convertMBtoPy4JCSRArrs(MatrixBlock mb) {
+		int rlen = mb.getNumRows();
+		int clen = mb.getNumColumns();
+		//recompute nnz since the buffers are sized by it
+		mb.recomputeNonZeros();
+		long nnz = mb.getNonZeros();
+		int dsize = Double.SIZE / Byte.SIZE;
+		int isize = Integer.SIZE / Byte.SIZE;
+		if( nnz > Integer.MAX_VALUE / dsize || rlen >= Integer.MAX_VALUE / isize )
+			throw new DMLRuntimeException("MatrixBlock with " + nnz + " non-zeros cannot be converted to scipy csr_matrix");
+
+		ByteBuffer values = ByteBuffer.wrap(new byte[(int) nnz * dsize]).order(ByteOrder.nativeOrder());
+		ByteBuffer colIndexes = ByteBuffer.wrap(new byte[(int) nnz * isize]).order(ByteOrder.nativeOrder());
+		ByteBuffer rowPointers = ByteBuffer.wrap(new byte[(rlen + 1) * isize]).order(ByteOrder.nativeOrder());
+		int pos = 0;
+		rowPointers.putInt(pos);
+		if( mb.isEmptyBlock(false) ) {
+			for(int i = 0; i < rlen; i++)
+				rowPointers.putInt(pos);
+		}
+		else if( mb.isInSparseFormat() ) {
+			SparseBlock sblock = mb.getSparseBlock();
+			for(int i = 0; i < rlen; i++) {
+				if( !sblock.isEmpty(i) ) {
+					int apos = sblock.pos(i);
+					int alen = sblock.size(i);
+					int[] aix = sblock.indexes(i);
+					double[] avals = sblock.values(i);
+					for(int j = apos; j < apos + alen; j++) {
+						if( avals[j] != 0 ) {
+							values.putDouble(avals[j]);
+							colIndexes.putInt(aix[j]);
+							pos++;
+						}
+					}
+				}
+				rowPointers.putInt(pos);
+			}
+		}
+		else {
+			double[] denseBlock = mb.getDenseBlockValues();
+			for(int i = 0, ix = 0; i < rlen; i++, ix += clen) {
+				for(int j = 0; j < clen; j++) {
+					if( denseBlock[ix + j] != 0 ) {
+						values.putDouble(denseBlock[ix + j]);
+						colIndexes.putInt(j);
+						pos++;
+					}
+				}
+				rowPointers.putInt(pos);
+			}
+		}
+		return new byte[][] { values.array(), colIndexes.array(), rowPointers.array() };
+	}
+
 	public static class AddRowID implements Function<Tuple2<Row,Long>, Row> {
 		private static final long serialVersionUID = -3733816995375745659L;
 
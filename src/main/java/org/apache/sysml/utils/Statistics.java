@@ -611,6 +611,11 @@ public class Statistics
 		return (tmp != null) ? tmp.count.longValue() : 0;
 	}
 
+	public static long getCPHeavyHitterTime(String opcode) {
+		InstStats tmp = _instStats.get(opcode);
+		return (tmp != null) ? tmp.time.longValue() : 0;
+	}
+
 	/**
 	 * Obtain a string tabular representation of the heavy hitter instructions
 	 * that displays the time, instruction count, and optionally GPU stats about
@@ -22,6 +22,7 @@
 from .mlcontext import *
 from .defmatrix import *
 from .converters import *
+from . import linalg
 
 __all__ = mlcontext.__all__
 __all__ += defmatrix.__all__
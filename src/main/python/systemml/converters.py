@@ -19,7 +19,7 @@
 #
 #-------------------------------------------------------------
 
-__all__ = [ 'getNumCols', 'convertToMatrixBlock', 'convert_caffemodel', 'convert_lmdb_to_jpeg', 'convertToNumPyArr', 'convertToPandasDF', 'SUPPORTED_TYPES' , 'convertToLabeledDF', 'convertImageToNumPyArr', 'getDatasetMean']
+__all__ = [ 'getNumCols', 'convertToMatrixBlock', 'convert_caffemodel', 'convert_lmdb_to_jpeg', 'convertToNumPyArr', 'convertToSciPy', 'convertMatrixBlock', 'convertMatrixBlockRows', 'convertToPandasDF', 'SUPPORTED_TYPES' , 'convertToLabeledDF', 'convertImageToNumPyArr', 'getDatasetMean']
 
 import numpy as np
 import pandas as pd
@@ -32,6 +32,9 @@ from .classloader import *
 
 SUPPORTED_TYPES = (np.ndarray, pd.DataFrame, spmatrix)
 
+# Same threshold as MatrixBlock.SPARSITY_TURN_POINT
+SPARSITY_TURN_POINT = 0.4
+
 DATASET_MEAN = {'VGG_ILSVRC_19_2014':[103.939, 116.779, 123.68]}
 
 def getNumCols(numPyArr):
@@ -215,6 +218,60 @@ def convertToNumPyArr(sc, mb):
     else:
         raise TypeError('sc needs to be of type SparkContext') # TODO: We can generalize this by creating py4j gateway ourselves
 
+def convertToSciPy(sc, mb):
+    """
+    Converts the given MatrixBlock into scipy.sparse.csr_matrix without densifying it.
+    The values, column indices and row pointers are transferred as three bulk buffers.
+    """
+    if isinstance(sc, SparkContext):
+        numRows = mb.getNumRows()
+        numCols = mb.getNumColumns()
+        createJavaObject(sc, 'dummy')
+        bufs = sc._jvm.org.apache.sysml.runtime.instructions.spark.utils.RDDConverterUtilsExt.convertMBtoPy4JCSRArrs(mb)
+        data = np.frombuffer(bufs[0], dtype=np.float64)
+        indices = np.frombuffer(bufs[1], dtype=np.int32)
+        indptr = np.frombuffer(bufs[2], dtype=np.int32)
+        return csr_matrix((data, indices, indptr), shape=(numRows, numCols))
+    else:
+        raise TypeError('sc needs to be of type SparkContext')
+
+def _isSparseMatrixBlock(mb):
+    """
+    Returns True if the given MatrixBlock is stored in sparse format or is sparse enough to be returned as scipy sparse matrix.
+    """
+    if mb.isInSparseFormat():
+        return True
+    numCells = float(mb.getNumRows()) * mb.getNumColumns()
+    return numCells > 0 and mb.getNonZeros() < SPARSITY_TURN_POINT * numCells
+
+def convertMatrixBlock(sc, mb, format='auto'):
+    """
+    Converts the given MatrixBlock into NumPy array (format='numpy') or scipy.sparse.csr_matrix (format='scipy').
+    If format='auto', the sparse representation is chosen if the MatrixBlock is in sparse format or has sparsity below 0.4.
+    """
+    if format == 'auto':
+        format = 'scipy' if _isSparseMatrixBlock(mb) else 'numpy'
+    if format == 'numpy':
+        return convertToNumPyArr(sc, mb)
+    elif format == 'scipy':
+        return convertToSciPy(sc, mb)
+    else:
+        raise ValueError('Unsupported format:' + str(format) + '. Expected auto, numpy or scipy')
+
+def convertMatrixBlockRows(sc, mb, numRowsPerBlock, format='auto'):
+    """
+    Returns a generator over the blocks of numRowsPerBlock consecutive rows of the given MatrixBlock (the last block may be smaller),
+    converted into NumPy arrays or scipy.sparse.csr_matrix (see convertMatrixBlock). If format='auto', the format is chosen once for all the blocks.
+    Only one block at a time is copied out of the MatrixBlock and transferred via Py4J.
+    """
+    if format == 'auto':
+        format = 'scipy' if _isSparseMatrixBlock(mb) else 'numpy'
+    numRows = mb.getNumRows()
+    for rl in range(0, numRows, numRowsPerBlock):
+        ru = min(rl + numRowsPerBlock, numRows)
+        # The row bounds of slice are 0-based and inclusive
+        yield convertMatrixBlock(sc, mb.slice(rl, ru - 1), format)
+
 # Returns the mean of a model if defined otherwise None
 def getDatasetMean(dataset_name):
     """
@@ -19,11 +19,23 @@
 #
 #-------------------------------------------------------------
 
-__all__ = [ 'setSparkContext', 'matrix', 'eval', 'solve', 'DMLOp', 'set_lazy', 'debug_array_conversion', 'load', 'full', 'seq' ]
+__all__ = [ 'setSparkContext', 'matrix', 'eval', 'eval_async', 'solve', 'DMLOp', 'EvaluationContext', 'set_lazy', 'set_eval_policy', 'set_plan_cache', 'set_intermediate_cache', 'set_input_cache', 'set_simplifier', 'set_nested_expressions', 'scalar', 'for_loop', 'while_loop', 'function', 'profile', 'debug_array_conversion', 'load', 'full', 'seq' ]
 
+import math
+import os
 import numpy as np
 import pandas as pd
-from scipy.sparse import coo_matrix, spmatrix
+import re
+import sys
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+from scipy.sparse import coo_matrix, csr_matrix, spmatrix
 try:
     import py4j.java_gateway
     from py4j.java_gateway import JavaObject
@@ -35,6 +47,8 @@ except ImportError:
 
 from . import MLContext, pydml, _java2py, Matrix
 from .converters import *
+from .converters import SPARSITY_TURN_POINT
+from .classloader import createJavaObject
 
 def setSparkContext(sc):
     """
@@ -68,15 +82,70 @@ class DMLOp(object):
         self.dml = dml
         self.ID = None
         self.depth = 1
+        # True if this op only renames its single input (see _alias)
+        self.is_alias = False
+        # Expression computed by this op as tuple (name, args, params) or None if unknown (see _construct_expr_node)
+        self.expr = None
+        # False if this op only has side-effects (for example: save), i.e. does not assign its output
+        self.has_output = True
+        # Estimated number of operations, length of the script and memory of the unevaluated lineage (see set_eval_policy).
+        # Shared nodes are counted once per path, hence these are upper bounds.
+        self.num_nodes = 1
+        self.script_size = 0
+        self.mem_size = 0
+        # Estimated size of the output in bytes (see _estimated_bytes)
+        self.out_bytes = 0
+        # Python source location that created this op (only recorded while profiling, see profile)
+        self.location = _source_location() if len(_get_context().profilers) > 0 else None
         for m in self.inputs:
-            m.referenced = m.referenced + [ self ]
+            m._add_consumer(self)
             if isinstance(m, matrix) and m.op is not None:
                 self.depth = max(self.depth, m.op.depth + 1)
+                if m._eval_data is None:
+                    self.num_nodes = min(self.num_nodes + m.op.num_nodes, sys.maxsize)
+                    self.script_size = min(self.script_size + m.op.script_size, sys.maxsize)
+                    self.mem_size = min(self.mem_size + m.op.mem_size, sys.maxsize)
 
     MAX_DEPTH = 0
-    
+
+    # DML functions called by this op (see function)
+    functions = ()
+
+    # Thresholds of the evaluation policy (see set_eval_policy). None disables the corresponding threshold.
+    MAX_NODES = None
+    MAX_SCRIPT_SIZE = None
+    MAX_MEMORY = None
+
+    def _prepare(self):
+        """
+        Called before the inputs of this op are traversed.
+        """
+        pass
+
     def _visit(self, execute=True):
-        matrix.dml = matrix.dml + self.dml
+        ctx = _get_context()
+        for f in self.functions:
+            f._register(ctx)
+        if self.expr is not None and len(ctx.inlined) > 0:
+            ctx.dml.extend([ self.dml[0], ' = ', self._expression(ctx)[0], '\n' ])
+        else:
+            ctx.dml.extend(self.dml)
+
+    def _expression(self, ctx):
+        """
+        Returns the DML expression computed by this op (with the nested expressions of its inlined inputs) and its nesting depth.
+        """
+        name, args, params = self.expr
+        argStrs = []
+        depth = 1
+        for x in args:
+            if isinstance(x, matrix) and x.ID in ctx.inlined:
+                argStr, argDepth = ctx.inlined.pop(x.ID)
+                argStrs.append(argStr)
+                depth = max(depth, argDepth + 1)
+            else:
+                argStrs.append(getValue(x))
+        return ''.join(_expr_dml(name, argStrs, params)), depth
 
     def _print_ast(self, numSpaces):
         ret = []
@@ -100,20 +169,91 @@ def set_lazy(isLazy):
         DMLOp.MAX_DEPTH = 0
     else:
         DMLOp.MAX_DEPTH = 1
-    
-def construct_intermediate_node(inputs, dml):
+
+def set_eval_policy(max_nodes=None, max_script_size=None, max_memory=None):
+    """
+    This method allows users to evaluate the pending operations in chunks, i.e. in between the fully lazy and the eager mode (see set_lazy).
+    Whenever the unevaluated lineage of a newly created matrix exceeds one of the given thresholds, the matrix is evaluated
+    and the subsequent operations use its result instead of recomputing the lineage.
+    The operations inside each chunk are still compiled together and hence can be fused by SystemML.
+
+    Parameters
+    ----------
+    max_nodes: maximum number of pending operations (None to disable).
+    max_script_size: maximum estimated length (in characters) of the pending script (None to disable).
+    max_memory: maximum estimated memory (in bytes) of the pending intermediate matrices (None to disable).
+    """
+    DMLOp.MAX_NODES = max_nodes
+    DMLOp.MAX_SCRIPT_SIZE = max_script_size
+    DMLOp.MAX_MEMORY = max_memory
+
+def _should_eval(op):
+    """
+    Returns True if the evaluation policy (see set_lazy and set_eval_policy) requires the output of the given op to be evaluated.
+    The operations created while tracing the body of a loop (see for_loop) are never evaluated.
+    """
+    ret = (DMLOp.MAX_DEPTH > 0 and op.depth >= DMLOp.MAX_DEPTH) or \
+        (DMLOp.MAX_NODES is not None and op.num_nodes > DMLOp.MAX_NODES) or \
+        (DMLOp.MAX_SCRIPT_SIZE is not None and op.script_size > DMLOp.MAX_SCRIPT_SIZE) or \
+        (DMLOp.MAX_MEMORY is not None and op.mem_size > DMLOp.MAX_MEMORY)
+    return ret and _get_context().tracing == 0
+
+def _cse_key(inputs, dml):
+    """
+    Returns the key used to detect common subexpressions, i.e. the DML template (with scalar arguments) and the IDs of the inputs.
+    Statements that do not assign the output (for example: save) have side-effects and are never shared.
+    """
+    if OUTPUT_ID not in dml:
+        return None
+    return (tuple(dml), tuple(m.ID for m in inputs))
+
+def _alias(node):
+    """
+    Returns a new matrix object that shares the computation of the given node.
+
+    A new object is required (instead of returning node itself) as left indexing mutates the matrix object in-place.
+    """
+    dmlOp = DMLOp([node])
+    dmlOp.is_alias = True
+    out = type(node)(None, op=dmlOp)
+    dmlOp.dml = [out.ID, ' = ', node.ID, '\n']
+    out._shape, out._sparsity = node._shape, node._sparsity
+    return out
+
+def construct_intermediate_node(inputs, dml, shape=None, sparsity=None, expr=None, is_scalar=False, cse=True):
     """
     Convenient utility to create an intermediate node of AST.
+    If an identical node (same DML template and inputs) was created before and is still alive, its computation is reused (unless cse is False).
 
     Parameters
     ----------
     inputs = list of input matrix objects and/or DMLOp
     dml = list of DML string (which will be eventually joined before execution). To specify out.ID, please use the placeholder
+    shape = statically inferred shape of the output (None if unknown)
+    sparsity = estimated fraction of non-zeros of the output (None if unknown)
+    expr = expression computed by the dml (see _construct_expr_node)
+    is_scalar = True if the dml computes a DML scalar (see scalar class)
+    cse = False if the dml computes a different result every time it is executed (for example: random numbers without seed)
     """
+    key = _cse_key(inputs, dml) if cse else None
+    if key is not None:
+        node = _get_context().cse_nodes.get(key)
+        if node is not None:
+            return _alias(node)
     dmlOp = DMLOp(inputs)
-    out = matrix(None, op=dmlOp)
+    out = (scalar if is_scalar else matrix)(None, op=dmlOp)
     dmlOp.dml = [out.ID if x==OUTPUT_ID else x for x in dml]
-    if DMLOp.MAX_DEPTH > 0 and out.op.depth >= DMLOp.MAX_DEPTH:
+    dmlOp.expr = expr
+    dmlOp.has_output = OUTPUT_ID in dml
+    out._shape, out._sparsity = shape, sparsity
+    dmlOp.out_bytes = out._estimated_bytes()
+    dmlOp.script_size = min(dmlOp.script_size + sum(len(x) for x in dmlOp.dml), sys.maxsize)
+    dmlOp.mem_size = min(dmlOp.mem_size + dmlOp.out_bytes, sys.maxsize)
+    if key is not None:
+        out._cse_key = key
+        _get_context().cse_nodes[key] = out
+    # Statements with side-effects (for example: save) are evaluated by their creators
+    if dmlOp.has_output and _should_eval(dmlOp):
         out.eval()
     return out
 
@@ -137,27 +277,388 @@ def full(shape, fill_value):
     shape: tuple of length 2
     fill_value: float or int
     """
-    return construct_intermediate_node([], [OUTPUT_ID, ' = full(', str(fill_value), ', rows=', str(shape[0]), ', cols=', str(shape[1]), ')\n'])    
+    sparsity = 0.0 if fill_value == 0 else 1.0
+    return _construct_expr_node('full', [], (fill_value, shape), _static_shape(shape), sparsity)
+
+class EvaluationContext(object):
+    """
+    Holds the state required to generate and execute the PyDML script of the lazily evaluated matrices:
+    the statements collected while visiting the AST, the visited nodes, MLContext and its script as well as
+    the generator of the variable IDs.
+
+    Every thread uses its own default context. Hence, independent matrices can be constructed and evaluated
+    concurrently (for example: by a thread pool sharing the SparkContext). A context can also be activated
+    explicitly for the current thread via the with statement:
+
+    >>> with sml.EvaluationContext():
+    ...     m1 = sml.matrix(np.ones((3,3)))
+    ...     m2 = (m1 + 1).toNumPy()
+
+    Common subexpressions are only shared within a context, i.e. identical operations constructed by different
+    threads on a shared input are computed by distinct nodes.
+
+    Note: the matrix objects themselves are not thread-safe, i.e. a matrix should not be left-indexed by one thread
+    while another thread evaluates it.
+    """
+    # Number of contexts created so far (used to generate unique variable IDs)
+    _count = 0
+    _lock = threading.Lock()
+    # Stack of the contexts activated via with statement (and the default context) of the current thread
+    _local = threading.local()
+
+    def __init__(self):
+        with EvaluationContext._lock:
+            EvaluationContext._count += 1
+            count = EvaluationContext._count
+        # The variable IDs of the first context are mVar<N>, the ones of other contexts are mVar<K>_<N>
+        self.prefix = 'mVar' if count == 1 else 'mVar' + str(count) + '_'
+        self.systemmlVarID = 0
+        # Since joining of string is expensive operation, we collect the set of strings into list and then join
+        # them before execution: See _get_script_string() called in eval() method
+        self.dml = []
+        # Statements that load the inputs of the script (one string per input)
+        self.input_dml = []
+        # Contains list of nodes visited in Abstract Syntax Tree. This helps to avoid computation of matrix objects
+        # that have been previously evaluated.
+        self.visited = []
+        self.visited_ids = set()
+        # Maps the key returned by _cse_key to the live matrix object computing it (common subexpression elimination).
+        # Every context has its own table, as the evaluation rewrites the shared nodes in-place (see _simplify and _drop_lineage).
+        self.cse_nodes = weakref.WeakValueDictionary()
+        # IDs of the matrix objects to be computed by the current evaluation
+        self.outputs = set()
+        # IDs of the matrix objects emitted as nested expressions (see set_nested_expressions) and
+        # the expressions emitted so far that are not yet used by their consumer (keyed by matrix ID)
+        self.inline_ids = set()
+        self.inlined = {}
+        # Number of loop bodies and functions being traced (see for_loop and function)
+        self.tracing = 0
+        # Definitions of the DML functions called by the script and their names (see function)
+        self.functions = []
+        self.function_names = set()
+        # Active profilers (see profile) and the statements emitted per node by the current evaluation as tuples
+        # (matrix, 'input' or 'dml', start index, end index) into input_dml or dml (None if not profiling)
+        self.profilers = []
+        self.emitted = None
+        # Represents MLContext and its script object
+        self.ml = None
+        self.script = None
+
+    def __enter__(self):
+        _get_context_stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _get_context_stack().pop()
+        return False
+
+def _get_context_stack():
+    local = EvaluationContext._local
+    if not hasattr(local, 'stack'):
+        local.stack = [ EvaluationContext() ]
+    return local.stack
+
+def _get_context():
+    """
+    Returns the active evaluation context of the current thread.
+    """
+    return _get_context_stack()[-1]
 
 def reset():
     """
     Resets the visited status of matrix and the operators in the generated AST.
     """
-    for m in matrix.visited:
-        m.visited = False
-    matrix.visited = []
-    matrix.ml = MLContext(matrix.sc)
-    matrix.dml = []
-    matrix.script = pydml('')
+    _release_collected()
+    ctx = _get_context()
+    ctx.visited = []
+    ctx.visited_ids = set()
+    ctx.inline_ids = set()
+    ctx.inlined = {}
+    ctx.ml = MLContext(matrix.sc)
+    ctx.dml = []
+    ctx.input_dml = []
+    ctx.functions = []
+    ctx.function_names = set()
+    ctx.emitted = [] if len(ctx.profilers) > 0 else None
+    ctx.script = pydml('')
+
+def _get_script_string():
+    """
+    Joins the statements collected while visiting the AST. The statements that load the inputs and the definitions of the functions are prepended.
+    """
+    ctx = _get_context()
+    return ''.join(ctx.input_dml[::-1] + ctx.functions + ctx.dml)
 
 def perform_dfs(outputs, execute):
     """
     Traverses the forest of nodes rooted at outputs nodes and returns the DML script to execute
     """
+    ctx = _get_context()
+    if matrix.simplify:
+        _simplify(outputs)
+    if matrix.max_nesting_depth > 1:
+        ctx.inline_ids = _find_inlinable(outputs)
     for m in outputs:
-        m.output = True
+        ctx.outputs.add(id(m))
         m._visit(execute=execute)
-    return ''.join(matrix.dml)
+    return _get_script_string()
+
+def _is_int(x):
+    return isinstance(x, (int, np.integer)) and not isinstance(x, bool)
+
+def _is_full_slice(s):
+    return s is None or (isinstance(s, slice) and s.start is None and s.stop is None and s.step is None)
+
+class _ScatterOp(DMLOp):
+    """
+    Represents the left indexing operations applied to a copy of its first input (see matrix.__setitem__).
+
+    Consecutive assignments are buffered in this op as long as its output is not used by other operations.
+    The assignments of scalars to cells are emitted as a single scatter via table() and ifelse(), and
+    the assignments to full rows are emitted as one assignment of a row block per contiguous range of rows.
+    """
+    def __init__(self, outID, base):
+        DMLOp.__init__(self, [base])
+        self.outID = outID
+        self.baseID = base.ID
+        self.numCols = _shape_of(base)[1] if _shape_of(base) is not None else None
+        # List of groups of consecutive assignments of the same kind ('cells', 'rows' or 'stmt') in the order of the assignments
+        self.groups = []
+        # Inputs created for the buffered assignments by the last _prepare
+        self.generated = []
+        self.dml = None
+
+    def _group(self, kind):
+        if len(self.groups) == 0 or self.groups[-1][0] != kind:
+            self.groups.append((kind, OrderedDict() if kind != 'stmt' else []))
+        return self.groups[-1][1]
+
+    def add(self, index, value):
+        """
+        Buffers the assignment m[index] = value.
+        """
+        self.dml = None
+        if isinstance(index, tuple) and len(index) == 2 and _is_int(index[0]) and _is_int(index[1]) and isinstance(value, (int, float, np.number)):
+            # The last assignment to a cell wins
+            self._group('cells')[(int(index[0]), int(index[1]))] = float(value)
+            return
+        if isinstance(index, tuple) and len(index) in (1, 2) and _is_int(index[0]) and (len(index) == 1 or _is_full_slice(index[1])) and \
+            self.numCols is not None and isinstance(value, (int, float, np.number, np.ndarray, list)) and np.size(value) in (1, self.numCols):
+            self._group('rows')[int(index[0])] = np.array(value, dtype=np.double).reshape(1, -1) * np.ones((1, self.numCols))
+            return
+        value = _as_matrix(value)
+        for x in _index_operands(index) + ([ value ] if isinstance(value, matrix) else []):
+            self.inputs = self.inputs + [ x ]
+            x._add_consumer(self)
+        self._group('stmt').extend([ self.outID ] + getIndexingDML(index) + [ ' = ',  getValue(value), '\n' ])
+
+    def _rename(self, outID):
+        """
+        Renames the output of the buffered assignments (see _construct_loop).
+        """
+        for kind, content in self.groups:
+            if kind == 'stmt':
+                content[:] = [ outID if x == self.outID else x for x in content ]
+        self.outID = outID
+        self.dml = None
+
+    def _prepare(self):
+        """
+        Generates the DML for the buffered assignments.
+        """
+        if self.dml is not None:
+            return
+        generated = []
+        # The base is updated in-place if it is the state variable of a loop (see _construct_loop)
+        dml = [ self.outID, ' = ', self.baseID, '\n' ] if self.outID != self.baseID else []
+        dims = [ 'nrow(', self.outID, '), ncol(', self.outID, ')' ]
+        for kind, content in self.groups:
+            if kind == 'cells':
+                # Each row of the updates contains the (0-based) row index, column index and value
+                updates = matrix(np.array([ [ key[0], key[1], val ] for key, val in content.items() ], dtype=np.double))
+                generated.append(updates)
+                rows = [ updates.ID, '[,0] + 1, ', updates.ID, '[,1] + 1, ' ]
+                dml = dml + [ self.outID, ' = ifelse(table(' ] + rows + [ '1, ' ] + dims + [ '), table(' ] + rows + [ updates.ID, '[,2], ' ] + dims + [ '), ', self.outID, ')\n' ]
+            elif kind == 'rows':
+                indexes = sorted(content.keys())
+                start = 0
+                for i in range(1, len(indexes) + 1):
+                    if i == len(indexes) or indexes[i] != indexes[i-1] + 1:
+                        block = matrix(np.vstack([ content[r] for r in indexes[start:i] ]))
+                        generated.append(block)
+                        dml = dml + [ self.outID, '[', str(indexes[start]), ':', str(indexes[i-1] + 1), ',] = ', block.ID, '\n' ]
+                        start = i
+            else:
+                dml = dml + content
+        previous = set([ id(m) for m in self.generated ])
+        self.inputs = [ m for m in self.inputs if id(m) not in previous ] + generated
+        for m in generated:
+            m._add_consumer(self)
+        self.generated = generated
+        self.dml = dml
+
+###############################################################################
+
+
+########################## Shape inference ####################################
+
+# Non-zeros of the dense matrices are not counted, i.e. they are estimated as fully dense (worst case).
+# Functions f with f(0) = 0, that hence preserve the sparsity of their input
+_ZERO_PRESERVING_FUNCTIONS = set(['abs', 'sqrt', 'round', 'floor', 'ceil', 'ceiling', 'sin', 'tan', 'sinh', 'tanh', 'asin', 'atan', 'sign'])
+
+def _static_shape(shape):
+    """
+    Returns the given shape as tuple of two integers or None if the shape is not statically known.
+    """
+    if shape is None or len(shape) != 2 or not all(isinstance(x, (int, np.integer)) for x in shape):
+        return None
+    return (int(shape[0]), int(shape[1]))
+
+def _shape_of(x):
+    return _static_shape(x._shape) if isinstance(x, matrix) else None
+
+def _sparsity_of(x):
+    return x._sparsity if isinstance(x, matrix) else None
+
+def _broadcast_shape(lhs, rhs):
+    """
+    Returns the shape of the output of an element-wise operation (with broadcasting of vectors and scalars).
+    """
+    if not isinstance(lhs, matrix):
+        return _shape_of(rhs)
+    if not isinstance(rhs, matrix):
+        return _shape_of(lhs)
+    s1, s2 = _shape_of(lhs), _shape_of(rhs)
+    if s1 is None or s2 is None:
+        return None
+    if any(a != b and a != 1 and b != 1 for a, b in zip(s1, s2)):
+        raise ValueError('operands could not be broadcast together with shapes ' + str(s1) + ' ' + str(s2))
+    return tuple(a if b == 1 else b for a, b in zip(s1, s2))
+
+def _binary_op_sparsity(lhs, rhs, opStr):
+    """
+    Returns the estimated sparsity of the output of an element-wise operation (None if unknown).
+    """
+    op = opStr.strip()
+    sp1, sp2 = _sparsity_of(lhs), _sparsity_of(rhs)
+    if op in ('*', '&'):
+        if not isinstance(lhs, matrix):
+            return sp2
+        if not isinstance(rhs, matrix):
+            return sp1
+        return None if sp1 is None or sp2 is None else min(sp1, sp2)
+    elif op in ('+', '-', '|') and isinstance(lhs, matrix) and isinstance(rhs, matrix):
+        return None if sp1 is None or sp2 is None else min(1.0, sp1 + sp2)
+    elif op == '/' and not isinstance(rhs, matrix):
+        return sp1
+    return None
+
+def _matmul_shape(lhs, rhs):
+    s1, s2 = _shape_of(lhs), _shape_of(rhs)
+    if s1 is None or s2 is None:
+        return None, None
+    if s1[1] != s2[0]:
+        raise ValueError('shapes ' + str(s1) + ' and ' + str(s2) + ' not aligned: ' + str(s1[1]) + ' (dim 1) != ' + str(s2[0]) + ' (dim 0)')
+    sp1, sp2 = _sparsity_of(lhs), _sparsity_of(rhs)
+    # Average-case estimate assuming uniformly distributed non-zeros
+    sparsity = None if sp1 is None or sp2 is None else 1.0 - math.pow(1.0 - sp1*sp2, s1[1])
+    return (s1[0], s2[1]), sparsity
+
+def _bind_shape(lhs, rhs, axis):
+    """
+    Returns the shape and sparsity of the output of cbind (axis=1) or rbind (axis=0).
+    """
+    s1, s2 = _shape_of(lhs), _shape_of(rhs)
+    if s1 is None or s2 is None:
+        return None, None
+    if s1[1-axis] != s2[1-axis]:
+        raise ValueError('all the input array dimensions except for the concatenation axis must match exactly, but got ' + str(s1) + ' and ' + str(s2))
+    shape = (s1[0] + s2[0], s1[1]) if axis == 0 else (s1[0], s1[1] + s2[1])
+    sp1, sp2 = _sparsity_of(lhs), _sparsity_of(rhs)
+    if sp1 is None or sp2 is None or shape[0]*shape[1] == 0:
+        return shape, None
+    return shape, (sp1*s1[0]*s1[1] + sp2*s2[0]*s2[1]) / (shape[0]*shape[1])
+
+def _binary_function_shape(X, Y, fnName):
+    """
+    Returns the shape and sparsity of the output of binaryMatrixFunction
+    """
+    if fnName == 'dot':
+        return _matmul_shape(X, Y)
+    elif fnName == 'cbind':
+        return _bind_shape(X, Y, 1)
+    elif fnName == 'rbind':
+        return _bind_shape(X, Y, 0)
+    elif fnName == 'solve':
+        s1, s2 = _shape_of(X), _shape_of(Y)
+        if s1 is None or s2 is None:
+            return None, None
+        if s1[0] != s2[0]:
+            raise ValueError('solve expects A and b with the same number of rows, but got ' + str(s1) + ' and ' + str(s2))
+        return (s1[1], s2[1]), None
+    return _broadcast_shape(X, Y), None
+
+# Aggregations that return a DML scalar if no axis is specified (see scalar class)
+_SCALAR_AGGREGATES = ('sum', 'mean', 'var', 'sd', 'prod', 'trace', 'max', 'min')
+
+def _aggregate_shape(X, fnName, axis):
+    """
+    Returns the shape and sparsity of the output of _aggFn
+    """
+    shape = _shape_of(X)
+    if shape is None:
+        return None, None
+    if fnName == 'transpose':
+        return (shape[1], shape[0]), X._sparsity
+    elif fnName == 'cumsum':
+        return shape, None
+    elif axis is None:
+        return (1, 1), None
+    elif axis == 0:
+        return (1, shape[1]), None
+    elif axis == 1:
+        return (shape[0], 1), None
+    raise ValueError('axis should be either 0 or 1, but got ' + str(axis))
+
+def _index_shape(index, shape):
+    """
+    Returns the shape of the output of right indexing (see getIndexingDML) or None if unknown.
+    """
+    shape = _static_shape(shape)
+    if shape is None or not isinstance(index, tuple):
+        return None
+    index = index + (None,)*(2 - len(index))
+    ret = []
+    for axis, (s, n) in enumerate(zip(index, shape)):
+        if s is None:
+            ret.append(n)
+        elif isinstance(s, slice):
+            start = 0 if s.start is None else s.start
+            stop = n if s.stop is None else s.stop
+            if not isinstance(start, (int, np.integer)) or not isinstance(stop, (int, np.integer)):
+                return None
+            if start < 0 or stop > n or start >= stop:
+                raise IndexError('slice ' + str(start) + ':' + str(stop) + ' is out of bounds for axis ' + str(axis) + ' with size ' + str(n))
+            ret.append(int(stop - start))
+        elif isinstance(s, (int, np.integer)):
+            if s < 0 or s >= n:
+                raise IndexError('index ' + str(s) + ' is out of bounds for axis ' + str(axis) + ' with size ' + str(n))
+            ret.append(1)
+        elif isinstance(s, scalar):
+            ret.append(1)
+        else:
+            return None
+    return tuple(ret)
+
+def _seq_shape(start, stop, step):
+    if not all(isinstance(x, (int, float, np.number)) for x in [start, stop, step]):
+        return None
+    if step == 0:
+        raise ValueError('step of seq cannot be 0')
+    numRows = int(math.floor((stop - start) / float(step))) + 1
+    if numRows <= 0:
+        raise ValueError('Wrong sign for the step of seq(' + str(start) + ',' + str(stop) + ',' + str(step) + ')')
+    return (numRows, 1)
 
 ###############################################################################
 
@@ -177,39 +678,166 @@ def _matricize(lhs, inputs):
     if isinstance(lhs, SUPPORTED_TYPES):
         lhs = matrix(lhs)
     if isinstance(lhs, matrix):
+        lhs = lhs._resolve_alias()
         lhsStr = lhs.ID
         inputs = inputs + [lhs]
-    elif isinstance(lhs, float) or isinstance(lhs, int):
+    elif isinstance(lhs, float):
+        lhsStr = _double_literal(lhs)
+    elif isinstance(lhs, int):
         lhsStr = str(lhs)
     else:
         raise TypeError('Incorrect type')
     return lhsStr, inputs
     
+def _as_matrix(x):
+    """
+    Converts the supported types to matrix class (other types are returned as it is)
+    """
+    return matrix(x) if isinstance(x, SUPPORTED_TYPES) else x
+
+def _to_numpy(x):
+    """
+    Converts the matrices in x (possibly nested in lists, tuples or dicts) into NumPy arrays. Used by the NumPy protocols
+    for unsupported functions, hence the conversion is reported as per debug_array_conversion.
+    """
+    if isinstance(x, matrix):
+        return x.__array__()
+    elif isinstance(x, (list, tuple)):
+        return type(x)(_to_numpy(y) for y in x)
+    elif isinstance(x, dict):
+        return dict((k, _to_numpy(v)) for k, v in x.items())
+    return x
+
+def _from_numpy_scalar(x):
+    """
+    Converts NumPy scalars (for example: np.int64) into the corresponding Python scalars
+    """
+    return x.item() if isinstance(x, np.generic) else x
+
+def _matrix_axis(axis):
+    """
+    Converts the axis argument of NumPy functions into the axis of 2-dimensional matrix (None, 0 or 1)
+    """
+    if isinstance(axis, tuple):
+        if len(axis) == 1:
+            axis = axis[0]
+        elif sorted(a % 2 for a in axis) == [0, 1]:
+            return None
+    if axis is None:
+        return None
+    if axis not in (-2, -1, 0, 1):
+        raise ValueError('axis ' + str(axis) + ' is out of bounds for matrix of dimension 2')
+    return axis % 2
+
+def _is_default(value):
+    return value is None or value is getattr(np, '_NoValue', None)
+
+def _np_dot(a, b, out=None):
+    if out is not None:
+        return NotImplemented
+    return binaryMatrixFunction(a, b, 'dot')
+
+def _np_stack(fnName):
+    def fn(tup, **kwargs):
+        if not all(_is_default(v) for v in kwargs.values()):
+            return NotImplemented
+        ret = _as_matrix(tup[0])
+        for x in tup[1:]:
+            ret = binaryMatrixFunction(ret, x, fnName)
+        return ret
+    return fn
+
+def _np_aggregate(fnName):
+    def fn(a, axis=None, dtype=None, out=None, keepdims=None, **kwargs):
+        # keepdims is ignored as matrix is always 2-dimensional
+        if dtype is not None or out is not None or not all(_is_default(v) for v in kwargs.values()):
+            return NotImplemented
+        return _as_matrix(a)._aggFn(fnName, _matrix_axis(axis))
+    return fn
+
+def _np_transpose(a, axes=None):
+    if axes is not None and tuple(axes) == (0, 1):
+        return _as_matrix(a)
+    elif axes is not None and tuple(axes) != (1, 0):
+        raise ValueError('axes do not match matrix of dimension 2')
+    return _as_matrix(a).transpose()
+
+# NumPy functions that are evaluated by SystemML via __array_function__
+_NUMPY_FUNCTIONS = {np.dot: _np_dot, np.hstack: _np_stack('cbind'), np.vstack: _np_stack('rbind'),
+                    np.sum: _np_aggregate('sum'), np.mean: _np_aggregate('mean'), np.transpose: _np_transpose}
+
+# Reductions of NumPy's ufuncs (for example: np.add.reduce) supported by __array_ufunc__
+_NUMPY_REDUCTIONS = {np.add: 'sum', np.multiply: 'prod', np.maximum: 'max', np.minimum: 'min'}
+
+def _expr_dml(name, argStrs, params):
+    """
+    Returns the list of DML strings of the expression (see _construct_expr_node) given the DML strings of its arguments.
+    """
+    if name == 'index':
+        return [ argStrs[0] ] + getIndexingDML(params)
+    elif name == 'full':
+        return [ 'full(', str(params[0]), ', rows=', str(params[1][0]), ', cols=', str(params[1][1]), ')' ]
+    elif name == '-' and len(argStrs) == 1:
+        return [ '-', argStrs[0] ]
+    elif name.startswith(' '):
+        # Binary operator such as ' + '
+        return [ argStrs[0], name, argStrs[1] ]
+    ret = [ name, '(', argStrs[0] ]
+    for argStr in argStrs[1:]:
+        ret = ret + [ ', ', argStr ]
+    if params is not None:
+        ret = ret + [ ', axis=', str(params) ]
+    return ret + [ ')' ]
+
+def _construct_expr_node(name, args, params=None, shape=None, sparsity=None, is_scalar=False):
+    """
+    Creates an intermediate node that computes the given expression and records the expression in its op,
+    which allows the rewrites (see set_simplifier) to inspect and modify the DAG before the script is generated.
+
+    Parameters
+    ----------
+    name = binary operator with surrounding spaces (for example: ' + '), '-' (negation), 'index' (params: index), 'full' (params: (fill_value, shape))
+           or the name of the built-in function (params: axis or None)
+    args = list of matrices and/or scalars
+    """
+    inputs = []
+    argStrs = []
+    resolved = []
+    for arg in args:
+        argStr, inputs = _matricize(arg, inputs)
+        argStrs.append(argStr)
+        resolved.append(inputs[-1] if isinstance(arg, (matrix,) + SUPPORTED_TYPES) else arg)
+    dml = [ OUTPUT_ID, ' = ' ] + _expr_dml(name, argStrs, params) + [ '\n' ]
+    return construct_intermediate_node(inputs, dml, shape, sparsity, (name, tuple(resolved), params), is_scalar)
+
+def _is_scalar_valued(x):
+    """
+    Returns True if the given operand is a Python number or a lazily evaluated scalar (see scalar class).
+    """
+    return isinstance(x, scalar) or _is_scalar(x)
+
 def binary_op(lhs, rhs, opStr):
     """
     Common function called by all the binary operators in matrix class
     """
-    inputs = []
-    lhsStr, inputs = _matricize(lhs, inputs)
-    rhsStr, inputs = _matricize(rhs, inputs)
-    return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, opStr, rhsStr, '\n'])
+    lhs, rhs = _as_matrix(lhs), _as_matrix(rhs)
+    isScalar = _is_scalar_valued(lhs) and _is_scalar_valued(rhs)
+    return _construct_expr_node(opStr, [lhs, rhs], None, _broadcast_shape(lhs, rhs), _binary_op_sparsity(lhs, rhs, opStr), isScalar)
 
 def binaryMatrixFunction(X, Y, fnName):
     """
     Common function called by supported PyDML built-in function that has two arguments.
     """
-    inputs = []
-    lhsStr, inputs = _matricize(X, inputs)
-    rhsStr, inputs = _matricize(Y, inputs)
-    return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', fnName,'(', lhsStr, ', ', rhsStr, ')\n'])
+    X, Y = _as_matrix(X), _as_matrix(Y)
+    shape, sparsity = _binary_function_shape(X, Y, fnName)
+    return _construct_expr_node(fnName, [X, Y], None, shape, sparsity, _is_scalar_valued(X) and _is_scalar_valued(Y))
 
 def unaryMatrixFunction(X, fnName):
     """
     Common function called by supported PyDML built-in function that has one argument.
     """
-    inputs = []
-    lhsStr, inputs = _matricize(X, inputs)
-    return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', fnName,'(', lhsStr, ')\n'])
+    sparsity = X._sparsity if fnName in _ZERO_PRESERVING_FUNCTIONS else None
+    return _construct_expr_node(fnName, [X], None, _shape_of(X), sparsity, isinstance(X, scalar))
 
 def seq(start=None, stop=None, step=1):
     """
@@ -228,8 +856,16 @@ def seq(start=None, stop=None, step=1):
     elif start is not None and stop is None:
         stop = start
         start = 0
-    return construct_intermediate_node([], [OUTPUT_ID, ' = seq(', str(start), ',', str(stop), ',',  str(step), ')\n'])
+    return construct_intermediate_node([], [OUTPUT_ID, ' = seq(', str(start), ',', str(stop), ',',  str(step), ')\n'], _seq_shape(start, stop, step))
     
+# utility function that returns the DML string of a scalar value or matrix
+def getValue(obj):
+    if isinstance(obj, matrix):
+        return obj.ID
+    elif isinstance(obj, float):
+        return _double_literal(obj)
+    return str(obj)
+
 # utility function that converts 1:3 into DML string
 def convert_seq_to_dml(s):
     ret = []
@@ -242,7 +878,7 @@ def convert_seq_to_dml(s):
             ret = ret + [ '0 : ' ]
         else:
             ret = ret + [ getValue(s.start), ':' ]
-        if s.start is None:
+        if s.stop is None:
             ret = ret + [ '' ]
         else:
             ret = ret + [ getValue(s.stop) ]
@@ -250,6 +886,27 @@ def convert_seq_to_dml(s):
         ret = ret + [ getValue(s) ]
     return ''.join(ret)
 
+def _index_operands(index):
+    """
+    Returns the matrices used as indexes or slice bounds (for example: the loop index, see for_loop) by the given index.
+    """
+    ret = []
+    for s in (index if isinstance(index, tuple) else (index,)):
+        for x in ([ s.start, s.stop ] if isinstance(s, slice) else [ s ]):
+            if isinstance(x, matrix):
+                ret.append(x)
+    return ret
+
+def _resolve_index(index):
+    """
+    Replaces the matrices used by the given index with the matrices whose computation they share (see _alias).
+    """
+    def resolve(x):
+        return x._resolve_alias() if isinstance(x, matrix) else x
+    if not isinstance(index, tuple) or len(_index_operands(index)) == 0:
+        return index
+    return tuple(slice(resolve(s.start), resolve(s.stop), s.step) if isinstance(s, slice) else resolve(s) for s in index)
+
 # utility function that converts index (such as [1, 2:3]) into DML string
 def getIndexingDML(index):
     ret = [ '[' ]
@@ -270,44 +927,1328 @@ def convert_outputs_to_list(outputs):
                 raise TypeError('Only matrix or list of matrix allowed')
         return outputs
     else:
-        raise TypeError('Only matrix or list of matrix allowed')
+        raise TypeError('Only matrix or list of matrix allowed')
+
+def reset_output_flag(outputs):
+    _get_context().outputs.difference_update([ id(m) for m in outputs ])
+    
+
+def set_nested_expressions(enable, max_depth=16):
+    """
+    This method allows users to enable or disable the emission of nested expressions (enabled by default).
+    If enabled, an unevaluated matrix that is only used by a single operation (and is not an output) is emitted as a nested
+    expression of that operation rather than as a separate statement assigning a temporary variable. For example:
+    X.transpose().dot(X.dot(v)) is emitted as a single statement, which allows SystemML to apply its fused operators
+    (for example: mmchain) similar to a hand-written DML script.
+
+    Parameters
+    ----------
+    enable: True if single-use intermediates should be emitted as nested expressions
+    max_depth: maximum nesting depth of an expression (deeper expressions are split into multiple statements)
+    """
+    matrix.max_nesting_depth = max_depth if enable else 0
+
+def _single_use_nodes(outputs):
+    """
+    Returns the pending nodes of the DAG rooted at outputs and the map from the ID (see id()) of the nodes used exactly once
+    to the op using them. The outputs are never considered single-use, neither are the nodes referenced by other DAGs
+    if the intermediate cache is enabled (as they are registered as outputs, see _register_hot_intermediates).
+    """
+    uses = {}
+    consumers = {}
+    nodes = []
+    seen = set([ id(m) for m in outputs ])
+    stack = list(outputs)
+    while len(stack) > 0:
+        m = stack.pop()
+        if not _is_pending(m):
+            continue
+        nodes.append(m)
+        m.op._prepare()
+        for x in m.op.inputs:
+            uses[id(x)] = uses.get(id(x), 0) + 1
+            consumers[id(x)] = m.op
+            if id(x) not in seen:
+                seen.add(id(x))
+                stack.append(x)
+    outputIDs = set([ id(m) for m in outputs ])
+    ret = {}
+    for m in nodes:
+        consumer = consumers.get(id(m))
+        if id(m) in outputIDs or uses.get(id(m)) != 1 or not m.op.has_output:
+            continue
+        if matrix.intermediates is not None and any(op is not consumer for op in m._consumers()):
+            continue
+        ret[id(m)] = consumer
+    return nodes, ret
+
+def _find_inlinable(outputs):
+    """
+    Returns the IDs (see id()) of the pending nodes of the DAG rooted at outputs that can be emitted as nested expressions,
+    i.e. the single-use nodes (see _single_use_nodes) whose expression is known and whose consumer has a known expression (other than indexing).
+    """
+    nodes, consumers = _single_use_nodes(outputs)
+    ret = set()
+    for m in nodes:
+        consumer = consumers.get(id(m))
+        if consumer is not None and m.op.expr is not None and consumer.expr is not None and consumer.expr[0] != 'index':
+            ret.add(id(m))
+    return ret
+
+###############################################################################
+
+
+########################## Rewrites ###########################################
+
+# Maximum number of rewrites applied to a single node per evaluation
+_MAX_REWRITES_PER_NODE = 32
+
+def set_simplifier(enable):
+    """
+    This method allows users to enable or disable the algebraic simplification of the lazily evaluated matrices (enabled by default).
+    Before the script is generated, the simplifier rewrites the unevaluated nodes using constant folding of scalar chains
+    (for example: (X + 1) - 3 => X - 2), elimination of identities (X * 1, X + 0, X ** 1) and annihilators (X * 0 and X ** 0 if
+    the shape is known), removal of double transpose/negation, merging of consecutive slices and strength reduction (X ** 0.5 => sqrt(X)
+    and X * X => X ** 2, which SystemML compiles into its square operator). Similar to SystemML's own static rewrites, X * 0 is
+    simplified to zero even if X contains NaN. Finally, the chains of matrix multiplications are reordered to minimize the number
+    of scalar multiplications, provided the shapes of their operands are known statically (see eval with execute=False).
+
+    Parameters
+    ----------
+    enable: True if the rewrites should be applied
+    """
+    matrix.simplify = enable
+
+def _is_scalar(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+def _is_pending(m):
+    """
+    Returns True if the given matrix is computed by its op in the next evaluation, i.e. neither evaluated nor cached (see set_intermediate_cache).
+    """
+    return isinstance(m, matrix) and m.op is not None and m._future is None and m._eval_data is None and \
+        (matrix.intermediates is None or m.ID not in matrix.intermediates)
+
+def _pending_expr(m):
+    """
+    Returns the expression computed by the op of the given pending matrix (see _is_pending) or None.
+    """
+    return m.op.expr if _is_pending(m) else None
+
+def _scalar_operand(name, args):
+    """
+    Returns (matrix, scalar) if the given binary operation is matrix-scalar (or scalar-matrix for commutative operators), else None.
+    """
+    if len(args) != 2 or not name.startswith(' '):
+        return None
+    if isinstance(args[0], matrix) and _is_scalar(args[1]):
+        return args[0], args[1]
+    elif name.strip() in ('+', '*') and _is_scalar(args[0]) and isinstance(args[1], matrix):
+        return args[1], args[0]
+    return None
+
+def _replace_op(m, op):
+    """
+    Replaces the op of the given matrix object (in-place, hence the users of m are not affected).
+    """
+    old = m.op
+    for x in old.inputs:
+        x.referenced = [ r for r in x.referenced if r() is not old ]
+    op.out_bytes = old.out_bytes
+    m.op = op
+    return True
+
+def _expr_op(outID, name, args, params):
+    op = DMLOp([ x for x in args if isinstance(x, matrix) ])
+    op.dml = [ outID, ' = ' ] + _expr_dml(name, [ getValue(x) for x in args ], params) + [ '\n' ]
+    op.expr = (name, tuple(args), params)
+    return op
+
+def _rewrite(m, name, args, params=None):
+    """
+    Rewrites the given matrix object to compute the given expression (see _construct_expr_node).
+    """
+    return _replace_op(m, _expr_op(m.ID, name, args, params))
+
+def _new_node(name, args, params, shape, sparsity):
+    """
+    Creates a node computing the given expression while rewriting the DAG (i.e. unlike _construct_expr_node without
+    common subexpression elimination and evaluation policy).
+    """
+    out = matrix(None, op=DMLOp([]))
+    out.op = _expr_op(out.ID, name, args, params)
+    out._shape, out._sparsity = shape, sparsity
+    out.op.out_bytes = out._estimated_bytes()
+    return out
+
+def _rewrite_as_alias(m, x):
+    """
+    Rewrites the given matrix object to share the computation of x (see _alias).
+    """
+    op = DMLOp([ x ])
+    op.is_alias = True
+    op.dml = [ m.ID, ' = ', x.ID, '\n' ]
+    return _replace_op(m, op)
+
+def _rewrite_with_scalar(m, name, x, c):
+    """
+    Rewrites the given matrix object to compute x <op> c, where <op> is either +/- (name=' + ') or *// (name=' * ').
+    """
+    if name == ' + ' and c < 0:
+        return _rewrite(m, ' - ', (x, -c))
+    return _rewrite(m, name, (x, c))
+
+def _slice_bounds(s):
+    """
+    Returns the (0-based) start and exclusive stop (None if open) of the given index or None if it is not a non-negative integer slice or index.
+    """
+    if s is None:
+        return (0, None)
+    elif _is_int(s) and s >= 0:
+        return (int(s), int(s) + 1)
+    elif isinstance(s, slice) and s.step is None and all(x is None or (_is_int(x) and x >= 0) for x in [s.start, s.stop]):
+        return (0 if s.start is None else int(s.start), None if s.stop is None else int(s.stop))
+    return None
+
+def _merge_slices(inner, outer):
+    """
+    Returns the index equivalent to X[inner][outer] or None.
+    """
+    if not isinstance(inner, tuple) or not isinstance(outer, tuple) or len(inner) not in (1, 2) or len(outer) not in (1, 2):
+        return None
+    ret = []
+    for s1, s2 in zip(inner + (None,)*(2 - len(inner)), outer + (None,)*(2 - len(outer))):
+        b1, b2 = _slice_bounds(s1), _slice_bounds(s2)
+        if b1 is None or b2 is None:
+            return None
+        start = b1[0] + b2[0]
+        stop = b1[1] if b2[1] is None else b1[0] + b2[1]
+        if b1[1] is not None and (start >= b1[1] or stop > b1[1]):
+            # Out of bounds: keep the original expression, which is reported by SystemML
+            return None
+        ret.append(None if start == 0 and stop is None else slice(start, stop))
+    return tuple(ret)
+
+def _simplify_node(m):
+    """
+    Applies the first applicable rewrite to the given pending node and returns True if the node was rewritten.
+    """
+    name, args, params = m.op.expr
+    # Bypass the inputs that were rewritten to share the computation of another node (except for the operands of the index,
+    # which are referenced by params)
+    resolved = tuple(x._resolve_alias() if isinstance(x, matrix) and (name != 'index' or i == 0) else x for i, x in enumerate(args))
+    if any(x is not y for x, y in zip(args, resolved)):
+        return _rewrite(m, name, resolved, params)
+    op = name.strip()
+    operand = _scalar_operand(name, args)
+    if operand is not None:
+        x, c = operand
+        shape = _static_shape(m._shape)
+        if (op in ('+', '-') and c == 0) or (op in ('*', '/', '**') and c == 1):
+            return _rewrite_as_alias(m, x)
+        elif op in ('*', '**') and c == 0 and shape is not None and not isinstance(m, scalar):
+            return _rewrite(m, 'full', (), (0 if op == '*' else 1, shape))
+        elif op == '**' and c == 0.5:
+            return _rewrite(m, 'sqrt', (x,))
+        inner = _pending_expr(x)
+        innerOperand = _scalar_operand(inner[0], inner[1]) if inner is not None else None
+        if innerOperand is not None:
+            y, c2 = innerOperand
+            innerOp = inner[0].strip()
+            # Constant folding of the scalar chains
+            if op in ('+', '-') and innerOp in ('+', '-'):
+                return _rewrite_with_scalar(m, ' + ', y, (c2 if innerOp == '+' else -c2) + (c if op == '+' else -c))
+            elif op == '*' and innerOp == '*':
+                return _rewrite(m, ' * ', (y, c2 * c))
+            elif op == '/' and innerOp == '*' and c != 0:
+                return _rewrite(m, ' * ', (y, float(c2) / c))
+            elif op == '*' and innerOp == '/' and c2 != 0:
+                return _rewrite(m, ' * ', (y, float(c) / c2))
+            elif op == '/' and innerOp == '/':
+                return _rewrite(m, ' / ', (y, c2 * c))
+    elif op == '*' and len(args) == 2 and isinstance(args[0], matrix) and args[0] is args[1]:
+        return _rewrite(m, ' ** ', (args[0], 2))
+    elif (name == '-' or name == 'transpose') and len(args) == 1 and params is None:
+        # -(-X) => X and t(t(X)) => X
+        inner = _pending_expr(args[0])
+        if inner is not None and inner[0] == name and len(inner[1]) == 1 and inner[2] is None:
+            return _rewrite_as_alias(m, inner[1][0])
+    elif name == 'index':
+        inner = _pending_expr(args[0])
+        if inner is not None and inner[0] == 'index':
+            index = _merge_slices(inner[2], params)
+            if index is not None:
+                return _rewrite(m, 'index', inner[1], index)
+    return False
+
+# Maximum number of operands of a chain of matrix multiplications that is reordered (the optimization takes cubic time)
+_MAX_CHAIN_LENGTH = 64
+
+def _matmul_chain(root, consumers):
+    """
+    Returns the operands and the (internal) dot nodes of the maximal chain of matrix multiplications rooted at the given dot node.
+    The single-use dot nodes (see _single_use_nodes) are part of the chain, the other nodes are its operands.
+    """
+    operands = []
+    internal = []
+    stack = [ root ]
+    while len(stack) > 0:
+        m = stack.pop()
+        if m is root or (id(m) in consumers and m.op.expr is not None and m.op.expr[0] == 'dot' and consumers[id(m)].expr is not None and consumers[id(m)].expr[0] == 'dot'):
+            internal.append(m)
+            stack.extend([ m.op.expr[1][1], m.op.expr[1][0] ])
+        else:
+            operands.append(m)
+    return operands, internal
+
+def _optimal_chain_order(dims):
+    """
+    Returns the number of scalar multiplications and the split points of the optimal parenthesization of the chain
+    of matrix multiplications, where the i-th matrix has dims[i] rows and dims[i+1] columns (dynamic programming).
+    """
+    n = len(dims) - 1
+    cost = [ [ 0 ]*n for i in range(n) ]
+    split = [ [ 0 ]*n for i in range(n) ]
+    for length in range(1, n):
+        for i in range(n - length):
+            j = i + length
+            cost[i][j] = None
+            for k in range(i, j):
+                c = cost[i][k] + cost[k+1][j] + dims[i]*dims[k+1]*dims[j+1]
+                if cost[i][j] is None or c < cost[i][j]:
+                    cost[i][j], split[i][j] = c, k
+    return cost[0][n-1], split
+
+def _reorder_matmul_chain(root, consumers):
+    """
+    Reassociates the chain of matrix multiplications rooted at the given node if the statically inferred shapes of its operands
+    show that a different order requires fewer scalar multiplications. Returns True if the chain was reordered.
+    """
+    operands, internal = _matmul_chain(root, consumers)
+    shapes = [ _shape_of(x) if isinstance(x, matrix) else None for x in operands ]
+    if len(operands) < 3 or len(operands) > _MAX_CHAIN_LENGTH or any(shape is None for shape in shapes):
+        return False
+    dims = [ shape[0] for shape in shapes ] + [ shapes[-1][1] ]
+    currentCost = 0
+    for m in internal:
+        lhs, rhs = _shape_of(m.op.expr[1][0]), _shape_of(m.op.expr[1][1])
+        currentCost += lhs[0]*lhs[1]*rhs[1]
+    optimalCost, split = _optimal_chain_order(dims)
+    if optimalCost >= currentCost:
+        return False
+    def build(i, j):
+        if i == j:
+            return operands[i]
+        lhs, rhs = build(i, split[i][j]), build(split[i][j] + 1, j)
+        if i == 0 and j == len(operands) - 1:
+            return _rewrite(root, 'dot', (lhs, rhs))
+        shape, sparsity = _matmul_shape(lhs, rhs)
+        return _new_node('dot', (lhs, rhs), None, shape, sparsity)
+    return build(0, len(operands) - 1)
+
+def _reorder_matmul_chains(outputs):
+    """
+    Reorders the maximal chains of matrix multiplications (see _reorder_matmul_chain) of the DAG rooted at outputs.
+    """
+    nodes, consumers = _single_use_nodes(outputs)
+    for m in nodes:
+        consumer = consumers.get(id(m))
+        isInternal = consumer is not None and consumer.expr is not None and consumer.expr[0] == 'dot'
+        if m.op.expr is not None and m.op.expr[0] == 'dot' and not isInternal:
+            _reorder_matmul_chain(m, consumers)
+
+def _simplify(outputs):
+    """
+    Applies the rewrites (see set_simplifier) to the pending nodes of the DAG rooted at outputs. The inputs of a node are simplified before the node.
+    Finally, the chains of matrix multiplications (if any) are reordered.
+    """
+    order = []
+    seen = set()
+    for out in outputs:
+        stack = [ (out, False) ]
+        while len(stack) > 0:
+            m, expanded = stack.pop()
+            if expanded:
+                order.append(m)
+            elif id(m) not in seen and _is_pending(m):
+                seen.add(id(m))
+                stack.append((m, True))
+                stack.extend([ (x, False) for x in m.op.inputs ])
+    hasMatMult = False
+    for m in order:
+        for i in range(_MAX_REWRITES_PER_NODE):
+            if m.op.expr is None or not _simplify_node(m):
+                break
+        hasMatMult = hasMatMult or (m.op.expr is not None and m.op.expr[0] == 'dot')
+    if hasMatMult:
+        _reorder_matmul_chains(outputs)
+
+###############################################################################
+
+########################## Loops ##############################################
+
+class _LoopVarOp(DMLOp):
+    """
+    Represents a variable assigned by a loop (see for_loop and while_loop), i.e. a state variable or the loop index.
+    The body of the loop is traced once with such variables, hence their values are only known inside the generated loop.
+    """
+    def __init__(self):
+        DMLOp.__init__(self, [])
+        self.dml = []
+
+    def _visit(self, execute=True):
+        raise ValueError('the loop variables can only be used by the operations returned from the body of the loop')
+
+def _loop_var(cls, shape, opClass=_LoopVarOp):
+    """
+    Creates a loop variable (see _LoopVarOp) of the given class (matrix or scalar) and shape.
+    """
+    out = cls(None, op=opClass())
+    out._shape = shape
+    return out
+
+def _loop_value(x):
+    """
+    Converts the given state or returned value of the body of a loop to matrix (Python numbers are converted to scalar).
+    """
+    x = _as_matrix(x)
+    if _is_scalar(x):
+        return construct_intermediate_node([], [ OUTPUT_ID, ' = ', _double_literal(x), '\n' ], (1, 1), is_scalar=True)
+    elif not isinstance(x, matrix):
+        raise TypeError('the state of a loop can only contain matrices and numbers')
+    return x
+
+def _loop_state(state):
+    """
+    Returns the list of the given state variables (a matrix or number, or a list or tuple of them).
+    """
+    states = list(state) if isinstance(state, (list, tuple)) else [ state ]
+    if len(states) == 0:
+        raise ValueError('the loop requires at least one state variable')
+    return [ _loop_value(x) for x in states ]
+
+def _trace(fn, args):
+    """
+    Calls the given function with the loop variables (see _LoopVarOp) without evaluating any operation (see _should_eval).
+    """
+    ctx = _get_context()
+    ctx.tracing += 1
+    try:
+        return fn(*args)
+    finally:
+        ctx.tracing -= 1
+
+def _trace_loop_body(fn, args, inits):
+    """
+    Traces the body of a loop (see _trace) and returns the new values of the state variables.
+    """
+    ret = _trace(fn, args)
+    updates = [ _loop_value(x) for x in (ret if isinstance(ret, (list, tuple)) else [ ret ]) ]
+    if len(updates) != len(inits):
+        raise ValueError('the body of the loop returned ' + str(len(updates)) + ' values, expected ' + str(len(inits)))
+    for k, (x, u) in enumerate(zip(inits, updates)):
+        if isinstance(x, scalar) != isinstance(u, scalar):
+            raise ValueError('the state variable ' + str(k) + ' changes from ' + type(x).__name__ + ' to ' + type(u).__name__ + ' in the body of the loop')
+        if _shape_of(x) is not None and _shape_of(u) is not None and _shape_of(x) != _shape_of(u):
+            raise ValueError('the state variable ' + str(k) + ' changes its shape from ' + str(_shape_of(x)) + ' to ' + str(_shape_of(u)) + ' in the body of the loop')
+    return updates
+
+def _loop_statements(roots):
+    """
+    Returns the statements computing the nodes of the DAG rooted at roots that depend on the loop variables (in the order of evaluation),
+    the nodes used by them (or roots) that do not depend on the loop variables, which are computed before the loop, and the functions
+    called by the statements (see function).
+    """
+    depends = {}
+    statements = []
+    invariant = []
+    functions = []
+    for root in roots:
+        stack = [ [root, -1] ]
+        while len(stack) > 0:
+            entry = stack[-1]
+            m = entry[0]
+            if entry[1] == -1:
+                if id(m) in depends:
+                    stack.pop()
+                    continue
+                elif not _is_pending(m) or isinstance(m.op, _LoopVarOp):
+                    depends[id(m)] = _is_pending(m)
+                    stack.pop()
+                    continue
+                m.op._prepare()
+            entry[1] += 1
+            if entry[1] < len(m.op.inputs):
+                stack.append([ m.op.inputs[entry[1]], -1 ])
+                continue
+            stack.pop()
+            depends[id(m)] = any(depends[id(x)] for x in m.op.inputs)
+            if depends[id(m)]:
+                statements.append(''.join(m.op.dml))
+                invariant.extend(x for x in m.op.inputs if not depends[id(x)])
+                functions.extend(m.op.functions)
+        if not depends[id(root)]:
+            invariant.append(root)
+    return statements, invariant, functions
+
+def _indent(statements):
+    return [ '\t' + line + '\n' for stmt in statements for line in stmt.split('\n') if line != '' ]
+
+def _construct_loop(header, varIDs, inits, updates, cond=None, bounds=[]):
+    """
+    Creates the node that executes the given loop and returns the matrices holding the final values of the state variables.
+
+    Parameters
+    ----------
+    header: header of the for loop (ignored for while loops)
+    varIDs: IDs of the loop variables of the state variables
+    inits: initial values of the state variables
+    updates: values of the state variables at the end of the body (traced with the loop variables)
+    cond: scalar computing the condition of the while loop (traced with the loop variables) or None
+    bounds: scalars used by the header
+    """
+    roots = updates + ([ cond ] if cond is not None else [])
+    if matrix.simplify:
+        _simplify(roots)
+    for ID, u in zip(varIDs, updates):
+        base = u.op.inputs[0] if isinstance(u.op, _ScatterOp) else None
+        if base is not None and isinstance(base.op, _LoopVarOp) and base.ID == ID and base._consumers() == [ u.op ]:
+            # Left indexing of a state variable that is not used otherwise is applied to the loop variable in-place,
+            # which allows parfor to detect the independent updates (for example: R[i,] = ...)
+            u.op._rename(ID)
+            u.ID = ID
+    body, invariant, functions = _loop_statements(updates)
+    condStatements, condInvariant, condFunctions = _loop_statements([ cond ]) if cond is not None else ([], [], [])
+    # The state variables are assigned after the body, via temporary variables if they are swapped (for example: a, b = b, a)
+    swapped = {}
+    assignments = []
+    for ID, u in zip(varIDs, updates):
+        if isinstance(u.op, _LoopVarOp) and u.ID != ID and u.ID not in swapped:
+            swapped[u.ID] = _get_new_var_id()
+            body.append(swapped[u.ID] + ' = ' + u.ID + '\n')
+    for ID, u in zip(varIDs, updates):
+        if u.ID != ID:
+            assignments.append(ID + ' = ' + swapped.get(u.ID, u.ID) + '\n')
+    block = body + assignments + condStatements
+    if len(block) == 0:
+        block = [ varIDs[0] + ' = ' + varIDs[0] + '\n' ]
+    dml = [ ID + ' = ' + x.ID + '\n' for ID, x in zip(varIDs, inits) ]
+    if cond is not None:
+        dml = dml + condStatements + [ 'while (' + cond.ID + '):\n' ]
+    else:
+        dml = dml + [ header ]
+    dml = dml + _indent(block) + [ '\n' ]
+    inputs = []
+    seen = set()
+    for x in inits + invariant + condInvariant + bounds:
+        if id(x) not in seen:
+            seen.add(id(x))
+            inputs.append(x)
+    loopOp = DMLOp(inputs, dml)
+    loopOp.has_output = False
+    loopOp.functions = functions + condFunctions
+    loopOp.script_size = min(loopOp.script_size + sum(len(x) for x in dml), sys.maxsize)
+    loop = matrix(None, op=loopOp)
+    outputs = []
+    for ID, x in zip(varIDs, inits):
+        op = DMLOp([ loop ], [])
+        out = type(x)(None, op=op)
+        op.dml = [ out.ID, ' = ', ID, '\n' ]
+        out._shape = x._shape
+        op.out_bytes = out._estimated_bytes()
+        outputs.append(out)
+    if _should_eval(outputs[0].op):
+        eval(outputs)
+    return outputs
+
+def for_loop(n, body_fn, state, parallel=False):
+    """
+    Executes body_fn n times as a single DML for loop. Unlike a Python loop, whose iterations are unrolled into the DAG,
+    the body is traced only once (with symbolic loop variables), hence the size of the generated script does not depend on n
+    and SystemML optimizes (and recompiles) the loop as a whole.
+
+    The body is called as body_fn(i, *state) where i is the (0-based) loop index as scalar, and returns the new values of the
+    state variables (in the same order and with the same shapes). The loop variables can be used by the matrix operations
+    (including indexing, for example: X[i,]) but can not be evaluated inside the body.
+
+    >>> w = sml.for_loop(1000, lambda i, w: w - 0.01 * X.transpose().dot(X.dot(w) - y), w0)
+    >>> def predict(i, R):
+    ...     R[i,] = X[i,].dot(w)
+    ...     return R
+    >>> R = sml.for_loop(X.shape[0], predict, sml.full((X.shape[0], 1), 0), parallel=True)
+
+    Parameters
+    ----------
+    n: number of iterations (int or scalar)
+    body_fn: function computing the new values of the state variables
+    state: initial value of the state variable (matrix or number) or list/tuple of initial values
+    parallel: True if the iterations are independent and should be executed by parfor (SystemML validates the dependencies)
+
+    Returns
+    -------
+    The final value of the state variable or the list of the final values (if state is a list or tuple)
+    """
+    inits = _loop_state(state)
+    if _is_int(n) and n <= 0:
+        ret = inits
+    else:
+        index = _loop_var(scalar, (1, 1))
+        variables = [ _loop_var(type(x), x._shape) for x in inits ]
+        varIDs = [ x.ID for x in variables ]
+        # Without increment, SystemML counts down if from > to. Hence, the increment of a lazy n is explicit, so that n <= 0 executes no iteration.
+        bounds = 'range(0, ' + n.ID + ' - 1, 1)' if isinstance(n, matrix) else '0:' + str(int(n) - 1)
+        header = ('parfor' if parallel else 'for') + ' (' + index.ID + ' in ' + bounds + '):\n'
+        updates = _trace_loop_body(body_fn, [ index ] + variables, inits)
+        ret = _construct_loop(header, varIDs, inits, updates, None, [ n ] if isinstance(n, matrix) else [])
+    return ret if isinstance(state, (list, tuple)) else ret[0]
+
+def while_loop(cond_fn, body_fn, state):
+    """
+    Executes body_fn as long as cond_fn is true as a single DML while loop, i.e. the condition and the body are traced only once
+    with symbolic state variables (see for_loop).
+
+    >>> w, i = sml.while_loop(lambda w, i: (((X.dot(w) - y) ** 2).mean() > 1e-6) & (i < 1000),
+    ...                       lambda w, i: (w - 0.01 * X.transpose().dot(X.dot(w) - y), i + 1), (w0, 0))
+
+    Parameters
+    ----------
+    cond_fn: function called as cond_fn(*state) that returns the condition as scalar
+    body_fn: function called as body_fn(*state) that returns the new values of the state variables
+    state: initial value of the state variable (matrix or number) or list/tuple of initial values
+
+    Returns
+    -------
+    The final value of the state variable or the list of the final values (if state is a list or tuple)
+    """
+    inits = _loop_state(state)
+    variables = [ _loop_var(type(x), x._shape) for x in inits ]
+    varIDs = [ x.ID for x in variables ]
+    cond = _trace(cond_fn, variables)
+    if not isinstance(cond, scalar):
+        raise TypeError('the condition of the loop should be a scalar computed from the state variables')
+    updates = _trace_loop_body(body_fn, variables, inits)
+    ret = _construct_loop(None, varIDs, inits, updates, cond)
+    return ret if isinstance(state, (list, tuple)) else ret[0]
+
+###############################################################################
+
+########################## Functions ##########################################
+
+class _ParamOp(_LoopVarOp):
+    """
+    Represents a parameter of a DML function (see function).
+    """
+    def _visit(self, execute=True):
+        raise ValueError('the parameters of a function can only be used by the operations returned from the function')
+
+def _param_signature(x):
+    """
+    Returns the part of the signature of a function call (see function) describing the given argument.
+    """
+    if isinstance(x, scalar) or _is_scalar(x):
+        return ('scalar',)
+    elif isinstance(x, matrix):
+        sparsity = _sparsity_of(x)
+        return ('matrix', _shape_of(x), None if sparsity is None else sparsity < SPARSITY_TURN_POINT)
+    # Other arguments (for example: flags) are passed to the Python function as they are
+    return ('static', x)
+
+def _dml_type(x):
+    return 'float' if isinstance(x, scalar) else 'matrix[float]'
+
+class _FunctionDef(object):
+    """
+    Represents the DML function generated by tracing a Python function for one signature of its arguments (see function).
+    """
+    def __init__(self, name, params, outputs, captured, statements, functions, returnsTuple):
+        self.name = name
+        self.returnsTuple = returnsTuple
+        # Matrices used by the function that are not computed from its parameters, which are passed as additional arguments
+        self.captured = captured
+        # The class and shape of the outputs
+        self.outputs = [ (type(x), x._shape) for x in outputs ]
+        self.functions = functions
+        retIDs = [ 'ret' + str(k) for k in range(len(outputs)) ]
+        header = [ 'def ', name, '(', ', '.join(x.ID + ': ' + _dml_type(x) for x in params), ') -> (',
+            ', '.join(ID + ': ' + _dml_type(x) for ID, x in zip(retIDs, outputs)), '):\n' ]
+        block = statements + [ ID + ' = ' + x.ID + '\n' for ID, x in zip(retIDs, outputs) ]
+        self.dml = ''.join(header + _indent(block) + [ '\n' ])
+
+    def _register(self, ctx):
+        """
+        Adds the definition of this function (and of the functions called by it) to the script of the given context.
+        """
+        if self.name in ctx.function_names:
+            return
+        ctx.function_names.add(self.name)
+        for f in self.functions:
+            f._register(ctx)
+        ctx.functions.append(self.dml)
+
+class _LibraryFunction(_FunctionDef):
+    """
+    DML function shipped with this package (for example: the algorithms of sml.linalg), whose definition is added to the script of
+    the evaluations calling it (see DMLOp.functions).
+    """
+    def __init__(self, dml, functions=()):
+        self.dml = dml
+        self.name = dml.split('(')[0][len('def '):]
+        self.functions = functions
+
+# Quantiles of the columns of X for the probabilities P (column vector), which are linearly interpolated between the closest ranks
+# (as numpy.percentile). The cells are sorted by value and then by column, where the rank of the first sort makes the keys of the
+# second sort unique. Hence, all columns are sorted by two sorts instead of one sort per column.
+_COLUMN_QUANTILES = _LibraryFunction('''def sml_column_quantiles(X: matrix[float], P: matrix[float]) -> (Y: matrix[float]):
+    n = nrow(X)
+    m = ncol(X)
+    N = n * m
+    ix = seq(0, N - 1, 1)
+    S = order(target=cbind(full(transpose(X), rows=N, cols=1), floor(ix / n)), by=1)
+    S = order(target=cbind(S[, 1] * N + ix, S[, 0]), by=1)
+    S = transpose(full(S[, 1], rows=m, cols=n))
+    k = nrow(P)
+    r = seq(1, k, 1)
+    pos = P * (n - 1)
+    lo = floor(pos)
+    hi = min(lo + 1, n - 1)
+    W = table(r, lo + 1, 1 - (pos - lo), k, n) + table(r, hi + 1, pos - lo, k, n)
+    Y = dot(W, S)
+
+''')
+
+class _Function(object):
+    """
+    Python function compiled into DML functions (see function).
+    """
+    _count = 0
+    _lock = threading.Lock()
+
+    def __init__(self, fn):
+        self.fn = fn
+        # Map from the signature of the arguments to the traced DML function
+        self.definitions = {}
+        self.__name__ = getattr(fn, '__name__', 'function')
+        self.__doc__ = getattr(fn, '__doc__', None)
+
+    def _trace(self, args):
+        params = []
+        fnArgs = []
+        for x in args:
+            if isinstance(x, scalar) or _is_scalar(x):
+                params.append(_loop_var(scalar, (1, 1), _ParamOp))
+            elif isinstance(x, matrix):
+                params.append(_loop_var(matrix, x._shape, _ParamOp))
+            else:
+                fnArgs.append(x)
+                continue
+            fnArgs.append(params[-1])
+        ret = _trace(self.fn, fnArgs)
+        outputs = [ _loop_value(x) for x in (ret if isinstance(ret, (list, tuple)) else [ ret ]) ]
+        if len(outputs) == 0:
+            raise ValueError('the function ' + self.__name__ + ' should return at least one matrix or number')
+        if matrix.simplify:
+            _simplify(outputs)
+        statements, captured, functions = _loop_statements(outputs)
+        # Deduplicates the captured matrices, which are passed as additional parameters
+        seen = set()
+        captured = [ x for x in captured if id(x) not in seen and not seen.add(id(x)) ]
+        with _Function._lock:
+            _Function._count += 1
+            name = 'sml_' + re.sub('[^A-Za-z0-9_]', '', self.__name__) + '_' + str(_Function._count)
+        return _FunctionDef(name, params + captured, outputs, captured, statements, functions, isinstance(ret, (list, tuple)))
+
+    def __call__(self, *args):
+        args = [ _as_matrix(x) for x in args ]
+        signature = tuple(_param_signature(x) for x in args)
+        definition = self.definitions.get(signature)
+        if definition is None:
+            definition = self._trace(args)
+            self.definitions[signature] = definition
+        inputs = [ x for x in args if isinstance(x, matrix) ] + definition.captured
+        argStrs = [ getValue(float(x) if _is_scalar(x) else x) for x in args if isinstance(x, matrix) or _is_scalar(x) ] + [ x.ID for x in definition.captured ]
+        ret = _construct_call(inputs, [ definition.name, '(', ', '.join(argStrs), ')' ], definition.outputs, [ definition ])
+        return ret if definition.returnsTuple else ret[0]
+
+def _construct_call(inputs, call, outputs, functions=()):
+    """
+    Creates the nodes assigned by the given call of a function without side-effects, i.e. a built-in function or a DML function (see function).
+
+    Parameters
+    ----------
+    inputs: list of input matrices
+    call: list of DML strings of the call (for example: [ 'qr(', A.ID, ')' ])
+    outputs: list of the class (matrix or scalar) and shape of the outputs
+    functions: DML functions called (see DMLOp.functions)
+
+    Returns the list of the output nodes.
+    """
+    if len(outputs) == 1:
+        # The identical calls are shared (see construct_intermediate_node)
+        key = _cse_key(inputs, [ OUTPUT_ID, ' = ' ] + call)
+        node = _get_context().cse_nodes.get(key)
+        if node is not None:
+            return [ _alias(node) ]
+        cls, shape = outputs[0]
+        op = DMLOp(inputs)
+        out = cls(None, op=op)
+        op.dml = [ out.ID, ' = ' ] + call + [ '\n' ]
+        op.functions = functions
+        out._shape = shape
+        op.out_bytes = out._estimated_bytes()
+        out._cse_key = key
+        _get_context().cse_nodes[key] = out
+        if _should_eval(op):
+            out.eval()
+        return [ out ]
+    # Multiple outputs are assigned by the node calling the function and copied by the returned nodes (see _construct_loop)
+    retIDs = [ _get_new_var_id() for x in outputs ]
+    callOp = DMLOp(inputs, [ '[', ', '.join(retIDs), '] = ' ] + call + [ '\n' ])
+    callOp.has_output = False
+    callOp.functions = functions
+    node = matrix(None, op=callOp)
+    ret = []
+    for ID, (cls, shape) in zip(retIDs, outputs):
+        op = DMLOp([ node ], [])
+        out = cls(None, op=op)
+        op.dml = [ out.ID, ' = ', ID, '\n' ]
+        out._shape = shape
+        op.out_bytes = out._estimated_bytes()
+        ret.append(out)
+    if _should_eval(ret[0].op):
+        eval(ret)
+    return ret
+
+def function(fn):
+    """
+    Decorator that compiles a Python function on matrices into DML functions. The function is traced once per signature of its
+    arguments (the class, shape and sparse format of the matrices) with symbolic parameters, and the generated DML function
+    is called by the later calls with the same signature. Hence, the Python function is not executed again and the operations
+    are not emitted again for every call, and SystemML compiles (and recompiles) the function as a whole.
+
+    The function can take matrices, scalars and numbers (which are passed as parameters) as well as other arguments
+    (which are part of the signature), and returns a matrix, a scalar or a tuple of them. The matrices used by the
+    function that are not computed from its parameters (for example: a global matrix) are captured when the function is traced
+    and passed as additional arguments.
+
+    >>> @sml.function
+    ... def normalize(X):
+    ...     return (X - X.mean(axis=0)) / X.sd(axis=0)
+    >>> Z1, Z2 = normalize(X1), normalize(X2)
+    """
+    return _Function(fn)
+
+###############################################################################
+
+########################## Profiling ##########################################
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _source_location():
+    """
+    Returns the location (file:line function) of the innermost frame of the caller outside of this package.
+    """
+    frame = sys._getframe(1)
+    while frame is not None and os.path.abspath(frame.f_code.co_filename).startswith(_PACKAGE_DIR):
+        frame = frame.f_back
+    if frame is None:
+        return None
+    return frame.f_code.co_filename + ':' + str(frame.f_lineno) + ' ' + frame.f_code.co_name
+
+def _enable_statistics(ml):
+    """
+    Enables the statistics of SystemML with the script lines of the instructions (see Instruction.getExtendedOpcode).
+    """
+    ml.setStatistics(True)
+    ml.setConfigProperty('sysml.stats.finegrained', 'true')
+
+# Matches the extended opcodes of the instructions, for example: 'sp_ba+* [3:0-3:25]' (see Instruction.getExtendedOpcode)
+_EXTENDED_OPCODE = re.compile('^(\\S+) \\[(?:.* )?(\\d+):\\d+-(\\d+):\\d+\\]$')
+
+def _script_lines(ctx):
+    """
+    Returns the map from the lines of the script of the current evaluation (see _get_script_string) to the matrices whose
+    statements contain them (or to the names of the functions whose definitions contain them) and the first lines of these statements.
+    """
+    ret = {}
+    numInputs = len(ctx.input_dml)
+    line = numInputs + 1
+    for f in ctx.functions:
+        numLines = f.count('\n')
+        name = f.split('(')[0][len('def '):]
+        for k in range(numLines):
+            ret[line + k] = (name, line)
+        line += numLines
+    # Line of the statement that starts with the given fragment of ctx.dml
+    fragmentLines = [ line ]
+    for x in ctx.dml:
+        fragmentLines.append(fragmentLines[-1] + x.count('\n'))
+    for m, kind, start, end in ctx.emitted:
+        if kind == 'input':
+            # The statements loading the inputs are emitted in reverse order of their registration
+            lines = range(numInputs - end + 1, numInputs - start + 1)
+        else:
+            lines = range(fragmentLines[start], fragmentLines[end])
+        for k in lines:
+            ret[k] = (m, lines[0])
+    return ret
+
+def _collect_profile(ctx):
+    """
+    Attributes the heavy hitter instructions of the last execution to the matrices whose statements they were compiled from
+    and adds them to the active profilers.
+    """
+    stats = matrix.sc._jvm.org.apache.sysml.utils.Statistics
+    scriptLines = _script_lines(ctx)
+    lines = ctx.script.getScriptString().split('\n')
+    records = []
+    for key in list(stats.getCPHeavyHitterOpCodes()):
+        match = _EXTENDED_OPCODE.match(key)
+        opcode, (node, first) = (match.group(1), scriptLines.get(int(match.group(2)), (None, None))) if match is not None else (key, (None, None))
+        if isinstance(node, matrix):
+            nodeID, location, statement = node.ID, node.op.location if node.op is not None else 'input', lines[first - 1].strip()
+        elif node is not None:
+            nodeID, location, statement = node, 'function', lines[first - 1].strip()
+        else:
+            nodeID, location, statement = None, None, None
+        records.append((nodeID, location, statement, opcode, stats.getCPHeavyHitterTime(key) / 1e9, stats.getCPHeavyHitterCount(key)))
+    for p in ctx.profilers:
+        p.records.extend(records)
+
+class profile(object):
+    """
+    Context manager that profiles the evaluations of the current thread (see eval) inside the with statement. Each node created
+    inside the with statement records its Python source location, and the heavy hitter instructions of SystemML (with their execution
+    time and count) are attributed to the nodes whose statements they were compiled from. The instructions that are not part of
+    a statement (for example: the cleanup of variables) are reported without node.
+
+    The plan cache (see set_plan_cache) is bypassed while profiling. Note: SystemML also prints its statistics to stdout.
+
+    >>> with sml.profile() as p:
+    ...     X = sml.matrix(np.random.rand(1000, 1000))
+    ...     Y = (X.dot(X.transpose()) + 1).sum(axis=0)
+    ...     Y.toNumPy()
+    >>> p.report()
+    >>> p.report(by='location')
+    """
+    def __init__(self):
+        # Tuples (node ID, source location, statement, opcode, time in seconds, count) per instruction and evaluation
+        self.records = []
+
+    def __enter__(self):
+        _get_context().profilers.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _get_context().profilers.remove(self)
+        return False
+
+    def report(self, by='node'):
+        """
+        Returns a DataFrame with the total execution time (in seconds) and count of the instructions per node (indexed by ID with
+        the source location and statement) or per source location, sorted by decreasing time. The column instructions lists
+        the opcodes sorted by decreasing time.
+
+        Parameters
+        ----------
+        by: 'node' or 'location'
+        """
+        if by not in ('node', 'location'):
+            raise ValueError('by should be either node or location, but got ' + str(by))
+        columns = [ 'node', 'location', 'statement', 'opcode', 'time', 'count' ]
+        df = pd.DataFrame(self.records, columns=columns).fillna('')
+        keys = [ 'node', 'location', 'statement' ] if by == 'node' else [ 'location' ]
+        opcodes = df.groupby(keys + [ 'opcode' ])['time'].sum().reset_index().sort_values('time', ascending=False)
+        ret = df.groupby(keys)[[ 'time', 'count' ]].sum()
+        ret['instructions'] = opcodes.groupby(keys)['opcode'].apply(', '.join)
+        return ret.sort_values('time', ascending=False)
+
+###############################################################################
+
+########################## Global user-facing functions #######################
+
+def solve(A, b):
+    """
+    Computes the least squares solution for system of linear equations A %*% x = b
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from sklearn import datasets
+    >>> import SystemML as sml
+    >>> from pyspark.sql import SparkSession
+    >>> diabetes = datasets.load_diabetes()
+    >>> diabetes_X = diabetes.data[:, np.newaxis, 2]
+    >>> X_train = diabetes_X[:-20]
+    >>> X_test = diabetes_X[-20:]
+    >>> y_train = diabetes.target[:-20]
+    >>> y_test = diabetes.target[-20:]
+    >>> sml.setSparkContext(sc)
+    >>> X = sml.matrix(X_train)
+    >>> y = sml.matrix(y_train)
+    >>> A = X.transpose().dot(X)
+    >>> b = X.transpose().dot(y)
+    >>> beta = sml.solve(A, b).toNumPy()
+    >>> y_predicted = X_test.dot(beta)
+    >>> print('Residual sum of squares: %.2f' % np.mean((y_predicted - y_test) ** 2))
+    Residual sum of squares: 25282.12
+    """
+    return binaryMatrixFunction(A, b, 'solve')
+
+def set_plan_cache(enable, size=32):
+    """
+    This method allows users to reuse the compiled script across evaluations of structurally identical DAGs
+    (for example: the same expression evaluated on new NumPy arrays inside a Python loop), which skips parsing,
+    validation and compilation of the script.
+
+    The cached scripts are precompiled and executed via JMLC, i.e. in the memory of the driver.
+    Hence, it is recommended to enable the plan cache only for small matrices.
+
+    Parameters
+    ----------
+    enable: True if the compiled scripts should be cached.
+    size: maximum number of compiled scripts to cache.
+    """
+    matrix.plans = OrderedDict() if enable else None
+    matrix.max_plans = size
+
+def _canonicalize(scriptString):
+    """
+    Renames the variables of the script in the order of their first occurrence, so that the scripts generated
+    for structurally identical DAGs are identical.
+
+    Returns the canonical script and the map from variable ID to its canonical name.
+    """
+    names = {}
+    def rename(match):
+        if match.group(0) not in names:
+            names[match.group(0)] = 'cVar' + str(len(names) + 1)
+        return names[match.group(0)]
+    return _VAR_ID_PATTERN.sub(rename, scriptString), names
+
+def _to_matrix_block(m, data):
+    """
+    Returns the Java MatrixBlock for the given data of matrix m or None if the data is not available in the driver (for example: PySpark DataFrame).
+    """
+    if isinstance(data, SUPPORTED_TYPES):
+        return _convert_input(m, data)
+    elif isinstance(data, py4j.java_gateway.JavaObject):
+        className = data.getClass().getSimpleName()
+        if className == 'MatrixBlock':
+            return data
+        elif className == 'Matrix':
+            return data.toMatrixBlock()
+    elif isinstance(data, Matrix):
+        return data._java_matrix.toMatrixBlock()
+    return None
+
+def _to_java_string_array(values):
+    gateway = matrix.sc._gateway
+    ret = gateway.new_array(gateway.jvm.java.lang.String, len(values))
+    for i in range(len(values)):
+        ret[i] = values[i]
+    return ret
+
+_plan_lock = threading.RLock()
+
+def _get_plan(canonicalScript, inputNames, outputNames):
+    """
+    Returns the precompiled script from the plan cache or compiles it.
+    """
+    plan = matrix.plans.pop(canonicalScript, None)
+    if plan is None:
+        if matrix.jmlc is None:
+            createJavaObject(matrix.sc, 'dummy')
+            matrix.jmlc = matrix.sc._jvm.org.apache.sysml.api.jmlc.Connection()
+        plan = matrix.jmlc.prepareScript(canonicalScript, _to_java_string_array(inputNames), _to_java_string_array(outputNames), True)
+    # Most recently used plan is kept at the end
+    matrix.plans[canonicalScript] = plan
+    while len(matrix.plans) > matrix.max_plans:
+        matrix.plans.popitem(last=False)
+    return plan
+
+def _eval_with_plan_cache(outputs):
+    """
+    Evaluates the outputs using the plan cache. Returns False if the DAG cannot be executed via JMLC (for example: if it has PySpark DataFrame as input).
+    """
+    perform_dfs(outputs, False)
+    intermediates = _register_hot_intermediates(False)
+    reset_output_flag(outputs)
+    # The evaluated scalars are inlined as literals (see scalar class)
+    inputs = [ (m, m._input_data()) for m in _get_context().visited if not isinstance(m, scalar) ]
+    inputs = [ (m, _to_matrix_block(m, data)) for m, data in inputs if data is not None ]
+    if any(mb is None for m, mb in inputs):
+        return False
+    outputs = [ m for m in outputs if m.eval_data is None and m.op.has_output ]
+    canonicalScript, names = _canonicalize(_get_script_string())
+    # The cached plans are shared by all the threads and bind their inputs
+    with _plan_lock:
+        plan = _get_plan(canonicalScript, [ names[m.ID] for m, mb in inputs ], [ names[m.ID] for m in outputs + intermediates ])
+        for m, mb in inputs:
+            plan.setMatrix(names[m.ID], mb, False)
+        results = plan.executeScript()
+        # Release the inputs held by the cached plan
+        plan.clearParameters()
+    for m in outputs:
+        m.eval_data = results.getDouble(names[m.ID]) if isinstance(m, scalar) else results.getMatrixBlock(names[m.ID])
+    for m in intermediates:
+        mb = results.getMatrixBlock(names[m.ID])
+        matrix.intermediates.put(m.ID, mb, mb.estimateSizeInMemory())
+        _track_cached(m)
+    return True
+
+class _MemoryBoundedCache(object):
+    """
+    Least recently used cache of JVM-side objects, whose total estimated size (in bytes) is bounded by the given budget.
+    """
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self.entries = OrderedDict()
+        # The entries are also updated by the asynchronous evaluations (see eval_async)
+        self.lock = threading.RLock()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            # Most recently used entry is kept at the end
+            self.entries[key] = entry
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self.lock:
+            self.remove(key)
+            if size > self.budget:
+                return
+            while self.size + size > self.budget:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted[1]
+            self.entries[key] = (value, size)
+            self.size += size
+
+    def remove(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+def set_intermediate_cache(enable, budget=1024*1024*1024):
+    """
+    This method allows users to keep the intermediate matrices that are inputs of not yet evaluated operations in the JVM,
+    so that later evaluations reuse them instead of recomputing their lineage.
+
+    Parameters
+    ----------
+    enable: True if the intermediate matrices should be cached.
+    budget: maximum estimated size (in bytes) of the cached matrices. The least recently used matrices are evicted first.
+    """
+    matrix.intermediates = _MemoryBoundedCache(budget) if enable else None
+
+def set_input_cache(enable, budget=1024*1024*1024, verify=False):
+    """
+    This method allows users to reuse the Java MatrixBlock converted from NumPy array, Pandas DataFrame or scipy sparse matrix
+    across evaluations, instead of converting the same input (via Py4J) for every evaluation. The input cache is disabled by default.
+
+    The cached block is keyed by the identity of the data and its buffer, and is discarded if the matrix is left-indexed or its data
+    is replaced by another object. In-place modifications of the data (for example: a[0,0] = 5 on the NumPy array of the matrix)
+    are not detected unless verify is True, hence please call m.release() after modifying the data of matrix m in-place.
+
+    Parameters
+    ----------
+    enable: True if the converted inputs should be cached.
+    budget: maximum estimated size (in bytes) of the cached inputs. The least recently used inputs are evicted first.
+    verify: True if a checksum of the data is compared by every evaluation using a cached input (i.e. a pass over the data,
+            which is still considerably cheaper than the conversion via Py4J), so that in-place modifications are detected.
+    """
+    matrix.input_blocks = _MemoryBoundedCache(budget) if enable else None
+    matrix.verify_inputs = verify
+
+def _buffer_signature(data, verify):
+    """
+    Returns the identity of the given NumPy array, Pandas DataFrame or scipy sparse matrix and of its buffer,
+    as well as a checksum of its values if verify is True (see set_input_cache).
+    """
+    if isinstance(data, np.ndarray):
+        arrays = [ data ]
+        signature = (id(data), data.__array_interface__['data'][0], data.shape, data.strides, data.dtype.str)
+    elif isinstance(data, pd.DataFrame):
+        arrays = [ data.values ] if verify else []
+        signature = (id(data), data.shape)
+    else:
+        arrays = [ getattr(data, name, None) for name in [ 'data', 'indices', 'indptr', 'row', 'col' ] ]
+        arrays = [ x for x in arrays if isinstance(x, np.ndarray) ]
+        buf = arrays[0].__array_interface__['data'][0] if len(arrays) > 0 else None
+        signature = (id(data), buf, data.shape, getattr(data, 'nnz', None))
+    return signature + (_checksum(arrays),) if verify else signature
 
-def reset_output_flag(outputs):
-    for m in outputs:
-        m.output = False
-    
+def _checksum(arrays):
+    """
+    Returns the Adler-32 checksum of the values of the given NumPy arrays.
+    """
+    value = 1
+    for x in arrays:
+        if not x.flags.c_contiguous and x.flags.f_contiguous:
+            # The transpose of a Fortran-ordered array is C-contiguous, hence its buffer is read without a copy
+            x = x.T
+        value = zlib.adler32(np.ascontiguousarray(x).data, value)
+    return value
+
+def _convert_input(m, data):
+    """
+    Converts the data of matrix m into Java MatrixBlock or returns the block converted by a previous evaluation (see set_input_cache).
+    """
+    cache = matrix.input_blocks
+    if cache is None:
+        return convertToMatrixBlock(matrix.sc, data)
+    signature = _buffer_signature(data, matrix.verify_inputs)
+    entry = cache.get(m.ID)
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+    mb = convertToMatrixBlock(matrix.sc, data)
+    cache.put(m.ID, (signature, mb), mb.estimateSizeInMemory())
+    _track_cached(m)
+    return mb
+
+# IDs of the matrices whose JVM-side copies are held by the input cache or the intermediate cache, keyed by id() of the
+# matrix (see _track_cached). Each entry also holds a weak reference to the matrix.
+_cached_owners = {}
+# IDs of the garbage collected matrices whose JVM-side copies are released by the next evaluation (see _release_collected)
+_collected_ids = []
+
+def _on_collected(key):
+    # Called by the garbage collector (possibly in the middle of an update of the caches), hence the release is deferred
+    entry = _cached_owners.pop(key, None)
+    if entry is not None:
+        _collected_ids.append(entry[1])
+
+def _track_cached(*ms):
+    """
+    Registers the given matrices (or updates their IDs), so that their JVM-side copies held by the input and intermediate cache
+    are released once the matrices are garbage collected.
+    """
+    for m in ms:
+        key = id(m)
+        entry = _cached_owners.get(key)
+        if entry is None:
+            entry = [ weakref.ref(m, lambda ref, key=key: _on_collected(key)), m.ID ]
+            _cached_owners[key] = entry
+        entry[1] = m.ID
+
+def _release_id(ID):
+    """
+    Releases the JVM-side copies of the matrix with the given ID held by the input and intermediate cache.
+    """
+    if matrix.input_blocks is not None:
+        matrix.input_blocks.remove(ID)
+    if matrix.intermediates is not None:
+        matrix.intermediates.remove(ID)
 
-###############################################################################
+def _release_collected():
+    """
+    Releases the JVM-side copies of the garbage collected matrices (see _track_cached).
+    """
+    while len(_collected_ids) > 0:
+        _release_id(_collected_ids.pop())
 
-########################## Global user-facing functions #######################
+def _estimate_size_in_memory(data):
+    """
+    Returns the estimated size (in bytes) of the Matrix or MatrixBlock computed by eval method or None if the dimensions are unknown.
+    """
+    if data.getClass().getSimpleName() == 'MatrixBlock':
+        return data.estimateSizeInMemory()
+    mtd = data.getMatrixMetadata()
+    rows, cols, nnz = mtd.getNumRows(), mtd.getNumColumns(), mtd.getNumNonZeros()
+    if rows is None or cols is None or rows < 0 or cols < 0:
+        return None
+    sparsity = 1.0 if nnz is None or nnz < 0 or rows*cols == 0 else float(nnz) / (rows*cols)
+    return matrix.sc._jvm.org.apache.sysml.runtime.matrix.data.MatrixBlock.estimateSizeInMemory(rows, cols, sparsity)
+
+def _dense_size_in_memory(rows, cols):
+    """
+    Returns the estimated size (in bytes) of a dense MatrixBlock (see MatrixBlock.estimateSizeDenseInMemory).
+    """
+    return 44 + 8 * rows * cols
 
-def solve(A, b):
+def _sparse_size_in_memory(rows, cols, sparsity):
     """
-    Computes the least squares solution for system of linear equations A %*% x = b
+    Returns the estimated size (in bytes) of a sparse MatrixBlock in MCSR format (see SparseBlockMCSR.estimateMemory).
+    """
+    nnzPerRow = max(4, math.ceil(sparsity * cols))
+    nonEmptyRows = min(rows, math.ceil(sparsity * rows * cols))
+    # Each sparse row has a fixed overhead of 76 bytes and each non-zero value requires 12 bytes
+    return 44 + 16 + 24 + 8 * rows + int(nonEmptyRows * (76 + 12 * nnzPerRow))
 
-    Examples
-    --------
-    >>> import numpy as np
-    >>> from sklearn import datasets
-    >>> import SystemML as sml
-    >>> from pyspark.sql import SparkSession
-    >>> diabetes = datasets.load_diabetes()
-    >>> diabetes_X = diabetes.data[:, np.newaxis, 2]
-    >>> X_train = diabetes_X[:-20]
-    >>> X_test = diabetes_X[-20:]
-    >>> y_train = diabetes.target[:-20]
-    >>> y_test = diabetes.target[-20:]
-    >>> sml.setSparkContext(sc)
-    >>> X = sml.matrix(X_train)
-    >>> y = sml.matrix(y_train)
-    >>> A = X.transpose().dot(X)
-    >>> b = X.transpose().dot(y)
-    >>> beta = sml.solve(A, b).toNumPy()
-    >>> y_predicted = X_test.dot(beta)
-    >>> print('Residual sum of squares: %.2f' % np.mean((y_predicted - y_test) ** 2))
-    Residual sum of squares: 25282.12
+def _size_in_memory(rows, cols, sparsity):
     """
-    return binaryMatrixFunction(A, b, 'solve')
+    Returns the estimated size (in bytes) of a MatrixBlock, which is stored in sparse format if its sparsity is below
+    SPARSITY_TURN_POINT and the sparse format is smaller (see MatrixBlock.estimateSizeInMemory).
+    """
+    dense = _dense_size_in_memory(rows, cols)
+    if sparsity < SPARSITY_TURN_POINT:
+        return min(dense, _sparse_size_in_memory(rows, cols, sparsity))
+    return dense
+
+def _local_mem_budget():
+    """
+    Returns the memory budget (in bytes) of the operations executed in the driver (see OptimizerUtils.getLocalMemBudget).
+    """
+    check_MLContext()
+    return matrix.sc._jvm.org.apache.sysml.hops.OptimizerUtils.getLocalMemBudget()
+
+def _estimate_node(m, sizes, budget):
+    """
+    Returns the estimates of the given node (see matrix.estimate) given the estimated output sizes of its inputs.
+    """
+    shape = _static_shape(m._shape)
+    sparsity = None
+    dense, sparse, size = None, None, None
+    if isinstance(m, scalar):
+        size = 8
+    elif shape is not None:
+        # Similar to SystemML, the matrices with unknown sparsity are assumed to be dense (worst case)
+        sparsity = 1.0 if m._sparsity is None else m._sparsity
+        dense = _dense_size_in_memory(shape[0], shape[1])
+        sparse = _sparse_size_in_memory(shape[0], shape[1], sparsity)
+        size = _size_in_memory(shape[0], shape[1], sparsity)
+    elif _is_pending(m) and not m.op.has_output:
+        size = 0
+    if not _is_pending(m):
+        return ('input', shape, sparsity, dense, sparse, size, None, None)
+    if m.op.expr is not None:
+        operation = m.op.expr[0].strip()
+    elif isinstance(m.op, _ScatterOp):
+        operation = 'left_index'
+    else:
+        match = re.search('= *([A-Za-z_][A-Za-z0-9_.]*)\\(', ''.join(m.op.dml or []))
+        operation = match.group(1) if match is not None else 'statement'
+    # The memory of an operation is the size of its inputs and output (see Hop.computeMemEstimate)
+    inputSizes = [ sizes.get(id(x)) for x in m.op.inputs ]
+    memory = None if size is None or None in inputSizes else size + sum(inputSizes)
+    validDims = all(_static_shape(x._shape) is None or max(_static_shape(x._shape)) <= 2**31 - 1 for x in [ m ] + m.op.inputs)
+    execType = 'CP' if memory is not None and memory < budget and validDims else 'SPARK'
+    return (operation, shape, sparsity, dense, sparse, size, memory, execType)
+
+def _register_hot_intermediates(execute):
+    """
+    Registers the unevaluated nodes visited by the current evaluation that are also inputs of operations outside of it as outputs,
+    i.e. the nodes that would otherwise be recomputed by a later evaluation (see set_intermediate_cache).
+    """
+    if matrix.intermediates is None:
+        return []
+    ctx = _get_context()
+    computed = [ m for m in ctx.visited if m.eval_data is None and m.ID not in matrix.intermediates and not isinstance(m, scalar) ]
+    emitted = set([ id(m.op) for m in computed ])
+    ret = [ m for m in computed if id(m) not in ctx.outputs and m.op.has_output and any(id(op) not in emitted for op in m._consumers()) ]
+    for m in ret:
+        m._register_as_output(execute)
+    return ret
 
 def eval(outputs, execute=True):
     """
@@ -321,25 +2262,219 @@ def eval(outputs, execute=True):
     check_MLContext()
     reset()
     outputs = convert_outputs_to_list(outputs)
-    matrix.script.setScriptString(perform_dfs(outputs, execute))
+    ctx = _get_context()
+    # The plan cache does not collect the statistics required by the profilers
+    if execute and matrix.plans is not None and ctx.emitted is None:
+        if _eval_with_plan_cache(outputs):
+            _release_evaluation(outputs)
+            return
+        reset()
+    scriptString = perform_dfs(outputs, execute)
+    intermediates = _register_hot_intermediates(execute) if execute else []
+    if len(intermediates) > 0:
+        scriptString = _get_script_string()
+    ctx.script.setScriptString(scriptString)
     if not execute:
         reset_output_flag(outputs)
-        return matrix.script.scriptString
-    results = matrix.ml.execute(matrix.script)
+        _release_evaluation(outputs)
+        return scriptString
+    if ctx.emitted is not None:
+        _enable_statistics(ctx.ml)
+    results = ctx.ml.execute(ctx.script)
+    if ctx.emitted is not None:
+        _collect_profile(ctx)
+    _store_results(results, outputs, intermediates, matrix.intermediates)
+    # Removes the inputs and outputs from the JVM-side symbol table of the script
+    ctx.script.clearIOS()
+    reset_output_flag(outputs)
+    _release_evaluation(outputs)
+
+def _release_evaluation(outputs):
+    """
+    Drops the references held by the current evaluation context once the evaluation is complete (i.e. the visited nodes,
+    the script and MLContext) as well as the lineage of the evaluated outputs (see matrix._drop_lineage). Hence, the nodes
+    that are no longer referenced by the user are garbage collected along with the Py4J proxies of their JVM-side objects.
+    """
+    ctx = _get_context()
+    ctx.visited = []
+    ctx.visited_ids = set()
+    ctx.inline_ids = set()
+    ctx.inlined = {}
+    ctx.dml = []
+    ctx.input_dml = []
+    ctx.functions = []
+    ctx.function_names = set()
+    ctx.emitted = None
+    ctx.ml = None
+    ctx.script = None
+    for m in outputs:
+        m._drop_lineage()
+
+def _store_results(results, outputs, intermediates, cache):
+    """
+    Sets the data of the evaluated outputs and caches the intermediates (see set_intermediate_cache).
+    """
     for m in outputs:
-        m.eval_data = results._java_results.get(m.ID)
+        if isinstance(m, scalar):
+            if m._eval_data is None and m.op.has_output:
+                m.eval_data = results._java_results.getDouble(m.ID)
+        elif m.op is None or m.op.has_output:
+            m.eval_data = results._java_results.get(m.ID)
+    for m in intermediates:
+        data = results._java_results.get(m.ID)
+        size = _estimate_size_in_memory(data)
+        if size is not None:
+            cache.put(m.ID, data, size)
+            _track_cached(m)
+
+def _get_executor():
+    with EvaluationContext._lock:
+        if matrix.executor is None:
+            try:
+                from concurrent.futures import ThreadPoolExecutor
+            except ImportError:
+                raise ImportError('Unable to import `concurrent.futures`. Hint: Install the `futures` package when using Python 2.')
+            # A single worker executes the submitted scripts in the order of submission
+            matrix.executor = ThreadPoolExecutor(max_workers=1)
+    return matrix.executor
+
+def _execute_async(ml, script, outputs, intermediates, cache, ret):
+    results = ml.execute(script)
+    _store_results(results, outputs, intermediates, cache)
+    script.clearIOS()
+    return ret
+
+def eval_async(outputs):
+    """
+    Asynchronous variant of eval method. The DML script is generated (and its inputs are converted) in the calling thread,
+    whereas the script is executed in a background thread. This allows the user to construct the next operations or
+    convert previous results while SystemML executes the script.
+
+    The data of the outputs is set when the execution completes. Accessing it earlier (for example: via toNumPy() or by
+    evaluating an operation that uses one of the outputs) waits for the completion. The scripts are executed in the order
+    of their submission and the plan cache (see set_plan_cache) is not used.
+
+    Parameters
+    ----------
+    outputs: list of matrices or a matrix object
+
+    Returns
+    -------
+    concurrent.futures.Future whose result is outputs
+    """
+    check_MLContext()
+    executor = _get_executor()
+    reset()
+    ret = outputs
+    outputs = convert_outputs_to_list(outputs)
+    scriptString = perform_dfs(outputs, True)
+    intermediates = _register_hot_intermediates(True)
+    if len(intermediates) > 0:
+        scriptString = _get_script_string()
+    ctx = _get_context()
+    ctx.script.setScriptString(scriptString)
     reset_output_flag(outputs)
+    future = executor.submit(_execute_async, ctx.ml, ctx.script, outputs, intermediates, matrix.intermediates, ret)
+    for m in outputs:
+        m._future = future
+    _release_evaluation(outputs)
+    return future
+
+def _row_blocks(data, numRowsPerBlock, format):
+    """
+    Returns a generator over the blocks of numRowsPerBlock consecutive rows of the given NumPy array, Pandas DataFrame or scipy sparse matrix.
+    """
+    if isinstance(data, pd.DataFrame):
+        data = data.values
+    elif isinstance(data, spmatrix):
+        # coo_matrix does not support range indexing
+        data = data.tocsr()
+    for rl in range(0, data.shape[0], numRowsPerBlock):
+        block = data[rl:rl+numRowsPerBlock]
+        if format == 'numpy' and isinstance(block, spmatrix):
+            block = block.toarray()
+        elif format == 'scipy' and not isinstance(block, spmatrix):
+            block = csr_matrix(block)
+        yield block
+
+def _df_row_blocks(df, numRowsPerBlock, format):
+    """
+    Returns a generator over the blocks of numRowsPerBlock consecutive rows of the given PySpark DataFrame (see _row_blocks).
+    The rows are ordered by the ID column (if any) and fetched one partition at a time, hence the driver holds at most one partition.
+    """
+    if '__INDEX' in df.columns:
+        df = df.orderBy('__INDEX').drop('__INDEX')
+    rows = []
+    for row in df.toLocalIterator():
+        # Vector columns are expanded into their values
+        rows.append(np.hstack([ x.toArray() if hasattr(x, 'toArray') else x for x in row ]))
+        if len(rows) == numRowsPerBlock:
+            yield _df_block(rows, format)
+            rows = []
+    if len(rows) > 0:
+        yield _df_block(rows, format)
+
+def _df_block(rows, format):
+    """
+    Returns the given rows (NumPy arrays of equal length) as NumPy array or scipy.sparse.csr_matrix depending on the format.
+    """
+    block = np.array(rows, dtype=np.double)
+    return csr_matrix(block) if format == 'scipy' else block
 
+def _prefetch(blocks, size):
+    """
+    Returns a generator over the given blocks, which are produced by a background thread at most size blocks ahead of the consumer.
+    The background thread stops once the returned generator is closed (for example: if the consumer breaks out of the loop).
+    """
+    buf = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    def put(item):
+        while not stop.is_set():
+            try:
+                buf.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    def produce():
+        try:
+            for block in blocks:
+                if not put((True, block)):
+                    return
+            put((False, None))
+        except Exception as e:
+            put((False, e))
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            isBlock, value = buf.get()
+            if isBlock:
+                yield value
+            elif value is not None:
+                raise value
+            else:
+                return
+    finally:
+        stop.set()
 
 def debug_array_conversion(throwError):
     matrix.THROW_ARRAY_CONVERSION_ERROR = throwError
     
 def _get_new_var_id():
-    matrix.systemmlVarID += 1
-    return 'mVar' + str(matrix.systemmlVarID)
+    ctx = _get_context()
+    ctx.systemmlVarID += 1
+    return ctx.prefix + str(ctx.systemmlVarID)
+
+# Matches the variable IDs returned by _get_new_var_id
+_VAR_ID_PATTERN = re.compile(r'\bmVar\d+(?:_\d+)?\b')
 
 ###############################################################################
 
+# First line of print_ast if the pending operations are simplified before evaluation
+_UNSIMPLIFIED_HEADER = '# Unsimplified DAG (see set_simplifier)\n'
+
 class matrix(object):
     """
     matrix class is a python wrapper that implements basic matrix operators, matrix functions
@@ -416,7 +2551,15 @@ class matrix(object):
        Then the left-indexed matrix is set to be backed by DMLOp consisting of following pydml:
        left-indexed-matrix = new-deep-copied-matrix
        left-indexed-matrix[index] = value
-    7. Please use m.print_ast() and/or  type `m` for debugging. Here is a sample session:
+       Subsequent left indexing operations are appended to the same DMLOp as long as the left-indexed matrix is not used by other operations,
+       and assignments of scalars to cells (or of rows) are coalesced into a single bulk update.
+    7. Identical operations on identical inputs (for example: X.transpose().dot(X) written twice) are computed only once.
+       The second matrix object is backed by a DMLOp that simply renames the output of the first one.
+    8. The DMLOp created for an operator or built-in function also records the computed expression (name, arguments and parameters).
+       Before the script is generated, the algebraic simplifier (see set_simplifier) uses these expressions to rewrite the op of the
+       unevaluated matrix objects in-place (for example: (X * 2) * 3 => X * 6 and X.transpose().transpose() => X).
+       The expressions also allow to emit the single-use intermediates as nested expressions (see set_nested_expressions).
+    9. Please use m.print_ast() and/or  type `m` for debugging. Here is a sample session:
     
        >>> npm = np.ones((3,3))
        >>> m1 = sml.matrix(npm + 3)
@@ -428,27 +2571,41 @@ class matrix(object):
        mVar3 = mVar1 + mVar2
        save(mVar3, " ")
        >>> m3.print_ast()
-       - [mVar3] (op).
+       # Unsimplified DAG (see set_simplifier)
+       - [mVar3] (op: +).
          - [mVar1] (data).
          - [mVar2] (data).    
     
     """
-    # Global variable that is used to keep track of intermediate matrix variables in the DML script
-    systemmlVarID = 0
+    # The state of the script generation (for example: the collected PyDML statements and the variable IDs) is kept
+    # in the EvaluationContext of the current thread
 
-    # Since joining of string is expensive operation, we collect the set of strings into list and then join
-    # them before execution: See matrix.script.scriptString = ''.join(matrix.dml) in eval() method
-    dml = []
+    # Represents MLContext object (set by setSparkContext)
+    ml = None
 
-    # Represents MLContext's script object
-    script = None
+    # Maps the canonical script to the script precompiled via JMLC (see set_plan_cache). None if the plan cache is disabled.
+    plans = None
+    max_plans = 32
 
-    # Represents MLContext object
-    ml = None
+    # Represents JMLC's connection used to precompile the cached plans
+    jmlc = None
+
+    # Cache of the JVM-side intermediate matrices keyed by their ID (see set_intermediate_cache). None if the cache is disabled.
+    intermediates = None
+
+    # Executes the scripts submitted by eval_async in the background
+    executor = None
 
-    # Contains list of nodes visited in Abstract Syntax Tree. This helps to avoid computation of matrix objects
-    # that have been previously evaluated.
-    visited = []
+    # Cache of the Java MatrixBlocks converted from the data of the leaf nodes keyed by their ID (see set_input_cache). None if the cache is disabled.
+    input_blocks = None
+    # True if the cached inputs are verified via a checksum of their data (see set_input_cache)
+    verify_inputs = False
+
+    # True if the DAG is simplified before the script is generated (see set_simplifier)
+    simplify = True
+
+    # Maximum nesting depth of the emitted expressions (see set_nested_expressions). 0 disables the nested expressions.
+    max_nesting_depth = 16
     
     def __init__(self, data, op=None):
         """
@@ -460,17 +2617,25 @@ class matrix(object):
         """
         self.dtype = np.double
         check_MLContext()
-        self.visited = False
-        self.output = False
         self.ID = _get_new_var_id()
+        # Weak references to the operations using this matrix as input (see _consumers), i.e. an operation (and hence
+        # its lineage) is garbage collected once the matrix computed by it is no longer referenced by the user.
         self.referenced = []
+        self._cse_key = None
         # op refers to the node of Abstract Syntax Tree created internally for lazy evaluation
         self.op = op
+        # Pending asynchronous evaluation of this matrix (see eval_async)
+        self._future = None
         self.eval_data = data
+        # Statically inferred shape and estimated fraction of non-zeros (None if unknown)
         self._shape = None
+        self._sparsity = None
         if isinstance(data, SUPPORTED_TYPES):
             self._shape = data.shape
-        if not (isinstance(data, SUPPORTED_TYPES) or hasattr(data, '_jdf') or (data is None and op is not None)):
+            self._sparsity = 1.0
+            if isinstance(data, spmatrix) and data.shape[0]*data.shape[1] > 0:
+                self._sparsity = float(data.nnz) / (data.shape[0]*data.shape[1])
+        if not (isinstance(data, SUPPORTED_TYPES) or hasattr(data, '_jdf') or op is not None):
             raise TypeError('Unsupported input type')
 
     def eval(self):
@@ -478,16 +2643,124 @@ class matrix(object):
         This is a convenience function that calls the global eval method
         """
         eval([self])
+
+    def eval_async(self):
+        """
+        This is a convenience function that calls the global eval_async method and returns a future whose result is this matrix
+        """
+        return eval_async(self)
+
+    def _get_eval_data(self):
+        # Waits for the pending asynchronous evaluation (if any)
+        future = self._future
+        if future is not None:
+            exception = future.exception()
+            self._future = None
+            if exception is not None:
+                raise exception
+            self._drop_lineage()
+        return self._eval_data
+
+    def _set_eval_data(self, data):
+        self._eval_data = data
+
+    eval_data = property(fget=_get_eval_data, fset=_set_eval_data)
         
+    def _convert_java_eval_data(self, format='numpy'):
+        """
+        Converts the Java object computed by eval method (if any) into the corresponding Python object.
+        MatrixBlocks are converted into NumPy array or scipy.sparse.csr_matrix depending on the format (see fetch).
+        """
+        if isinstance(self.eval_data, py4j.java_gateway.JavaObject):
+            if self.eval_data.getClass().getSimpleName() == 'MatrixBlock':
+                # Computed by a cached plan (see set_plan_cache)
+                self.eval_data = convertMatrixBlock(matrix.sc, self.eval_data, format)
+            else:
+                self.eval_data = _java2py(SparkContext._active_spark_context, self.eval_data)
+
+    def _drop_lineage(self):
+        """
+        Drops the op of this matrix once its data is computed, so that its unevaluated lineage can be garbage collected.
+        """
+        if self._future is None and self._eval_data is not None:
+            self.op = None
+
+    def estimate(self, budget=None):
+        """
+        Statically estimates the memory required to evaluate this matrix without executing the script. The shapes and sparsity
+        inferred for the pending operations are propagated through the DAG and, similar to SystemML, the size of every matrix is
+        estimated in dense or sparse format (the matrices with unknown sparsity are assumed to be dense). An operation is executed
+        in the driver (CP) if the size of its inputs and output fits into the memory budget, else (or if its size is unknown) by Spark.
+
+        >>> m = X.transpose().dot(X) + 1
+        >>> result = m.toNumPy() if m.estimate()['exec_type'] == 'CP' else m.toDF()
+
+        Parameters
+        ----------
+        budget: memory budget (in bytes) of the operations executed in the driver. By default, the budget of SystemML is used
+                (i.e. 70% of the maximum heap size of the driver).
+
+        Returns
+        -------
+        dict with the entries 'nodes' (pandas.DataFrame with one row per matrix of the DAG in the order of evaluation: the operation,
+        the shape, the sparsity, the size in dense and sparse format, the estimated size and memory of the operation in bytes
+        as well as the execution type), 'output_bytes' (estimated size of this matrix), 'peak_bytes' (maximum memory of the operations
+        executed in the driver), 'budget' and 'exec_type' ('SPARK' if any operation is executed by Spark, else 'CP').
+        Unknown estimates are reported as None (NaN in the DataFrame).
+        """
+        if budget is None:
+            budget = _local_mem_budget()
+        sizes = {}
+        rows = []
+        # Post-order traversal of the DAG (see _visit)
+        visited = set([ id(self) ])
+        stack = [ [self, -1] ]
+        while len(stack) > 0:
+            entry = stack[-1]
+            m = entry[0]
+            entry[1] += 1
+            inputs = m.op.inputs if _is_pending(m) else []
+            if entry[1] < len(inputs):
+                if id(inputs[entry[1]]) not in visited:
+                    visited.add(id(inputs[entry[1]]))
+                    stack.append([ inputs[entry[1]], -1 ])
+                continue
+            stack.pop()
+            operation, shape, sparsity, dense, sparse, size, memory, execType = _estimate_node(m, sizes, budget)
+            sizes[id(m)] = size
+            rows.append((m.ID, operation, None if shape is None else shape[0], None if shape is None else shape[1], sparsity, dense, sparse, size, memory, execType))
+        nodes = pd.DataFrame(rows, columns=[ 'ID', 'operation', 'rows', 'cols', 'sparsity', 'dense_bytes', 'sparse_bytes', 'output_bytes', 'memory_bytes', 'exec_type' ]).set_index('ID')
+        cp = [ r[8] for r in rows if r[9] == 'CP' ]
+        return { 'nodes': nodes, 'output_bytes': sizes[id(self)], 'peak_bytes': max(cp) if len(cp) > 0 else 0, 'budget': budget,
+            'exec_type': 'SPARK' if any(r[9] == 'SPARK' for r in rows) else 'CP' }
+
+    def release(self):
+        """
+        Releases the JVM-side copies of this matrix held by the input cache (see set_input_cache) and the intermediate cache (see set_intermediate_cache).
+        The copies are also released automatically once this matrix is garbage collected.
+        """
+        _release_id(self.ID)
+
+    def _input_data(self):
+        """
+        Returns the data if this matrix is evaluated or cached by the intermediate cache (see set_intermediate_cache), else None.
+        """
+        if self.eval_data is not None:
+            return self.eval_data
+        elif matrix.intermediates is not None:
+            return matrix.intermediates.get(self.ID)
+        return None
+
     def toPandas(self):
         """
         This is a convenience function that calls the global eval method and then converts the matrix object into Pandas DataFrame.
         """
         self.eval()
-        if isinstance(self.eval_data, py4j.java_gateway.JavaObject):
-            self.eval_data = _java2py(SparkContext._active_spark_context, self.eval_data)
+        self._convert_java_eval_data()
         if isinstance(self.eval_data, Matrix):
             self.eval_data = self.eval_data.toNumPy()
+        elif isinstance(self.eval_data, spmatrix):
+            self.eval_data = self.eval_data.toarray()
         self.eval_data = convertToPandasDF(self.eval_data)
         return self.eval_data
 
@@ -496,8 +2769,7 @@ class matrix(object):
         This is a convenience function that calls the global eval method and then converts the matrix object into NumPy array.
         """
         self.eval()
-        if isinstance(self.eval_data, py4j.java_gateway.JavaObject):
-            self.eval_data = _java2py(SparkContext._active_spark_context, self.eval_data)
+        self._convert_java_eval_data()
         if isinstance(self.eval_data, Matrix):
             self.eval_data = self.eval_data.toNumPy()
             return self.eval_data
@@ -512,14 +2784,107 @@ class matrix(object):
         # Always keep default format as NumPy array if possible
         return self.eval_data
 
+    def toSciPy(self):
+        """
+        This is a convenience function that calls the global eval method and then converts the matrix object into scipy.sparse.csr_matrix.
+        Unlike toNumPy, the result is transferred from the JVM in CSR format (values, column indices and row pointers) and is never densified.
+        """
+        self.eval()
+        self._convert_java_eval_data(format='scipy')
+        if isinstance(self.eval_data, Matrix):
+            self.eval_data = self.eval_data.toSciPy()
+        elif not isinstance(self.eval_data, spmatrix):
+            self.eval_data = csr_matrix(self.toNumPy())
+        elif not isinstance(self.eval_data, csr_matrix):
+            self.eval_data = self.eval_data.tocsr()
+        return self.eval_data
+
+    def fetch(self, format='auto'):
+        """
+        This is a convenience function that calls the global eval method and then converts the matrix object into NumPy array or scipy.sparse.csr_matrix.
+
+        Parameters
+        ----------
+        format: string
+            'numpy' (same as toNumPy), 'scipy' (same as toSciPy) or 'auto' (default). If 'auto', the result is returned as
+            scipy.sparse.csr_matrix if SystemML stores it in sparse format or its sparsity is below 0.4, else as NumPy array.
+            Python-side data (for example: a matrix backed by NumPy array) is returned as is.
+
+        Examples
+        --------
+        >>> X = sml.matrix(np.random.rand(1000, 1000))
+        >>> Y = (X > 0.999).fetch()
+        >>> type(Y)
+        <class 'scipy.sparse.csr.csr_matrix'>
+        """
+        if format == 'numpy':
+            return self.toNumPy()
+        elif format == 'scipy':
+            return self.toSciPy()
+        elif format != 'auto':
+            raise ValueError('Unsupported format:' + str(format) + '. Expected auto, numpy or scipy')
+        self.eval()
+        self._convert_java_eval_data(format='auto')
+        if isinstance(self.eval_data, Matrix):
+            self.eval_data = self.eval_data.fetch(format='auto')
+        if isinstance(self.eval_data, (np.ndarray, spmatrix)):
+            return self.eval_data
+        return self.toNumPy()
+
+    def iter_row_blocks(self, block_size=1024, format='numpy', prefetch=2):
+        """
+        Evaluates this matrix (once) and returns a generator over its blocks of block_size consecutive rows (the last block may be smaller).
+        Unlike toNumPy, the result is kept in the JVM and only one block at a time is transferred to Python. A background thread
+        converts at most prefetch blocks ahead of the consumer, hence the memory used by Python does not depend on the number of rows.
+        Python-side data (for example: a matrix backed by NumPy array) is sliced as is. A result larger than the prefetched blocks
+        (as well as a matrix backed by PySpark DataFrame) is streamed from its DataFrame one partition at a time (see toLocalIterator),
+        hence the driver does not collect the whole matrix either.
+
+        Parameters
+        ----------
+        block_size: int
+            Number of rows per block.
+        format: string
+            'numpy' (default), 'scipy' or 'auto' (see fetch). If 'auto', the format is chosen once for all the blocks.
+        prefetch: int
+            Number of blocks converted ahead of the consumer. If 0, the blocks are converted in the calling thread.
+
+        Examples
+        --------
+        >>> scores = sml.matrix(X).dot(w)
+        >>> with open('scores.csv', 'wb') as f:
+        ...     for block in scores.iter_row_blocks(block_size=10000):
+        ...         np.savetxt(f, block, delimiter=',')
+        """
+        if block_size < 1:
+            raise ValueError('Expected positive block_size, got ' + str(block_size))
+        if format not in ('auto', 'numpy', 'scipy'):
+            raise ValueError('Unsupported format:' + str(format) + '. Expected auto, numpy or scipy')
+        if self.eval_data is None:
+            self.eval()
+        data = self.eval_data
+        if isinstance(data, py4j.java_gateway.JavaObject) and data.getClass().getSimpleName() == 'Matrix':
+            data = Matrix(data, matrix.sc)
+        if isinstance(data, Matrix):
+            numRows = data._java_matrix.getMatrixMetadata().getNumRows()
+            if numRows is None or numRows < 0 or numRows > (prefetch + 1) * block_size:
+                # Collecting the result into a MatrixBlock would require the driver to hold the whole matrix
+                data = data.toDF()
+        if isinstance(data, DataFrame):
+            blocks = _df_row_blocks(data, block_size, format)
+        elif isinstance(data, SUPPORTED_TYPES):
+            blocks = _row_blocks(data, block_size, format)
+        else:
+            blocks = convertMatrixBlockRows(matrix.sc, _to_matrix_block(self, data), block_size, format)
+        return _prefetch(blocks, prefetch) if prefetch > 0 else blocks
+
     def toDF(self):
         """
         This is a convenience function that calls the global eval method and then converts the matrix object into DataFrame.
         """
         if isinstance(self.eval_data, DataFrame):
             return self.eval_data
-        if isinstance(self.eval_data, py4j.java_gateway.JavaObject):
-            self.eval_data = _java2py(SparkContext._active_spark_context, self.eval_data)
+        self._convert_java_eval_data()
         if isinstance(self.eval_data, Matrix):
             self.eval_data = self.eval_data.toDF()
             return self.eval_data
@@ -535,29 +2900,68 @@ class matrix(object):
         file: filepath
         format: can be csv, text or binary or mm
         """
-        tmp = construct_intermediate_node([self], ['save(', self.ID , ',\"', file, '\", format=\"', format, '\")\n'])
-        construct_intermediate_node([tmp], [OUTPUT_ID, ' = full(0, rows=1, cols=1)\n']).eval()
+        # The save statement is executed without a placeholder output, as it has no output
+        construct_intermediate_node([self], ['save(', self.ID , ',\"', file, '\", format=\"', format, '\")\n']).eval()
     
-    def _mark_as_visited(self):
-        self.visited = True
+    def _estimated_bytes(self):
+        """
+        Returns the estimated size of this matrix in bytes (see _size_in_memory). A matrix with unknown sparsity is assumed to be dense.
+        If the shape is not known, the size of the largest input is used (which holds for element-wise operations).
+        """
+        shape = _static_shape(self._shape)
+        if shape is not None:
+            return _size_in_memory(shape[0], shape[1], 1.0 if self._sparsity is None else self._sparsity)
+        if self.op is None:
+            return 0
+        return max([ m._estimated_bytes() if m.op is None or m._eval_data is not None else m.op.out_bytes for m in self.op.inputs if isinstance(m, matrix) ] + [ 0 ])
+
+    def _resolve_alias(self):
+        """
+        Returns the matrix object whose computation is shared by this object (see _alias) or self.
+        """
+        if self._future is None and self._eval_data is None and self.op is not None and self.op.is_alias:
+            return self.op.inputs[0]
+        return self
+
+    def _add_consumer(self, op):
+        refs = self.referenced
+        if len(refs) >= 64 and len(refs) & (len(refs) - 1) == 0:
+            # Removes the references to the garbage collected operations (amortized over the appends)
+            refs[:] = [ r for r in refs if r() is not None ]
+        refs.append(weakref.ref(op))
+
+    def _consumers(self):
+        """
+        Returns the operations using this matrix as input that are not yet garbage collected.
+        """
+        ret = [ r() for r in self.referenced ]
+        return [ op for op in ret if op is not None ]
+
+    def _mark_as_visited(self, ctx):
+        ctx.visited_ids.add(id(self))
         # for cleanup
-        matrix.visited = matrix.visited + [ self ]
+        ctx.visited.append(self)
         return self
 
-    def _register_as_input(self, execute):
+    def _register_as_input(self, execute, data):
+        ctx = _get_context()
         # TODO: Remove this when automatic registration of frame is resolved
-        matrix.dml = [ self.ID,  ' = load(\" \", format=\"csv\")\n'] + matrix.dml
-        if isinstance(self.eval_data, SUPPORTED_TYPES) and execute:
-            matrix.script.input(self.ID, convertToMatrixBlock(matrix.sc, self.eval_data))
+        ctx.input_dml.append(self.ID + ' = load(\" \", format=\"csv\")\n')
+        if isinstance(data, SUPPORTED_TYPES) and execute:
+            ctx.script.input(self.ID, _convert_input(self, data))
+        elif isinstance(data, py4j.java_gateway.JavaObject) and execute:
+            # Matrix or MatrixBlock computed by previous evaluation
+            ctx.script.input(self.ID, data)
         elif execute:
-            matrix.script.input(self.ID, self.toDF())
+            ctx.script.input(self.ID, self.toDF())
         return self
 
     def _register_as_output(self, execute):
+        ctx = _get_context()
         # TODO: Remove this when automatic registration of frame is resolved
-        matrix.dml = matrix.dml + ['save(',  self.ID, ', \" \")\n']
+        ctx.dml.extend(['save(',  self.ID, ', \" \")\n'])
         if execute:
-            matrix.script.output(self.ID)
+            ctx.script.output(self.ID)
         
     def _visit(self, execute=True):
         """
@@ -565,22 +2969,65 @@ class matrix(object):
         1. For printing the PyDML script which has not yet been evaluated (execute=False). See '__repr__' method.
         2. Called as part of 'eval' method (execute=True). In this scenario, it builds the PyDML script by visiting itself
         and its child nodes. Also, it does appropriate registration as input or output that is required by MLContext.
+
+        The nodes are visited in depth-first order using an explicit stack (rather than recursion), which requires
+        time and memory linear in the number of nodes and supports arbitrarily deep DAGs.
+        """
+        ctx = _get_context()
+        # Each entry of the stack is the node and the index of its next input to visit
+        stack = [ [self, -1] ]
+        while len(stack) > 0:
+            entry = stack[-1]
+            m = entry[0]
+            if entry[1] == -1:
+                if id(m) in ctx.visited_ids:
+                    stack.pop()
+                    continue
+                m._mark_as_visited(ctx)
+                data = m._input_data()
+                if data is not None:
+                    start = len(ctx.input_dml)
+                    m._register_as_input(execute, data)
+                    if ctx.emitted is not None:
+                        ctx.emitted.append((m, 'input', start, len(ctx.input_dml)))
+                    m._visit_done(execute)
+                    stack.pop()
+                    continue
+                elif m.op is None:
+                    raise Exception('Expected either op or data to be set')
+                m.op._prepare()
+            entry[1] += 1
+            if entry[1] < len(m.op.inputs):
+                # Traverse the AST
+                stack.append([ m.op.inputs[entry[1]], -1 ])
+            else:
+                start = len(ctx.dml)
+                if id(m) in ctx.inline_ids:
+                    m._inline(ctx)
+                else:
+                    m.op._visit(execute=execute)
+                m._visit_done(execute)
+                if ctx.emitted is not None:
+                    ctx.emitted.append((m, 'dml', start, len(ctx.dml)))
+                stack.pop()
+        return self
+
+    def _inline(self, ctx):
         """
-        if self.visited:
-            return self
-        self._mark_as_visited()
-        if self.eval_data is not None:
-            self._register_as_input(execute)
-        elif self.op is not None:
-            # Traverse the AST
-            for m in self.op.inputs:
-                m._visit(execute=execute)
-            self.op._visit(execute=execute)
-        else:
-            raise Exception('Expected either op or data to be set')
-        if self.eval_data is None and self.output:
+        Keeps the expression of this matrix to be nested into its only consumer (see set_nested_expressions) or emits it
+        as a statement if the maximum nesting depth is reached.
+        """
+        expression, depth = self.op._expression(ctx)
+        if depth >= matrix.max_nesting_depth:
+            ctx.dml.extend([ self.ID, ' = ', expression, '\n' ])
+            return
+        if self.op.expr[0].startswith(' ') or self.op.expr[0] == '-':
+            expression = '(' + expression + ')'
+        ctx.inlined[self.ID] = (expression, depth)
+
+    def _visit_done(self, execute):
+        if self.eval_data is None and id(self) in _get_context().outputs and self.op.has_output:
             self._register_as_output(execute)
-        return self
 
     def print_ast(self):
         """
@@ -596,27 +3043,35 @@ class matrix(object):
         mVar3 = mVar1 + mVar2
         save(mVar3, " ")
         >>> m3.print_ast()
-        - [mVar3] (op).
+        # Unsimplified DAG (see set_simplifier)
+        - [mVar3] (op: +).
           - [mVar1] (data).
           - [mVar2] (data).
         """
-        return self._print_ast(0)
+        # The simplifier rewrites the DAG in-place (see set_simplifier), hence the DAG is printed as constructed
+        header = _UNSIMPLIFIED_HEADER if matrix.simplify and _is_pending(self) else ''
+        print(header + self._print_ast(0))
     
     def _print_ast(self, numSpaces):
-        head = ''.join([ ' ' ]*numSpaces + [ '- [', self.ID, '] ' ])
-        if self.eval_data is not None:
-            out = head + '(data).\n'
-        elif self.op is not None:
-            ret = [ head, '(op).\n' ]
-            for m in self.op.inputs:
-                ret = ret + [ m._print_ast(numSpaces + 2) ]
-            out = ''.join(ret)
-        else:
-            raise ValueError('Either op or data needs to be set')
-        if numSpaces == 0:
-            print(out)
-        else:
-            return out
+        ret = []
+        # Shared nodes are expanded only once, which keeps the output linear in the number of nodes
+        printed = set()
+        stack = [ (self, numSpaces) ]
+        while len(stack) > 0:
+            m, indent = stack.pop()
+            head = ''.join([ ' ' ]*indent + [ '- [', m.ID, '] ' ])
+            if m.eval_data is not None:
+                ret.append(head + '(data).\n')
+            elif m.op is None:
+                raise ValueError('Either op or data needs to be set')
+            elif id(m) in printed:
+                ret.append(head + '(op, see above).\n')
+            else:
+                printed.add(id(m))
+                ret.append(head + ('(op).\n' if m.op.expr is None else '(op: ' + m.op.expr[0].strip() + ').\n'))
+                m.op._prepare()
+                stack.extend([ (i, indent + 2) for i in reversed(m.op.inputs) ])
+        return ''.join(ret)
 
     def __repr__(self):
         """
@@ -664,6 +3119,10 @@ class matrix(object):
         raise NotImplementedError('Reshaping is not implemented')
     
     def get_shape(self):
+        """
+        Returns the shape of the matrix. The shape is inferred statically from the operations, hence the script is only executed
+        if the shape depends on the data (for example: load or remove_empty).
+        """
         if self._shape is None:
             lhsStr, inputs = _matricize(self, [])
             rlen_ID = _get_new_var_id()
@@ -679,30 +3138,54 @@ class matrix(object):
     
     shape = property(fget=get_shape, fset=set_shape)
     
-    def __numpy_ufunc__(self, func, method, pos, inputs, **kwargs):
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
         """
-        This function enables systemml matrix to be compatible with NumPy's ufuncs.
+        This function enables systemml matrix to be compatible with NumPy's ufuncs. For example: np.exp(m), np.add(m, 1),
+        np.add.reduce(m, axis=0) and np.add.accumulate(m) are lazily evaluated by SystemML.
+        Unsupported ufuncs are executed by NumPy after converting the matrices into NumPy arrays (see debug_array_conversion).
         
         Parameters
         ----------
-        func:  ufunc object that was called.
+        ufunc:  ufunc object that was called.
         method: string indicating which Ufunc method was called (one of "__call__", "reduce", "reduceat", "accumulate", "outer", "inner").
-        pos: index of self in inputs.
         inputs:  tuple of the input arguments to the ufunc
         kwargs: dictionary containing the optional input arguments of the ufunc.
         """
-        if method != '__call__' or kwargs:
-            return NotImplemented
-        if func in matrix._numpy_to_systeml_mapping:
-            fn = matrix._numpy_to_systeml_mapping[func]
-        else:
+        inputs = tuple(_as_matrix(_from_numpy_scalar(x)) for x in inputs)
+        ret = NotImplemented
+        if method == '__call__' and not kwargs and ufunc in matrix._numpy_to_systeml_mapping and len(inputs) in [1, 2]:
+            ret = matrix._numpy_to_systeml_mapping[ufunc](*inputs)
+        elif method in ['reduce', 'accumulate'] and len(inputs) == 1:
+            kwargs = dict(kwargs)
+            axis = kwargs.pop('axis', 0)
+            kwargs.pop('keepdims', None)
+            axis = _matrix_axis(axis)
+            if all(_is_default(v) for v in kwargs.values()):
+                # PyDML only supports full aggregation for prod and column-wise cumsum
+                if method == 'reduce' and ufunc in _NUMPY_REDUCTIONS and (axis is None or ufunc is not np.multiply):
+                    ret = inputs[0]._aggFn(_NUMPY_REDUCTIONS[ufunc], axis)
+                elif method == 'accumulate' and ufunc is np.add and axis == 0:
+                    ret = inputs[0].cumsum(axis=0)
+        if ret is NotImplemented:
+            if any(isinstance(x, matrix) for x in kwargs.get('out', ())):
+                return NotImplemented
+            return getattr(ufunc, method)(*_to_numpy(inputs), **_to_numpy(kwargs))
+        return ret
+
+    def __array_function__(self, func, types, args, kwargs):
+        """
+        This function enables systemml matrix to be compatible with NumPy's functions np.dot, np.hstack, np.vstack, np.sum,
+        np.mean and np.transpose, which are lazily evaluated by SystemML.
+        Other functions are executed by NumPy after converting the matrices into NumPy arrays (see debug_array_conversion).
+        """
+        if not all(issubclass(t, (matrix, np.ndarray)) for t in types):
             return NotImplemented
-        if len(inputs) == 2:
-            return fn(inputs[0], inputs[1])
-        elif  len(inputs) == 1:
-            return fn(inputs[0])
-        else:
-            raise ValueError('Unsupported number of inputs')
+        ret = NotImplemented
+        if func in _NUMPY_FUNCTIONS:
+            ret = _NUMPY_FUNCTIONS[func](*args, **kwargs)
+        if ret is NotImplemented:
+            return func(*_to_numpy(args), **_to_numpy(kwargs))
+        return ret
 
     def hstack(self, other):
         """
@@ -719,44 +3202,43 @@ class matrix(object):
     ######################### Arithmetic operators ######################################
 
     def negative(self):
-        lhsStr, inputs = _matricize(self, [])
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = -', lhsStr, '\n'])
+        return _construct_expr_node('-', [self], None, _shape_of(self), self._sparsity, isinstance(self, scalar))
                 
     def remainder(self, other):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
         rhsStr, inputs = _matricize(other, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = floor(', lhsStr, '/', rhsStr, ') * ', rhsStr, '\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = floor(', lhsStr, '/', rhsStr, ') * ', rhsStr, '\n'], _broadcast_shape(self, _as_matrix(other)))
     
     def ldexp(self, other):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
         rhsStr, inputs = _matricize(other, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, '* (2**', rhsStr, ')\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, '* (2**', rhsStr, ')\n'], _broadcast_shape(self, _as_matrix(other)))
         
     def mod(self, other):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
         rhsStr, inputs = _matricize(other, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, ' - floor(', lhsStr, '/', rhsStr, ') * ', rhsStr, '\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, ' - floor(', lhsStr, '/', rhsStr, ') * ', rhsStr, '\n'], _broadcast_shape(self, _as_matrix(other)))
     
     def logaddexp(self, other):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
         rhsStr, inputs = _matricize(other, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = log(exp(', lhsStr, ') + exp(', rhsStr, '))\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = log(exp(', lhsStr, ') + exp(', rhsStr, '))\n'], _broadcast_shape(self, _as_matrix(other)))
     
     def logaddexp2(self, other):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
         rhsStr, inputs = _matricize(other, inputs)
         opStr =  _log_base('2**' + lhsStr + '2**' + rhsStr, 2)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', opStr, '\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', opStr, '\n'], _broadcast_shape(self, _as_matrix(other)))
 
     def log1p(self):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = log(1 + ', lhsStr, ')\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = log(1 + ', lhsStr, ')\n'], _shape_of(self), self._sparsity)
         
     def exp(self):
         return unaryMatrixFunction(self, 'exp')
@@ -764,36 +3246,34 @@ class matrix(object):
     def exp2(self):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = 2**', lhsStr, '\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = 2**', lhsStr, '\n'], _shape_of(self))
     
     def square(self):
-        inputs = []
-        lhsStr, inputs = _matricize(self, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, '**2\n'])    
+        return binary_op(self, 2, ' ** ')
     
     def reciprocal(self):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = 1/', lhsStr, '\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = 1/', lhsStr, '\n'], _shape_of(self))
         
     def expm1(self):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = exp(', lhsStr, ') - 1\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = exp(', lhsStr, ') - 1\n'], _shape_of(self), self._sparsity)
     
     def ones_like(self):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
         rlen = lhsStr + '.shape(axis=0)'
         clen = lhsStr + '.shape(axis=1)'
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = full(1, rows=', rlen, ', cols=', clen, ')\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = full(1, rows=', rlen, ', cols=', clen, ')\n'], _shape_of(self), 1.0)
     
     def zeros_like(self):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
         rlen = lhsStr + '.shape(axis=0)'
         clen = lhsStr + '.shape(axis=1)'
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = full(0, rows=', rlen, ', cols=', clen, ')\n'])    
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = full(0, rows=', rlen, ', cols=', clen, ')\n'], _shape_of(self), 0.0)
     
     def log2(self):
         return self.log(2)
@@ -868,7 +3348,7 @@ class matrix(object):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
         # 180/pi = 57.2957795131
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, '*57.2957795131\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, '*57.2957795131\n'], _shape_of(self), self._sparsity)
     
     def deg2rad(self):
         """
@@ -877,7 +3357,7 @@ class matrix(object):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
         # pi/180 = 0.01745329251
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, '*0.01745329251\n'])    
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = ', lhsStr, '*0.01745329251\n'], _shape_of(self), self._sparsity)    
     
     def sign(self):
         return unaryMatrixFunction(self, 'sign')    
@@ -982,7 +3462,7 @@ class matrix(object):
     def logical_not(self):
         inputs = []
         lhsStr, inputs = _matricize(self, inputs)
-        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = !', lhsStr, '\n'])
+        return construct_intermediate_node(inputs, [OUTPUT_ID, ' = !', lhsStr, '\n'], _shape_of(self))
     
     def remove_empty(self, axis=None):
         """
@@ -1037,7 +3517,9 @@ class matrix(object):
             else:
                 dml_script = dml_script + [key, '=', str(v) ]
         dml_script = dml_script + [ ')\n' ]
-        return construct_intermediate_node(inputs, dml_script)
+        # The shape of removeEmpty depends on the data
+        shape = _shape_of(self) if fnName == 'replace' else None
+        return construct_intermediate_node(inputs, dml_script, shape)
             
     ######################### Aggregation functions ######################################
 
@@ -1093,28 +3575,48 @@ class matrix(object):
         elif moment == 2:
             return self.var(axis)
         elif moment == 3 or moment == 4:
-            return self._moment_helper(moment, axis)
+            return self._central_moment(moment, axis)
         else:
             raise ValueError('The specified moment is not supported:' + str(moment))
+
+    def _central_moment(self, k, axis):
+        """
+        Computes the kth central moment (normalized by the number of cells like scipy.stats.moment) by column-wise/row-wise
+        aggregations of the powers of the centered matrix, which are shared by the moments of the same matrix.
+        """
+        if axis not in (None, 0, 1):
+            raise ValueError('axis should be either 0 or 1, but got ' + str(axis))
+        centered = self - self.mean(axis)
+        squared = centered * centered
+        if k == 2:
+            return squared.mean(axis)
+        elif k == 3:
+            return (squared * centered).mean(axis)
+        return (squared * squared).mean(axis)
+
+    def skew(self, axis=None):
+        """
+        Computes the sample skewness (i.e. the biased estimator like scipy.stats.skew) along the specified axis
         
-    def _moment_helper(self, k, axis=0):
-        dml_script = ''
-        lhsStr, inputs = _matricize(self, [])
-        dml_script = [OUTPUT_ID, ' = moment(', lhsStr, ', ', str(k), ')\n' ]
-        dml_script = [OUTPUT_ID, ' = moment(', lhsStr, ', ', str(k), ')\n' ]
-        if axis is None:
-            dml_script = [OUTPUT_ID, ' = moment(full(', lhsStr, ', rows=length(', lhsStr, '), cols=1), ', str(k), ')\n' ]
-        elif axis == 0:
-            dml_script = [OUTPUT_ID, ' = full(0, rows=nrow(', lhsStr, '), cols=1)\n' ]
-            dml_script = dml_script + [ 'parfor(i in 1:nrow(', lhsStr, '), check=0):\n' ]
-            dml_script = dml_script + [ '\t', OUTPUT_ID, '[i-1, 0] = moment(full(', lhsStr, '[i-1,], rows=ncol(', lhsStr, '), cols=1), ', str(k), ')\n\n' ]
-        elif axis == 1:
-            dml_script = [OUTPUT_ID, ' = full(0, rows=1, cols=ncol(', lhsStr, '))\n' ]
-            dml_script = dml_script + [ 'parfor(i in 1:ncol(', lhsStr, '), check=0):\n' ]
-            dml_script = dml_script + [ '\t', OUTPUT_ID, '[0, i-1] = moment(', lhsStr, '[,i-1], ', str(k), ')\n\n' ]
-        else:
-            raise ValueError('Incorrect axis:' + axis)
-        return construct_intermediate_node(inputs, dml_script)
+        Parameters
+        ----------
+        axis : int, optional
+        """
+        return self._central_moment(3, axis) / (self._central_moment(2, axis) ** 1.5)
+
+    def kurtosis(self, axis=None, fisher=True):
+        """
+        Computes the sample kurtosis (i.e. the biased estimator like scipy.stats.kurtosis) along the specified axis
+        
+        Parameters
+        ----------
+        axis : int, optional
+        fisher : bool, optional
+            if True, 3.0 is subtracted from the result (i.e. the kurtosis of the normal distribution is 0.0)
+        """
+        m2 = self._central_moment(2, axis)
+        ret = self._central_moment(4, axis) / (m2 * m2)
+        return ret - 3.0 if fisher else ret
         
     def sd(self, axis=None):
         """
@@ -1126,6 +3628,53 @@ class matrix(object):
         """
         return self._aggFn('sd', axis)
 
+    def quantile(self, q, axis=None):
+        """
+        Computes the q-th quantiles along the specified axis, which are linearly interpolated between the closest ranks (like numpy.percentile
+        with q in [0, 1]). All columns (or rows) are sorted at once (see _COLUMN_QUANTILES).
+        
+        Parameters
+        ----------
+        q : float or list of floats in [0, 1]
+        axis : int, optional
+            if None, returns a scalar (or a column vector for a list of floats). If 0, returns a matrix with one row per probability
+            and one column per column. If 1, returns a matrix with one row per row and one column per probability.
+        """
+        qs = np.asarray(q, dtype=np.double)
+        if qs.ndim > 1 or qs.size == 0 or np.any(np.isnan(qs)) or np.any(qs < 0) or np.any(qs > 1):
+            raise ValueError('q should be a float or a list of floats in [0, 1], but got ' + str(q))
+        qs = qs.reshape(qs.size, 1)
+        shape = _shape_of(self)
+        lhsStr, inputs = _matricize(self, [])
+        if axis is None:
+            X = construct_intermediate_node(inputs, [OUTPUT_ID, ' = full(', lhsStr, ', rows=length(', lhsStr, '), cols=1)\n' ],
+                None if shape is None else (shape[0]*shape[1], 1), self._sparsity)
+        elif axis == 0:
+            X = self
+        elif axis == 1:
+            X = self.transpose()
+        else:
+            raise ValueError('axis should be either 0 or 1, but got ' + str(axis))
+        P = _as_matrix(qs)
+        xShape = _shape_of(X)
+        outShape = None if xShape is None else (qs.shape[0], xShape[1])
+        ret = _construct_call([ X, P ], [ _COLUMN_QUANTILES.name, '(', X.ID, ', ', P.ID, ')' ], [ (matrix, outShape) ], [ _COLUMN_QUANTILES ])[0]
+        if axis == 1:
+            return ret.transpose()
+        elif axis is None and np.ndim(q) == 0:
+            return construct_intermediate_node([ ret ], [OUTPUT_ID, ' = scalar(', ret.ID, ')\n' ], (1, 1), is_scalar=True)
+        return ret
+
+    def median(self, axis=None):
+        """
+        Computes the median along the specified axis (see quantile)
+        
+        Parameters
+        ----------
+        axis : int, optional
+        """
+        return self.quantile(0.5, axis)
+
     def max(self, other=None, axis=None):
         """
         Compute the maximum value along the specified axis
@@ -1137,7 +3686,7 @@ class matrix(object):
         """
         if other is not None and axis is not None:
             raise ValueError('Both axis and other cannot be not None')
-        elif other is None and axis is not None:
+        elif other is None:
             return self._aggFn('max', axis)
         else:
             return binaryMatrixFunction(self, other, 'max')
@@ -1153,7 +3702,7 @@ class matrix(object):
         """
         if other is not None and axis is not None:
             raise ValueError('Both axis and other cannot be not None')
-        elif other is None and axis is not None:
+        elif other is None:
             return self._aggFn('min', axis)
         else:
             return binaryMatrixFunction(self, other, 'min')
@@ -1204,13 +3753,8 @@ class matrix(object):
         """
         Common function that is called for functions that have axis as parameter.
         """
-        dml_script = ''
-        lhsStr, inputs = _matricize(self, [])
-        if axis is None:
-            dml_script = [OUTPUT_ID, ' = ', fnName, '(', lhsStr, ')\n']
-        else:
-            dml_script = [OUTPUT_ID, ' = ', fnName, '(', lhsStr, ', axis=', str(axis) ,')\n']
-        return construct_intermediate_node(inputs, dml_script)
+        shape, sparsity = _aggregate_shape(self, fnName, axis)
+        return _construct_expr_node(fnName, [self], axis, shape, sparsity, axis is None and fnName in _SCALAR_AGGREGATES)
 
     ######################### Indexing operators ######################################
 
@@ -1218,29 +3762,145 @@ class matrix(object):
         """
         Implements evaluation of right indexing operations such as m[1,1], m[0:1,], m[:, 0:1]
         """
-        return construct_intermediate_node([self], [OUTPUT_ID, ' = ', self.ID ] + getIndexingDML(index) + [ '\n' ])
+        index = _resolve_index(index)
+        return _construct_expr_node('index', [self] + _index_operands(index), index, _index_shape(index, self._shape), self._sparsity)
 
     # Performs deep copy if the matrix is backed by data
     def _prepareForInPlaceUpdate(self):
         temp = matrix(self.eval_data, op=self.op)
-        for op in self.referenced:
+        temp._shape, temp._sparsity = self._shape, self._sparsity
+        for op in self._consumers():
             op.inputs = [temp if x.ID==self.ID else x for x in op.inputs]
         self.ID, temp.ID = temp.ID, self.ID # Copy even the IDs as the IDs might be used to create DML
-        self.op = DMLOp([temp], dml=[self.ID, " = ", temp.ID])
+        if id(self) in _cached_owners:
+            # The cached JVM-side copy (if any) is now owned by temp
+            _track_cached(self, temp)
+        self.op = _ScatterOp(self.ID, temp)
         self.eval_data = None
-        temp.referenced = self.referenced + [ self.op ]
+        temp.referenced = self.referenced + [ weakref.ref(self.op) ]
         self.referenced = []
+        # The shared subexpression (if any) is now computed by temp
+        temp._cse_key, self._cse_key = self._cse_key, None
+        if temp._cse_key is not None:
+            _get_context().cse_nodes[temp._cse_key] = temp
 
     def __setitem__(self, index, value):
         """
         Implements evaluation of left indexing operations such as m[1,1]=2
+
+        Consecutive assignments to a matrix that is not used by other operations in the meantime (for example: inside a loop)
+        are coalesced into bulk updates, see _ScatterOp.
         """
-        self._prepareForInPlaceUpdate()
-        if isinstance(value, matrix) or isinstance(value, DMLOp):
-            self.op.inputs = self.op.inputs + [ value ]
-        if isinstance(value, matrix):
-            value.referenced = value.referenced + [ self.op ]
-        self.op.dml = self.op.dml + [ '\n', self.ID ] + getIndexingDML(index) + [ ' = ',  getValue(value), '\n']
+        getIndexingDML(index)
+        indexShape = _index_shape(index, self._shape)
+        valueShape = _shape_of(value) if isinstance(value, matrix) else _static_shape(getattr(value, 'shape', None))
+        if indexShape is not None and valueShape is not None and valueShape != indexShape and valueShape != (1, 1):
+            raise ValueError('could not broadcast input array from shape ' + str(valueShape) + ' into shape ' + str(indexShape))
+        if not self._has_pending_assignments():
+            self._prepareForInPlaceUpdate()
+        self._sparsity = None
+        self.op.add(index, value)
+
+    def _has_pending_assignments(self):
+        """
+        Returns True if this matrix is backed by left indexing operations that can be extended in-place,
+        i.e. this matrix is neither evaluated, cached by the intermediate cache (which would hold the value without the new
+        assignments under the same ID, see set_intermediate_cache) nor used by other operations.
+        """
+        return isinstance(self.op, _ScatterOp) and self._future is None and self._eval_data is None and len(self._consumers()) == 0 and \
+            (matrix.intermediates is None or self.ID not in matrix.intermediates)
 
     # Not implemented: conj, hyperbolic/inverse-hyperbolic functions(i.e. sinh, arcsinh, cosh, ...), bitwise operator, xor operator, isreal, iscomplex, isfinite, isinf, isnan, copysign, nextafter, modf, frexp, trunc  
     _numpy_to_systeml_mapping = {np.add: __add__, np.subtract: __sub__, np.multiply: __mul__, np.divide: __div__, np.logaddexp: logaddexp, np.true_divide: __truediv__, np.floor_divide: __floordiv__, np.negative: negative, np.power: __pow__, np.remainder: remainder, np.mod: mod, np.fmod: __mod__, np.absolute: abs, np.rint: round, np.sign: sign, np.exp: exp, np.exp2: exp2, np.log: log, np.log2: log2, np.log10: log10, np.expm1: expm1, np.log1p: log1p, np.sqrt: sqrt, np.square: square, np.reciprocal: reciprocal, np.ones_like: ones_like, np.zeros_like: zeros_like, np.sin: sin, np.cos: cos, np.tan: tan, np.arcsin: arcsin, np.arccos: arccos, np.arctan: arctan, np.deg2rad: deg2rad, np.rad2deg: rad2deg, np.greater: __gt__, np.greater_equal: __ge__, np.less: __lt__, np.less_equal: __le__, np.not_equal: __ne__, np.equal: __eq__, np.logical_not: logical_not, np.logical_and: __and__, np.logical_or: __or__, np.maximum: max, np.minimum: min, np.signbit: sign, np.ldexp: ldexp, np.dot:dot}
+
+def _double_literal(value):
+    """
+    Returns the PyDML literal of the given float. Unlike Python, PyDML requires a decimal point (see DOUBLE in Pydml.g4).
+    """
+    value = float(value)
+    if math.isnan(value):
+        return '(0.0 / 0.0)'
+    elif math.isinf(value):
+        return '(1.0 / 0.0)' if value > 0 else '(-1.0 / 0.0)'
+    ret = repr(value)
+    if '.' in ret:
+        return ret
+    return ret.replace('e', '.0e') if 'e' in ret else ret + '.0'
+
+class scalar(matrix):
+    """
+    Lazily evaluated scalar returned by the aggregations without axis (for example: m.sum(), m.mean() and m.trace()) as well as by
+    the operations whose operands are such scalars or Python numbers (for example: m.sum() / n or m.max() > 0). It is emitted as a DML
+    scalar and its value is fetched via the scalar getters of MLResults, i.e. without transferring a MatrixBlock. Once evaluated,
+    the value is inlined into the scripts of later evaluations as a literal.
+
+    A scalar can be used as an operand of the matrix operations (for example: X / X.sum()) as well as in Python expressions:
+    float(s), int(s), bool(s), s.item() and formatting evaluate it. Similar to a 1x1 matrix, s.toNumPy() returns a 1x1 array. For example, a convergence check inside a loop only fetches a double:
+
+    >>> for i in range(100):
+    ...     w = w - 0.1 * X.transpose().dot(X.dot(w) - y)
+    ...     if ((X.dot(w) - y) ** 2).mean() < 1e-6:
+    ...         break
+    """
+    def item(self):
+        """
+        Evaluates this scalar (if required) and returns its value as numpy.float64.
+        """
+        if self.eval_data is None:
+            self.eval()
+        return np.float64(self.eval_data)
+
+    def toNumPy(self):
+        """
+        Evaluates this scalar (if required) and returns its value as 1x1 NumPy array (similar to a 1x1 matrix).
+        Please use item() or float() to obtain the value itself.
+        """
+        return np.full((1, 1), self.item())
+
+    def fetch(self, format='auto'):
+        return self.toNumPy()
+
+    def toPandas(self):
+        return convertToPandasDF(self.toNumPy())
+
+    def toSciPy(self):
+        return csr_matrix(self.toNumPy())
+
+    def toDF(self):
+        return matrix.sparkSession.createDataFrame(self.toPandas())
+
+    def __array__(self, dtype=np.double):
+        return np.array(self.item(), dtype)
+
+    def __float__(self):
+        return float(self.item())
+
+    def __int__(self):
+        return int(self.item())
+
+    def __bool__(self):
+        return bool(self.item())
+
+    __nonzero__ = __bool__
+
+    def __format__(self, format_spec):
+        return format(float(self), format_spec)
+
+    def __neg__(self):
+        return self.negative()
+
+    def __abs__(self):
+        return self.abs()
+
+    def __repr__(self):
+        if self.eval_data is None:
+            return matrix.__repr__(self)
+        return repr(self.item())
+
+    def _register_as_input(self, execute, data):
+        _get_context().input_dml.append(self.ID + ' = ' + _double_literal(data) + '\n')
+        return self
+
+    def _estimated_bytes(self):
+        # A DML scalar is a single double (see _estimate_node)
+        return 8
@@ -0,0 +1,51 @@
+#-------------------------------------------------------------
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#-------------------------------------------------------------
+
+"""
+==============
+Linear Algebra
+==============
+
+==================== =========================================================
+Decompositions
+==============================================================================
+cholesky             Cholesky decomposition (block-recursive for large matrices).
+qr                   Thin QR decomposition (block-recursive for large matrices).
+svd                  Singular value decomposition.
+eigh                 Eigen decomposition of a symmetric matrix.
+==================== =========================================================
+
+==================== =========================================================
+Norms, inverses and linear systems
+==============================================================================
+norm                 Vector or matrix norm.
+inv                  Inverse of a matrix (block-recursive for large matrices).
+solve                Solution of a linear system (block-recursive for large matrices).
+eigvalsh             Eigenvalues of a symmetric matrix.
+==================== =========================================================
+
+
+"""
+
+
+from .linalg import *
+
+__all__ = linalg.__all__
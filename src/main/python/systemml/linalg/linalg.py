@@ -0,0 +1,255 @@
+#-------------------------------------------------------------
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#-------------------------------------------------------------
+
+__all__ = ['cholesky', 'qr', 'svd', 'eigh', 'eigvalsh', 'inv', 'solve', 'norm']
+
+import numpy as np
+
+from ..defmatrix import *
+from ..defmatrix import _as_matrix, _shape_of, _construct_call, _construct_expr_node, _LibraryFunction
+
+# Number of rows and columns of the blocks decomposed by the built-in functions of SystemML (see the block_size parameters)
+DEFAULT_BLOCK_SIZE = 1000
+
+# The block-recursive algorithms are ported from scripts/staging/scalable_linalg/linalg_decomp.dml
+
+# Inverse of an upper triangular matrix: inv([U11, U12; 0, U22]) = [inv(U11), -inv(U11) U12 inv(U22); 0, inv(U22)]
+_UPPER_INV = _LibraryFunction('''def sml_linalg_upper_inv(U: matrix[float], nb: int) -> (A: matrix[float]):
+    n = ncol(U)
+    if (n <= nb):
+        A = inv(U)
+    else:
+        k = int(floor(n / 2))
+        U11 = U[0:k, 0:k]
+        U12 = U[0:k, k:n]
+        U22 = U[k:n, k:n]
+        A11 = sml_linalg_upper_inv(U11, nb)
+        A22 = sml_linalg_upper_inv(U22, nb)
+        A12 = -dot(dot(A11, U12), A22)
+        A21 = full(0, rows=nrow(A22), cols=ncol(A11))
+        A = rbind(cbind(A11, A12), cbind(A21, A22))
+
+''')
+
+_CHOLESKY = _LibraryFunction('''def sml_linalg_cholesky(A: matrix[float], nb: int) -> (L: matrix[float]):
+    n = ncol(A)
+    if (n <= nb):
+        L = cholesky(A)
+    else:
+        k = int(floor(n / 2))
+        A11 = A[0:k, 0:k]
+        A21 = A[k:n, 0:k]
+        A22 = A[k:n, k:n]
+        L11 = sml_linalg_cholesky(A11, nb)
+        L11t = transpose(L11)
+        L11inv = sml_linalg_upper_inv(L11t, nb)
+        L21 = dot(A21, L11inv)
+        A22 = A22 - dot(L21, transpose(L21))
+        L22 = sml_linalg_cholesky(A22, nb)
+        L12 = full(0, rows=nrow(L11), cols=ncol(L22))
+        L = rbind(cbind(L11, L12), cbind(L21, L22))
+
+''', [ _UPPER_INV ])
+
+# Q from the Householder vectors computed by the built-in qr
+_Q_FROM_H = _LibraryFunction('''def sml_linalg_q_from_h(H: matrix[float]) -> (Q: matrix[float]):
+    m = nrow(H)
+    n = ncol(H)
+    eye = diag(full(1, rows=m, cols=1))
+    Q = eye[, 0:n]
+    for (j in (n - 1):0):
+        v = H[j:m, j]
+        b = scalar(2 / dot(transpose(v), v))
+        Q[j:m, j:n] = Q[j:m, j:n] - dot(b * v, dot(transpose(v), Q[j:m, j:n]))
+
+''')
+
+_QR = _LibraryFunction('''def sml_linalg_qr(A: matrix[float], nb: int) -> (Q: matrix[float], R: matrix[float]):
+    n = ncol(A)
+    if (n <= nb):
+        [H, R0] = qr(A)
+        Q = sml_linalg_q_from_h(H)
+        R = R0[0:n, 0:n]
+    else:
+        k = int(floor(n / 2))
+        A1 = A[, 0:k]
+        A2 = A[, k:n]
+        [Q1, R11] = sml_linalg_qr(A1, nb)
+        R12 = dot(transpose(Q1), A2)
+        A2 = A2 - dot(Q1, R12)
+        [Q2, R22] = sml_linalg_qr(A2, nb)
+        R21 = full(0, rows=nrow(R22), cols=ncol(R11))
+        Q = cbind(Q1, Q2)
+        R = rbind(cbind(R11, R12), cbind(R21, R22))
+
+''', [ _Q_FROM_H ])
+
+# inv(A) = inv(R) t(Q)
+_INV = _LibraryFunction('''def sml_linalg_inv(A: matrix[float], nb: int) -> (X: matrix[float]):
+    n = ncol(A)
+    if (n <= nb):
+        X = inv(A)
+    else:
+        [Q, R] = sml_linalg_qr(A, nb)
+        Rinv = sml_linalg_upper_inv(R, nb)
+        X = dot(Rinv, transpose(Q))
+
+''', [ _QR, _UPPER_INV ])
+
+_SOLVE = _LibraryFunction('''def sml_linalg_solve(A: matrix[float], b: matrix[float], nb: int) -> (x: matrix[float]):
+    n = ncol(A)
+    if (n <= nb):
+        x = solve(A, b)
+    else:
+        [Q, R] = sml_linalg_qr(A, nb)
+        Rinv = sml_linalg_upper_inv(R, nb)
+        x = dot(Rinv, dot(transpose(Q), b))
+
+''', [ _QR, _UPPER_INV ])
+
+def _square_shape(A, fnName):
+    shape = _shape_of(A)
+    if shape is not None and shape[0] != shape[1]:
+        raise ValueError(fnName + ' requires a square matrix, but the shape is ' + str(shape))
+    return shape
+
+def _call(fn, args, outputs):
+    """
+    Calls the given DML function (or built-in function if fn is a string) and returns the list of output nodes.
+    """
+    name, functions = (fn, []) if isinstance(fn, str) else (fn.name, [ fn ])
+    argStrs = [ x.ID if isinstance(x, matrix) else str(x) for x in args ]
+    return _construct_call([ x for x in args if isinstance(x, matrix) ], [ name, '(', ', '.join(argStrs), ')' ], outputs, functions)
+
+def cholesky(A, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Computes the Cholesky decomposition A = L L^T of a symmetric positive definite matrix and returns the lower triangular matrix L.
+    Matrices with more than block_size columns are decomposed block-recursively, i.e. only the blocks are decomposed by the built-in
+    function of SystemML (which is executed in the driver) and the other operations can be executed by Spark.
+
+    >>> L = sml.linalg.cholesky(X.transpose().dot(X))
+    """
+    A = _as_matrix(A)
+    shape = _square_shape(A, 'cholesky')
+    return _call(_CHOLESKY, [ A, int(block_size) ], [ (matrix, shape) ])[0]
+
+def qr(A, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Computes the thin QR decomposition A = Q R (i.e. Q has the shape of A and R is a square upper triangular matrix) and returns (Q, R).
+    Matrices with more than block_size columns are decomposed block-recursively (see cholesky).
+    """
+    A = _as_matrix(A)
+    shape = _shape_of(A)
+    return tuple(_call(_QR, [ A, int(block_size) ], [ (matrix, shape), (matrix, None if shape is None else (shape[1], shape[1])) ]))
+
+def inv(A, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Computes the inverse of a square matrix. Matrices with more than block_size columns are inverted via the block-recursive QR
+    decomposition, i.e. inv(A) = inv(R) Q^T (see qr).
+    """
+    A = _as_matrix(A)
+    shape = _square_shape(A, 'inv')
+    return _call(_INV, [ A, int(block_size) ], [ (matrix, shape) ])[0]
+
+def solve(a, b, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Computes the solution x of the linear system a x = b. Systems with more than block_size unknowns are solved via the
+    block-recursive QR decomposition (see qr).
+    """
+    a, b = _as_matrix(a), _as_matrix(b)
+    shapeA, shapeB = _square_shape(a, 'solve'), _shape_of(b)
+    if shapeA is not None and shapeB is not None and shapeA[0] != shapeB[0]:
+        raise ValueError('shapes ' + str(shapeA) + ' and ' + str(shapeB) + ' not aligned')
+    return _call(_SOLVE, [ a, b, int(block_size) ], [ (matrix, None if shapeA is None or shapeB is None else (shapeA[1], shapeB[1])) ])[0]
+
+def svd(A):
+    """
+    Computes the thin singular value decomposition A = U diag(s) Vh and returns (U, s, Vh), where the singular values s are
+    returned as column vector.
+    """
+    A = _as_matrix(A)
+    shape = _shape_of(A)
+    k = None if shape is None else min(shape)
+    U, S, V = _call('svd', [ A ], [ (matrix, None if shape is None else (shape[0], k)), (matrix, None if shape is None else (k, k)),
+        (matrix, None if shape is None else (shape[1], k)) ])
+    return U, _construct_expr_node('diag', [ S ], None, None if shape is None else (k, 1)), V.transpose()
+
+def eigh(A):
+    """
+    Computes the eigenvalues (as column vector) and the eigenvectors (as columns) of a symmetric matrix and returns (w, v).
+    Unlike numpy.linalg.eigh, the eigenvalues are not sorted.
+    """
+    A = _as_matrix(A)
+    shape = _square_shape(A, 'eigh')
+    return tuple(_call('eigen', [ A ], [ (matrix, None if shape is None else (shape[0], 1)), (matrix, shape) ]))
+
+def eigvalsh(A):
+    """
+    Computes the eigenvalues (as column vector) of a symmetric matrix (see eigh).
+    """
+    return eigh(A)[0]
+
+def _vector_norm(x, ord, axis):
+    absX = x.abs()
+    if ord is None or ord == 2:
+        return (x ** 2).sum(axis=axis).sqrt()
+    elif ord == np.inf:
+        return absX.max(axis=axis)
+    elif ord == -np.inf:
+        return absX.min(axis=axis)
+    elif ord == 0:
+        return (x != 0).sum(axis=axis)
+    elif ord == 1:
+        return absX.sum(axis=axis)
+    return (absX ** ord).sum(axis=axis) ** (1.0 / ord)
+
+def norm(x, ord=None, axis=None):
+    """
+    Computes the vector norm (if x is a row or column vector, or along the given axis) or the matrix norm, similar to numpy.linalg.norm.
+
+    Parameters
+    ----------
+    x: matrix
+    ord: order of the norm (None: 2-norm of vectors and Frobenius norm of matrices, 'fro', 'nuc', inf, -inf, 0 (only vectors) or any other number)
+    axis: None or the axis (0 or 1) along which the vector norms are computed
+
+    Returns
+    -------
+    scalar if axis is None, else the matrix of the vector norms
+    """
+    x = _as_matrix(x)
+    shape = _shape_of(x)
+    if axis is not None:
+        return _vector_norm(x, ord, axis)
+    elif shape is not None and 1 in shape and ord not in ('fro', 'nuc'):
+        return _vector_norm(x, ord, None)
+    elif ord is None or ord == 'fro':
+        return (x ** 2).sum().sqrt()
+    elif ord == 1 or ord == -1:
+        colSums = x.abs().sum(axis=0)
+        return colSums.max() if ord == 1 else colSums.min()
+    elif ord == np.inf or ord == -np.inf:
+        rowSums = x.abs().sum(axis=1)
+        return rowSums.max() if ord == np.inf else rowSums.min()
+    elif ord in (2, -2, 'nuc'):
+        s = svd(x)[1]
+        return s.sum() if ord == 'nuc' else (s.max() if ord == 2 else s.min())
+    raise ValueError('Invalid norm order for matrices: ' + str(ord))
@@ -300,6 +300,33 @@ class Matrix(object):
         np_array = convertToNumPyArr(self._sc, self._java_matrix.toMatrixBlock())
         return np_array
 
+    def toSciPy(self):
+        """
+        Convert the Matrix to a SciPy CSR matrix without densifying it.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            A SciPy CSR matrix representing the Matrix object.
+        """
+        return convertToSciPy(self._sc, self._java_matrix.toMatrixBlock())
+
+    def fetch(self, format='auto'):
+        """
+        Convert the Matrix to a NumPy Array or a SciPy CSR matrix.
+
+        Parameters
+        ----------
+        format: string
+            'numpy', 'scipy' or 'auto' (default). If 'auto', a SciPy CSR matrix is returned
+            if the underlying MatrixBlock is in sparse format or has sparsity below 0.4.
+
+        Returns
+        -------
+        NumPy Array or scipy.sparse.csr_matrix
+        """
+        return convertMatrixBlock(self._sc, self._java_matrix.toMatrixBlock(), format)
+
 
 class MLResults(object):
     """
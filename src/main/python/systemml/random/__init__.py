@@ -30,6 +30,15 @@ Univariate distributions
 normal               Normal / Gaussian distribution.
 poisson              Poisson distribution.
 uniform              Uniform distribution.
+binomial             Binomial distribution.
+exponential          Exponential distribution.
+categorical          Categorical distribution.
+==================== =========================================================
+
+==================== =========================================================
+Batches
+==============================================================================
+batch                Many matrices generated by a single script.
 ==================== =========================================================
 
 
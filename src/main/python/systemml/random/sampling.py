@@ -19,15 +19,20 @@
 #
 #-------------------------------------------------------------
 
-__all__ = ['normal', 'uniform', 'poisson']
+__all__ = ['normal', 'uniform', 'poisson', 'binomial', 'exponential', 'categorical', 'batch']
+
+import re
+import numpy as np
+from collections import OrderedDict
 
 from ..defmatrix import *
+from ..defmatrix import construct_intermediate_node, _static_shape, _shape_of, _as_matrix, _double_literal, _get_new_var_id
 
 # Special object used internally to specify the placeholder which will be replaced by output ID
 # This helps to provide dml containing output ID in constructSamplingNode
 OUTPUT_ID = '$$OutputID$$'
 
-def constructSamplingNode(inputs, dml):
+def constructSamplingNode(inputs, dml, size=None, sparsity=None):
     """
     Convenient utility to create an intermediate of AST.
 
@@ -35,33 +40,78 @@ def constructSamplingNode(inputs, dml):
     ----------
     inputs = list of input matrix objects and/or DMLOp
     dml = list of DML string (which will be eventually joined before execution). To specify out.ID, please use the placeholder
+    size = shape of the output (None if not statically known)
+    sparsity = expected fraction of non-zeros of the output (None if not statically known)
     """
-    dmlOp = DMLOp(inputs)
-    out = matrix(None, op=dmlOp)
-    dmlOp.dml = [out.ID if x==OUTPUT_ID else x for x in dml]
-    return out
+    # The draws without seed differ on every execution, hence identical sampling nodes are never shared
+    sparsity = sparsity if isinstance(sparsity, (float, int)) else None
+    return construct_intermediate_node(inputs, dml, _static_shape(size), sparsity, cse=False)
 
-INPUTS = []
-def asStr(arg):
+def asStr(arg, inputs):
     """
-    Internal use only: Convenient utility to update inputs and return appropriate string value
+    Internal use only: Convenient utility to append the matrices to inputs and return appropriate string value
     """
     if isinstance(arg, matrix):
-        INPUTS = INPUTS + [ arg ]
+        inputs.append(arg)
         return arg.ID
+    elif isinstance(arg, float):
+        return _double_literal(arg)
     else:
         return str(arg)
-        
-def normal(loc=0.0, scale=1.0, size=(1,1), sparsity=1.0):
+
+def _is_matrix_valued(arg):
+    return isinstance(arg, matrix) and not isinstance(arg, scalar)
+
+def _outputSize(size, params):
+    """
+    Returns the shape of the output, which is the shape of the matrix-valued parameters if size is None.
+    The matrix-valued parameters are either of the output shape or row/column vectors (which are broadcast).
+    """
+    shapes = [ _shape_of(x) for x in params if _is_matrix_valued(x) ]
+    if size is None:
+        if len(shapes) == 0:
+            return (1, 1)
+        if any(s is None for s in shapes):
+            raise ValueError('size should be specified if the shapes of the matrix-valued parameters are not known')
+        return (max(s[0] for s in shapes), max(s[1] for s in shapes))
+    if len(size) != 2:
+        raise TypeError('Incorrect type for size. Expected tuple of length 2')
+    staticSize = _static_shape(size)
+    for s in shapes:
+        if s is not None and staticSize is not None and (s[0] not in (1, staticSize[0]) or s[1] not in (1, staticSize[1])):
+            raise ValueError('parameters of shape ' + str(s) + ' cannot be broadcast to the output shape ' + str(staticSize))
+    return size
+
+def _randStr(size, inputs, pdf, sparsity, seed, params=''):
+    """
+    Returns the DML expression of rand, which is executed as a single data generation operation by SystemML (i.e. distributed
+    for large matrices). If seed is None, SystemML draws a new seed for every execution.
+    """
+    seedStr = '' if seed is None else ', seed=' + str(int(seed))
+    return ''.join([ 'rand(rows=', asStr(size[0], inputs), ', cols=', asStr(size[1], inputs), ', pdf="', pdf, '"', params,
+        ', sparsity=', asStr(sparsity, inputs), seedStr, ')' ])
+
+def _constructTemplateNode(inputs, template, size, sparsity, **exprs):
+    """
+    Creates the node that executes the given multi-line DML template, which refers to the given expressions and to temporary
+    variables (including the output X) by {name}.
+    """
+    # The IDs are assigned in the order of first appearance, so that the same call always generates the same script (see set_plan_cache)
+    names = dict((x, _get_new_var_id()) for x in OrderedDict.fromkeys(re.findall('{(\\w+)}', template)) if x not in exprs)
+    names.update(exprs)
+    return constructSamplingNode(inputs, [ template.format(**names), OUTPUT_ID, ' = ', names['X'], '\n' ], size, sparsity)
+
+def normal(loc=0.0, scale=1.0, size=None, sparsity=1.0, seed=None):
     """
     Draw random samples from a normal (Gaussian) distribution.
         
     Parameters
     ----------
-    loc: Mean ("centre") of the distribution.
-    scale: Standard deviation (spread or "width") of the distribution.
-    size: Output shape (only tuple of length 2, i.e. (m, n), supported).
+    loc: Mean ("centre") of the distribution (number or matrix).
+    scale: Standard deviation (spread or "width") of the distribution (number or matrix).
+    size: Output shape (only tuple of length 2, i.e. (m, n), supported). Defaults to the shape of the matrix-valued parameters or (1, 1).
     sparsity: Sparsity (between 0.0 and 1.0).
+    seed: Seed of the random number generator (None for a random seed).
     
     Examples
     --------
@@ -77,27 +127,28 @@ def normal(loc=0.0, scale=1.0, size=(1,1), sparsity=1.0):
            [ 3.62245706,  5.9430881 ,  2.53070413]])
     
     """
-    if len(size) != 2:
-        raise TypeError('Incorrect type for size. Expected tuple of length 2')
-    INPUTS = []
-    rows = asStr(size[0])
-    cols = asStr(size[1])
-    loc = asStr(loc)
-    scale = asStr(scale)
-    sparsity = asStr(sparsity)
+    loc, scale = _as_matrix(loc), _as_matrix(scale)
+    size = _outputSize(size, [ loc, scale ])
+    # The non-zeros are shifted by loc
+    outSparsity = sparsity if isinstance(loc, (float, int)) and loc == 0 else 1.0
+    inputs = []
+    rand = _randStr(size, inputs, 'normal', sparsity, seed)
+    loc = asStr(loc, inputs)
+    scale = asStr(scale, inputs)
     # loc + scale*standard normal
-    return constructSamplingNode(INPUTS, [OUTPUT_ID, ' = ',  loc,' + ',  scale,' * random.normal(', rows, ',', cols, ',',  sparsity, ')\n'])
+    return constructSamplingNode(inputs, [OUTPUT_ID, ' = ',  loc,' + ',  scale,' * ', rand, '\n'], size, outSparsity)
 
-def uniform(low=0.0, high=1.0, size=(1,1), sparsity=1.0):
+def uniform(low=0.0, high=1.0, size=None, sparsity=1.0, seed=None):
     """
     Draw samples from a uniform distribution.
         
     Parameters
     ----------
-    low: Lower boundary of the output interval.
-    high: Upper boundary of the output interval.
-    size: Output shape (only tuple of length 2, i.e. (m, n), supported). 
+    low: Lower boundary of the output interval (number or matrix).
+    high: Upper boundary of the output interval (number or matrix).
+    size: Output shape (only tuple of length 2, i.e. (m, n), supported). Defaults to the shape of the matrix-valued parameters or (1, 1).
     sparsity: Sparsity (between 0.0 and 1.0).
+    seed: Seed of the random number generator (None for a random seed).
 
     Examples
     --------
@@ -113,25 +164,43 @@ def uniform(low=0.0, high=1.0, size=(1,1), sparsity=1.0):
            [ 0.67582422,  0.87068849,  0.02766852]])
 
     """
-    if len(size) != 2:
-        raise TypeError('Incorrect type for size. Expected tuple of length 2')
-    INPUTS = []
-    rows = asStr(size[0])
-    cols = asStr(size[1])
-    low = asStr(low)
-    high = asStr(high)
-    sparsity = asStr(sparsity)
-    return constructSamplingNode(INPUTS, [OUTPUT_ID, ' = random.uniform(', rows, ',', cols, ',',  sparsity, ',',  low, ',',  high, ')\n'])
+    low, high = _as_matrix(low), _as_matrix(high)
+    size = _outputSize(size, [ low, high ])
+    inputs = []
+    if not isinstance(low, matrix) and not isinstance(high, matrix):
+        rand = _randStr(size, inputs, 'uniform', sparsity, seed, ', min=' + asStr(low, inputs) + ', max=' + asStr(high, inputs))
+        return constructSamplingNode(inputs, [OUTPUT_ID, ' = ', rand, '\n'], size, sparsity)
+    # The standard uniform samples are scaled and shifted (including the zeros)
+    rand = _randStr(size, inputs, 'uniform', sparsity, seed, ', min=0, max=1')
+    low = asStr(low, inputs)
+    high = asStr(high, inputs)
+    return constructSamplingNode(inputs, [OUTPUT_ID, ' = ', low, ' + (', high, ' - ', low, ') * ', rand, '\n'], size, 1.0)
+
+# Sampling of discrete distributions by inversion, i.e. by counting the values of the cumulative distribution function F below a
+# uniform sample U. All cells are sampled at once by a while loop over the values, which terminates once F exceeds U in every cell.
+_POISSON_INVERSION = '''{U} = {rand}
+{G} = -{lam}
+{F} = exp({G})
+{X} = {U} > {F}
+{k} = 0
+while (sum({U} > {F}) > 0 & ({k} < max({lam}) | max(exp({G})) > 0)):
+	{k} = {k} + 1
+	{G} = {G} + log({lam}) - log({k})
+	{F} = {F} + exp({G})
+	{X} = {X} + ({U} > {F})
+
+'''
 
-def poisson(lam=1.0, size=(1,1), sparsity=1.0):
+def poisson(lam=1.0, size=None, sparsity=1.0, seed=None):
     """
     Draw samples from a Poisson distribution.
     
     Parameters
     ----------
-    lam: Expectation of interval, should be > 0.
-    size: Output shape (only tuple of length 2, i.e. (m, n), supported). 
+    lam: Expectation of interval, should be > 0 (number or matrix).
+    size: Output shape (only tuple of length 2, i.e. (m, n), supported). Defaults to the shape of the matrix-valued parameters or (1, 1).
     sparsity: Sparsity (between 0.0 and 1.0).
+    seed: Seed of the random number generator (None for a random seed).
     
     
     Examples
@@ -148,11 +217,190 @@ def poisson(lam=1.0, size=(1,1), sparsity=1.0):
            [ 0.,  0.,  0.]])
            
     """
-    if len(size) != 2:
-        raise TypeError('Incorrect type for size. Expected tuple of length 2')
-    INPUTS = []
-    rows = asStr(size[0])
-    cols = asStr(size[1])
-    lam = asStr(lam)
-    sparsity = asStr(sparsity)
-    return constructSamplingNode(INPUTS, [OUTPUT_ID, ' = random.poisson(', rows, ',', cols, ',',  sparsity, ',',  lam, ')\n'])
+    lam = _as_matrix(lam)
+    size = _outputSize(size, [ lam ])
+    inputs = []
+    if not isinstance(lam, matrix):
+        rand = _randStr(size, inputs, 'poisson', sparsity, seed, ', lambda=' + asStr(lam, inputs))
+        return constructSamplingNode(inputs, [OUTPUT_ID, ' = ', rand, '\n'], size, sparsity)
+    # rand only supports a scalar lambda, hence the samples for a matrix-valued lam are drawn by inversion (the zeros of the sparse
+    # uniform samples remain zero) with the probability mass function in log space, which does not underflow for large lam
+    rand = _randStr(size, inputs, 'uniform', sparsity, seed, ', min=0, max=1')
+    return _constructTemplateNode(inputs, _POISSON_INVERSION, size, None, rand=rand, lam=asStr(lam, inputs))
+
+_BINOMIAL_INVERSION = '''{U} = {rand}
+{flip} = floor({p} + 0.5)
+{G} = {n} * log(1 - min({p}, 1 - {p}))
+{F} = exp({G})
+{X} = {U} > {F}
+{k} = 0
+while (sum({U} > {F}) > 0 & {k} < {maxN} - 1):
+	{G} = {G} + log({n} - {k}) - log({k} + 1) + log(min({p}, 1 - {p})) - log(1 - min({p}, 1 - {p}))
+	{k} = {k} + 1
+	{F} = {F} + exp({G})
+	{X} = {X} + ({U} > {F})
+
+{X} = {flip} * ({n} - {X}) + (1 - {flip}) * {X}
+'''
+
+def binomial(n, p, size=None, sparsity=1.0, seed=None):
+    """
+    Draw samples from a binomial distribution.
+
+    The samples are drawn by inversion, i.e. the cost grows with the number of trials (more precisely, with n * min(p, 1-p)).
+    
+    Parameters
+    ----------
+    n: Number of trials, should be >= 0 (integer or matrix).
+    p: Probability of success, should be in [0, 1] (number or matrix).
+    size: Output shape (only tuple of length 2, i.e. (m, n), supported). Defaults to the shape of the matrix-valued parameters or (1, 1).
+    sparsity: Sparsity (between 0.0 and 1.0).
+    seed: Seed of the random number generator (None for a random seed).
+    
+    Examples
+    --------
+    
+    >>> import systemml as sml
+    >>> import numpy as np
+    >>> sml.setSparkContext(sc)
+    >>> from systemml import random
+    >>> m1 = sml.random.binomial(n=10, p=0.3, size=(3,3), seed=42)
+    >>> m1.toNumPy()
+    array([[ 3.,  2.,  4.],
+           [ 1.,  3.,  3.],
+           [ 5.,  2.,  3.]])
+    
+    """
+    n, p = _as_matrix(n), _as_matrix(p)
+    size = _outputSize(size, [ n, p ])
+    inputs = []
+    rand = _randStr(size, inputs, 'uniform', sparsity, seed, ', min=0, max=1')
+    nStr = asStr(n, inputs)
+    # The samples for p > 0.5 are drawn as n minus the number of failures (i.e. of successes for 1 - p)
+    template = _BINOMIAL_INVERSION
+    if not isinstance(sparsity, (float, int)) or sparsity != 1:
+        template = template + '{X} = {X} * ({U} != 0)\n'
+    return _constructTemplateNode(inputs, template, size, None, rand=rand, n=nStr, p=asStr(p, inputs),
+        maxN=('max(' + nStr + ')' if _is_matrix_valued(n) else nStr))
+
+def exponential(scale=1.0, size=None, sparsity=1.0, seed=None):
+    """
+    Draw samples from an exponential distribution.
+    
+    Parameters
+    ----------
+    scale: Scale parameter, i.e. the inverse of the rate, should be > 0 (number or matrix).
+    size: Output shape (only tuple of length 2, i.e. (m, n), supported). Defaults to the shape of the matrix-valued parameters or (1, 1).
+    sparsity: Sparsity (between 0.0 and 1.0).
+    seed: Seed of the random number generator (None for a random seed).
+    
+    Examples
+    --------
+    
+    >>> import systemml as sml
+    >>> import numpy as np
+    >>> sml.setSparkContext(sc)
+    >>> from systemml import random
+    >>> m1 = sml.random.exponential(scale=2.0, size=(3,3))
+    >>> m1.toNumPy()
+    array([[ 0.58235101,  3.02658313,  1.5364722 ],
+           [ 0.24119433,  0.62710531,  4.71325027],
+           [ 2.66434711,  0.32497826,  0.06102547]])
+    
+    """
+    scale = _as_matrix(scale)
+    size = _outputSize(size, [ scale ])
+    inputs = []
+    rand = _randStr(size, inputs, 'uniform', sparsity, seed, ', min=0, max=1')
+    # Inversion of the cumulative distribution function (the zeros of the sparse uniform samples remain zero)
+    return constructSamplingNode(inputs, [OUTPUT_ID, ' = -', asStr(scale, inputs), ' * log(1 - ', rand, ')\n'], size, sparsity)
+
+_CATEGORICAL_INVERSION = '''{U} = {rand}
+{C} = {cdf}
+{X} = {U} * 0
+{j} = 0
+while ({j} < {k} - 1):
+	{X} = {X} + ({U} >= {threshold})
+	{j} = {j} + 1
+
+'''
+
+def categorical(p, size=None, seed=None):
+    """
+    Draw samples from a categorical distribution, i.e. the indexes 0, ..., k-1 of the categories with the probabilities p
+    (which are normalized to sum to 1).
+    
+    Parameters
+    ----------
+    p: Probabilities of the categories (list or vector of length k), or matrix with the probabilities of each row of the output (one row per row).
+    size: Output shape (only tuple of length 2, i.e. (m, n), supported). Defaults to (1, 1) for a vector p, and to one column for a matrix p.
+    seed: Seed of the random number generator (None for a random seed).
+    
+    Examples
+    --------
+    
+    >>> import systemml as sml
+    >>> import numpy as np
+    >>> sml.setSparkContext(sc)
+    >>> from systemml import random
+    >>> m1 = sml.random.categorical([0.2, 0.3, 0.5], size=(3,3))
+    >>> m1.toNumPy()
+    array([[ 2.,  1.,  2.],
+           [ 0.,  2.,  2.],
+           [ 1.,  2.,  0.]])
+    
+    """
+    if not isinstance(p, matrix):
+        p = np.asarray(p, dtype=np.double)
+        if p.ndim != 1 or p.size == 0:
+            raise ValueError('p should be a list of probabilities or a matrix')
+        p = matrix(p.reshape(p.size, 1))
+    shape = _shape_of(p)
+    if shape is None:
+        raise ValueError('the shape of p should be known')
+    inputs = []
+    pStr = asStr(p, inputs)
+    if shape[0] == 1 or shape[1] == 1:
+        size = (1, 1) if size is None else size
+        cdf = 'cumsum(' + (pStr if shape[1] == 1 else 'transpose(' + pStr + ')') + ', axis=0) / sum(' + pStr + ')'
+        k, threshold = str(max(shape)), 'scalar({C}[{j}, 0])'
+    else:
+        size = (shape[0], 1) if size is None else size
+        if _static_shape(size) is not None and size[0] != shape[0]:
+            raise ValueError('size should have one row per row of p, but got ' + str(size) + ' for p of shape ' + str(shape))
+        cdf = 'transpose(cumsum(transpose(' + pStr + '), axis=0)) / sum(' + pStr + ', axis=1)'
+        k, threshold = str(shape[1]), '{C}[, {j}]'
+    size = _outputSize(size, [])
+    rand = _randStr(size, inputs, 'uniform', 1.0, seed, ', min=0, max=1')
+    template = _CATEGORICAL_INVERSION.replace('{threshold}', threshold)
+    return _constructTemplateNode(inputs, template, size, None, rand=rand, cdf=cdf, k=k)
+
+def batch(sampler, count, seed=None, **kwargs):
+    """
+    Draw count matrices from the given distribution of this module with the given parameters, which are generated by a single script
+    (i.e. SystemML compiles and executes the data generation operations of all matrices at once) and stay in the JVM until they are used.
+    
+    Parameters
+    ----------
+    sampler: Distribution (for example: sml.random.normal).
+    count: Number of matrices.
+    seed: Seed from which the seeds of the matrices are derived (None for random seeds).
+    kwargs: Parameters of the distribution (except seed).
+    
+    Examples
+    --------
+    
+    >>> import systemml as sml
+    >>> sml.setSparkContext(sc)
+    >>> from systemml import random
+    >>> Xs = sml.random.batch(sml.random.normal, 100, seed=42, loc=1.0, scale=2.0, size=(10000, 1000))
+    
+    """
+    if seed is None:
+        seeds = [ None ] * count
+    else:
+        seeds = [ int(x) for x in np.random.RandomState(seed).randint(0, np.iinfo(np.int32).max, size=count) ]
+    ret = [ sampler(seed=s, **kwargs) for s in seeds ]
+    if len(ret) > 0:
+        eval(ret)
+    return ret
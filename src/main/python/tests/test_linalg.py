@@ -0,0 +1,88 @@
+#-------------------------------------------------------------
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#-------------------------------------------------------------
+
+# To run:
+#   - Python 2: `PYSPARK_PYTHON=python2 spark-submit --master local[*] --driver-class-path SystemML.jar test_linalg.py`
+#   - Python 3: `PYSPARK_PYTHON=python3 spark-submit --master local[*] --driver-class-path SystemML.jar test_linalg.py`
+
+# Make the `systemml` package importable
+import os
+import sys
+path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../")
+sys.path.insert(0, path)
+
+import unittest
+import systemml as sml
+import numpy as np
+from pyspark.context import SparkContext
+sc = SparkContext.getOrCreate()
+
+dim = 6
+m1 = np.random.rand(dim, dim) + np.eye(dim)
+# Symmetric positive definite
+spd = m1.T.dot(m1) + dim * np.eye(dim)
+v = np.random.rand(dim, 1)
+
+class TestLinalg(unittest.TestCase):
+
+    def test_cholesky(self):
+        for block_size in [ 2, 1000 ]:
+            L = sml.linalg.cholesky(sml.matrix(spd), block_size=block_size).toNumPy()
+            self.assertTrue(np.allclose(L, np.linalg.cholesky(spd)))
+
+    def test_qr(self):
+        for block_size in [ 2, 1000 ]:
+            Q, R = sml.linalg.qr(sml.matrix(m1), block_size=block_size)
+            Q, R = Q.toNumPy(), R.toNumPy()
+            self.assertTrue(np.allclose(Q.dot(R), m1))
+            self.assertTrue(np.allclose(Q.T.dot(Q), np.eye(dim)))
+            self.assertTrue(np.allclose(R, np.triu(R)))
+
+    def test_inv(self):
+        for block_size in [ 2, 1000 ]:
+            self.assertTrue(np.allclose(sml.linalg.inv(sml.matrix(m1), block_size=block_size), np.linalg.inv(m1)))
+
+    def test_solve(self):
+        for block_size in [ 2, 1000 ]:
+            self.assertTrue(np.allclose(sml.linalg.solve(sml.matrix(m1), sml.matrix(v), block_size=block_size), np.linalg.solve(m1, v)))
+
+    def test_svd(self):
+        U, s, Vh = sml.linalg.svd(sml.matrix(m1))
+        U, s, Vh = U.toNumPy(), s.toNumPy(), Vh.toNumPy()
+        self.assertTrue(np.allclose(U.dot(np.diag(s.flatten())).dot(Vh), m1))
+        self.assertTrue(np.allclose(np.sort(s.flatten()), np.sort(np.linalg.svd(m1)[1])))
+
+    def test_eigh(self):
+        w, V = sml.linalg.eigh(sml.matrix(spd))
+        w, V = w.toNumPy(), V.toNumPy()
+        self.assertTrue(np.allclose(spd.dot(V), V * w.T))
+        self.assertTrue(np.allclose(np.sort(sml.linalg.eigvalsh(sml.matrix(spd)).toNumPy().flatten()), np.linalg.eigvalsh(spd)))
+
+    def test_norm(self):
+        X = sml.matrix(m1)
+        for ord in [ None, 'fro', 'nuc', 1, -1, 2, -2, np.inf, -np.inf ]:
+            self.assertAlmostEqual(float(sml.linalg.norm(X, ord)), np.linalg.norm(m1, ord))
+        for ord in [ None, 0, 1, 3, np.inf, -np.inf ]:
+            self.assertAlmostEqual(float(sml.linalg.norm(sml.matrix(v), ord)), np.linalg.norm(v.flatten(), ord))
+        self.assertTrue(np.allclose(sml.linalg.norm(X, axis=0), np.linalg.norm(m1, axis=0)))
+
+if __name__ == "__main__":
+    unittest.main()
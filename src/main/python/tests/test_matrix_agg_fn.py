@@ -91,5 +91,32 @@ class TestMatrixAggFn(unittest.TestCase):
     def test_moment4(self):
         self.assertTrue(np.allclose(sml.matrix(m1).moment(moment=4, axis=None), moment(m1, moment=4, axis=None)))
 
+    def test_moment3_axis(self):
+        self.assertTrue(np.allclose(sml.matrix(m1).moment(moment=3, axis=0), moment(m1, moment=3, axis=0).reshape(1, dim)))
+        self.assertTrue(np.allclose(sml.matrix(m1).moment(moment=3, axis=1), moment(m1, moment=3, axis=1).reshape(dim, 1)))
+
+    def test_moment4_axis(self):
+        self.assertTrue(np.allclose(sml.matrix(m1).moment(moment=4, axis=0), moment(m1, moment=4, axis=0).reshape(1, dim)))
+
+    def test_skew(self):
+        self.assertTrue(np.allclose(sml.matrix(m1).skew(), skew(m1, axis=None)))
+        self.assertTrue(np.allclose(sml.matrix(m1).skew(axis=0), skew(m1, axis=0).reshape(1, dim)))
+        self.assertTrue(np.allclose(sml.matrix(m1).skew(axis=1), skew(m1, axis=1).reshape(dim, 1)))
+
+    def test_kurtosis(self):
+        self.assertTrue(np.allclose(sml.matrix(m1).kurtosis(), kurtosis(m1, axis=None)))
+        self.assertTrue(np.allclose(sml.matrix(m1).kurtosis(axis=0), kurtosis(m1, axis=0).reshape(1, dim)))
+        self.assertTrue(np.allclose(sml.matrix(m1).kurtosis(axis=1, fisher=False), kurtosis(m1, axis=1, fisher=False).reshape(dim, 1)))
+
+    def test_quantile(self):
+        q = [0.0, 0.1, 0.5, 0.93, 1.0]
+        self.assertTrue(np.allclose(sml.matrix(m2).quantile(0.3), np.percentile(m2, 30)))
+        self.assertTrue(np.allclose(sml.matrix(m2).quantile(q, axis=0), np.percentile(m2, np.multiply(q, 100), axis=0)))
+        self.assertTrue(np.allclose(sml.matrix(m2).quantile(q, axis=1), np.percentile(m2, np.multiply(q, 100), axis=1).T))
+
+    def test_median(self):
+        self.assertTrue(np.allclose(sml.matrix(m1).median(), np.median(m1)))
+        self.assertTrue(np.allclose(sml.matrix(m1).median(axis=0), np.median(m1, axis=0).reshape(1, dim)))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,430 @@
+#-------------------------------------------------------------
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#-------------------------------------------------------------
+
+
+# To run:
+#   - Python 2: `PYSPARK_PYTHON=python2 spark-submit --master local[*] --driver-class-path SystemML.jar test_matrix_dag.py`
+#   - Python 3: `PYSPARK_PYTHON=python3 spark-submit --master local[*] --driver-class-path SystemML.jar test_matrix_dag.py`
+
+# Make the `systemml` package importable
+import os
+import sys
+path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../")
+sys.path.insert(0, path)
+
+import unittest
+import systemml as sml
+import numpy as np
+from scipy.sparse import csr_matrix
+from pyspark.context import SparkContext
+sc = SparkContext.getOrCreate()
+
+dim = 5
+m1 = np.array(np.random.randint(100, size=dim*dim) + 1.01, dtype=np.double)
+m1.shape = (dim, dim)
+
+class TestMatrixDAG(unittest.TestCase):
+
+    def test_cse1(self):
+        X = sml.matrix(m1)
+        A = X.transpose().dot(X)
+        B = X.transpose().dot(X)
+        script = sml.eval([A, B], execute=False)
+        self.assertEqual(script.count('transpose('), 1)
+        self.assertEqual(script.count('dot('), 1)
+
+    def test_cse2(self):
+        X = sml.matrix(m1)
+        A = X.transpose().dot(X)
+        B = X.transpose().dot(X)
+        self.assertTrue(np.allclose(A + B, 2*m1.T.dot(m1)))
+        self.assertTrue(np.allclose(B, m1.T.dot(m1)))
+
+    def test_plan_cache(self):
+        sml.set_plan_cache(True)
+        try:
+            for i in range(3):
+                m2 = m1 + i
+                X = sml.matrix(m2)
+                self.assertTrue(np.allclose(X.dot(X) + 1, m2.dot(m2) + 1))
+            self.assertEqual(len(sml.matrix.plans), 1)
+        finally:
+            sml.set_plan_cache(False)
+
+    def test_intermediate_cache(self):
+        sml.set_intermediate_cache(True)
+        try:
+            X = sml.matrix(m1)
+            H = X.dot(X)
+            A = H + 1
+            B = H * 2
+            self.assertTrue(np.allclose(A, m1.dot(m1) + 1))
+            self.assertTrue('dot(' not in sml.eval([B], execute=False))
+            self.assertTrue(np.allclose(B, m1.dot(m1) * 2))
+        finally:
+            sml.set_intermediate_cache(False)
+
+    def test_deep_dag(self):
+        X = sml.matrix(m1)
+        m = X
+        for i in range(5000):
+            m = m*0.5 + X
+        script = sml.eval([m], execute=False)
+        self.assertEqual(script.count('* 0.5'), 5000)
+
+    def test_eval_policy(self):
+        sml.set_eval_policy(max_nodes=10)
+        try:
+            X = sml.matrix(m1)
+            m, expected = X, m1
+            for i in range(25):
+                m = m*0.5 + X
+                expected = expected*0.5 + m1
+            self.assertTrue(sml.eval([m], execute=False).count('* 0.5') <= 5)
+            self.assertTrue(np.allclose(m, expected))
+        finally:
+            sml.set_eval_policy()
+
+    def test_static_shape(self):
+        X = sml.matrix(np.ones((3, 4)))
+        Y = sml.matrix(np.ones((4, 2)))
+        self.assertEqual((X.dot(Y) + 1).shape, (3, 2))
+        self.assertEqual(X.transpose().sum(axis=0).shape, (1, 3))
+        self.assertEqual(X[1:3,].hstack(X[0:2,]).shape, (2, 8))
+        self.assertEqual(sml.seq(1, 10).vstack(sml.full((2, 1), 0)).shape, (12, 1))
+        self.assertEqual((X.dot(Y) + 1).toNumPy().shape, (3, 2))
+
+    def test_static_shape_mismatch(self):
+        X = sml.matrix(np.ones((3, 4)))
+        with self.assertRaises(ValueError):
+            X.dot(X)
+        with self.assertRaises(ValueError):
+            X + X.transpose()
+        with self.assertRaises(IndexError):
+            X[3, 0]
+
+    def test_eval_async(self):
+        X = sml.matrix(m1)
+        A = X.dot(X)
+        future = A.eval_async()
+        B = A + 1
+        self.assertTrue(np.allclose(B, m1.dot(m1) + 1))
+        self.assertTrue(future.result() is A)
+        self.assertTrue(np.allclose(A, m1.dot(m1)))
+
+    def test_evaluation_context(self):
+        from multiprocessing.pool import ThreadPool
+        def compute(i):
+            X = sml.matrix(m1 + i)
+            return (X.dot(X) + i).toNumPy()
+        pool = ThreadPool(4)
+        try:
+            results = pool.map(compute, range(8))
+        finally:
+            pool.close()
+        for i in range(8):
+            self.assertTrue(np.allclose(results[i], (m1 + i).dot(m1 + i) + i))
+        with sml.EvaluationContext():
+            X = sml.matrix(m1)
+            self.assertTrue(np.allclose(X + 1, m1 + 1))
+
+    def test_evaluation_context_shared_input(self):
+        from multiprocessing.pool import ThreadPool
+        X = sml.matrix(m1)
+        def compute(i):
+            A = X.transpose().dot(X) + 1
+            return (A * 1 + 0).sum(axis=0).toNumPy()
+        pool = ThreadPool(4)
+        try:
+            results = pool.map(compute, range(16))
+        finally:
+            pool.close()
+        for ret in results:
+            self.assertTrue(np.allclose(ret, (m1.T.dot(m1) + 1).sum(axis=0)))
+        with sml.EvaluationContext():
+            self.assertTrue('dot(' in sml.eval([X.transpose().dot(X)], execute=False))
+
+    def test_input_cache(self):
+        sml.set_input_cache(True)
+        try:
+            X = sml.matrix(m1)
+            self.assertTrue(np.allclose(X + 1, m1 + 1))
+            mb = sml.matrix.input_blocks.get(X.ID)[1]
+            self.assertTrue(np.allclose(X * 2, m1 * 2))
+            self.assertTrue(sml.matrix.input_blocks.get(X.ID)[1] is mb)
+            X.release()
+            self.assertTrue(X.ID not in sml.matrix.input_blocks)
+        finally:
+            sml.set_input_cache(False)
+
+    def test_input_cache_inplace_update(self):
+        # Without the input cache (default) as well as with verified inputs, in-place modifications are visible
+        for verify in [ None, True ]:
+            if verify:
+                sml.set_input_cache(True, verify=True)
+            try:
+                a = m1.copy()
+                X = sml.matrix(a)
+                self.assertTrue(np.allclose(X + 1, a + 1))
+                a[0, 0] = 5
+                self.assertTrue(np.allclose(X + 1, a + 1))
+            finally:
+                sml.set_input_cache(False)
+
+    def test_setitem_coalesced(self):
+        expected = np.zeros((100, 5))
+        Z = sml.matrix(expected.copy())
+        for i in range(100):
+            Z[i, i % 5] = i + 1
+            expected[i, i % 5] = i + 1
+        for i in range(10, 20):
+            Z[i,] = np.arange(5)
+            expected[i,] = np.arange(5)
+        script = sml.eval([Z], execute=False)
+        self.assertEqual(script.count('ifelse('), 1)
+        self.assertEqual(script.count('] = '), 1)
+        self.assertTrue(np.allclose(Z, expected))
+
+    def test_setitem_cached_intermediate(self):
+        import gc
+        sml.set_intermediate_cache(True)
+        try:
+            expected = np.zeros((dim, dim))
+            Z = sml.matrix(expected.copy())
+            Z[0, 0] = expected[0, 0] = 1
+            A = Z + 1
+            B = Z * 2
+            self.assertTrue(np.allclose(A, expected + 1))
+            self.assertTrue(Z.ID in sml.matrix.intermediates)
+            del A, B
+            gc.collect()
+            Z[1, 1] = expected[1, 1] = 2
+            self.assertTrue(np.allclose(Z, expected))
+        finally:
+            sml.set_intermediate_cache(False)
+
+    def test_sparse_output(self):
+        X = np.zeros((100, 50))
+        X[np.arange(100), np.arange(100) % 50] = np.arange(100) + 1
+        Y = sml.matrix(X) * 2
+        ret = Y.toSciPy()
+        self.assertTrue(isinstance(ret, csr_matrix))
+        self.assertEqual(ret.nnz, 100)
+        self.assertTrue(np.allclose(ret.toarray(), X * 2))
+        self.assertTrue(isinstance((sml.matrix(X) + 1).fetch(), np.ndarray))
+        self.assertTrue(isinstance((sml.matrix(X) * 3).fetch(), csr_matrix))
+
+    def test_numpy_protocols(self):
+        X = sml.matrix(m1)
+        for ret in [np.exp(X), np.add(X, 1), np.add(1, X), np.add.reduce(X, axis=0), np.maximum.reduce(X, axis=1), np.add.accumulate(X),
+                    np.dot(X, X), np.hstack([X, m1]), np.vstack((X, X)), np.sum(X), np.mean(X, axis=1), np.transpose(X)]:
+            self.assertTrue(isinstance(ret, sml.matrix))
+        self.assertTrue(np.allclose(np.exp(X), np.exp(m1)))
+        self.assertTrue(np.allclose(np.add.reduce(X, axis=0), m1.sum(axis=0)))
+        self.assertTrue(np.allclose(np.add.accumulate(X), np.cumsum(m1, axis=0)))
+        self.assertTrue(np.allclose(np.hstack([X, m1]), np.hstack([m1, m1])))
+        self.assertTrue(np.allclose(np.mean(X, axis=1), m1.mean(axis=1).reshape(-1, 1)))
+        self.assertTrue(np.allclose(np.transpose(X), m1.T))
+
+    def test_simplifier(self):
+        X = sml.matrix(m1)
+        A = ((X * 1 + 0) * 2) * 3
+        B = (X + 1) - 3
+        C = X.transpose().transpose()
+        D = X[1:4, 1:][1:, 0:2]
+        script = sml.eval([A, B, C, D], execute=False)
+        self.assertTrue(X.ID + ' * 6' in script)
+        self.assertTrue(X.ID + ' - 2' in script)
+        self.assertTrue('transpose' not in script)
+        self.assertTrue(X.ID + '[2:4,1:3]' in script)
+        self.assertTrue(np.allclose(A, m1 * 6))
+        self.assertTrue(np.allclose(B, m1 - 2))
+        self.assertTrue(np.allclose(C, m1))
+        self.assertTrue(np.allclose(D, m1[2:4, 1:3]))
+
+    def test_nested_expressions(self):
+        X = sml.matrix(m1)
+        v = sml.matrix(np.ones((dim, 1)))
+        w = X.transpose().dot(X.dot(v))
+        script = sml.eval([w], execute=False)
+        self.assertTrue(w.ID + ' = dot(transpose(' + X.ID + '), dot(' + X.ID + ', ' + v.ID + '))' in script)
+        self.assertTrue(np.allclose(w, m1.T.dot(m1.dot(np.ones((dim, 1))))))
+        H = X + 1
+        A = H * 2 + H
+        self.assertTrue(H.ID + ' = ' in sml.eval([A], execute=False))
+        self.assertTrue(np.allclose(A, (m1 + 1) * 3))
+
+    def test_matmul_chain(self):
+        a, b, c = np.random.rand(40, 20), np.random.rand(20, 30), np.random.rand(30, 1)
+        A, B, v = sml.matrix(a), sml.matrix(b), sml.matrix(c)
+        w = A.dot(B).dot(v)
+        script = sml.eval([w], execute=False)
+        self.assertTrue('dot(' + A.ID + ', dot(' + B.ID + ', ' + v.ID + '))' in script)
+        self.assertTrue(np.allclose(w, a.dot(b).dot(c)))
+
+    def test_iter_row_blocks(self):
+        X = np.random.rand(100, 5)
+        blocks = list((sml.matrix(X) * 2).iter_row_blocks(block_size=30))
+        self.assertEqual([ block.shape for block in blocks ], [ (30, 5) ]*3 + [ (10, 5) ])
+        self.assertTrue(np.allclose(np.vstack(blocks), X * 2))
+        S = np.zeros((100, 50))
+        S[np.arange(100), np.arange(100) % 50] = 1
+        blocks = list((sml.matrix(S) * 2).iter_row_blocks(block_size=40, format='scipy', prefetch=0))
+        self.assertTrue(all(isinstance(block, csr_matrix) for block in blocks))
+        self.assertTrue(np.allclose(np.vstack([ block.toarray() for block in blocks ]), S * 2))
+        df = (sml.matrix(X) + 1).toDF()
+        blocks = list(sml.matrix(df).iter_row_blocks(block_size=30))
+        self.assertEqual([ block.shape for block in blocks ], [ (30, 5) ]*3 + [ (10, 5) ])
+        self.assertTrue(np.allclose(np.vstack(blocks), X + 1))
+
+    def test_scalar(self):
+        X = sml.matrix(m1)
+        s = X.sum()
+        self.assertTrue(isinstance(s, sml.scalar))
+        self.assertTrue(isinstance((s / dim - 1) ** 2 < 1e-6, sml.scalar))
+        self.assertFalse(isinstance(X / s, sml.scalar))
+        self.assertTrue('save(' + s.ID not in sml.eval([X / s], execute=False))
+        self.assertAlmostEqual(float(s), m1.sum())
+        self.assertAlmostEqual(s.item(), m1.sum())
+        self.assertEqual(s.toNumPy().shape, (1, 1))
+        self.assertTrue(np.allclose(X / s, m1 / m1.sum()))
+        self.assertTrue(X.mean() > 1)
+        self.assertAlmostEqual(float(X.trace() * 2), 2 * np.trace(m1))
+        self.assertEqual('{:.3f}'.format(X.max()), '{:.3f}'.format(m1.max()))
+
+    def test_loops(self):
+        X = sml.matrix(m1)
+        w0 = sml.matrix(np.ones((dim, 1)))
+        def script(n):
+            w = sml.for_loop(n, lambda i, w: w - 0.001 * X.transpose().dot(X.dot(w)), w0)
+            return sml.eval([w], execute=False)
+        self.assertEqual(script(1000).count('for ('), 1)
+        self.assertTrue(abs(len(script(1000)) - len(script(10))) < 20)
+        expected = np.ones((dim, 1))
+        for i in range(10):
+            expected = expected - 0.001 * m1.T.dot(m1.dot(expected))
+        self.assertTrue(np.allclose(sml.for_loop(10, lambda i, w: w - 0.001 * X.transpose().dot(X.dot(w)), w0), expected))
+        def predict(i, R):
+            R[i,] = X[i,].sum()
+            return R
+        R = sml.for_loop(dim, predict, sml.full((dim, 1), 0), parallel=True)
+        self.assertTrue('parfor (' in sml.eval([R], execute=False))
+        self.assertTrue(np.allclose(R, m1.sum(axis=1).reshape(-1, 1)))
+        w, k = sml.while_loop(lambda w, k: w.sum() < 100, lambda w, k: (w * 2, k + 1), (w0, 0))
+        self.assertEqual(sml.eval([w, k], execute=False).count('while ('), 1)
+        self.assertEqual(int(k), 5)
+        self.assertTrue(np.allclose(w, np.full((dim, 1), 32)))
+        # Lazy trip counts <= 0 execute no iteration
+        for n in [ X.sum() * 0, X.sum() * 0 - 3 ]:
+            k = sml.for_loop(n, lambda i, k: k + 1, 0)
+            self.assertEqual(int(k), 0)
+        self.assertRaises(ValueError, sml.for_loop, 2, lambda i, w: w.toNumPy(), w0)
+        self.assertRaises(ValueError, sml.for_loop, 2, lambda i, w: X, w0)
+
+    def test_function(self):
+        calls = []
+        @sml.function
+        def normalize(X, scale):
+            calls.append(X)
+            return (X - X.mean(axis=0)) * scale
+        X = sml.matrix(m1)
+        Y = sml.matrix(m1 + 1)
+        Z = normalize(X, 2) + normalize(Y, 3)
+        script = sml.eval([Z], execute=False)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(script.count('def '), 1)
+        self.assertEqual(script.count('mean('), 1)
+        expected = (m1 - m1.mean(axis=0)) * 5
+        self.assertTrue(np.allclose(Z, expected))
+        self.assertTrue(np.allclose(normalize(sml.matrix(m1), 5), expected))
+        self.assertEqual(len(calls), 1)
+        normalize(sml.matrix(np.ones((dim, 1))), 1)
+        self.assertEqual(len(calls), 2)
+        @sml.function
+        def moments(X):
+            return X.mean(), X.var()
+        mean, var = moments(X)
+        self.assertTrue(isinstance(mean, sml.scalar))
+        self.assertAlmostEqual(float(mean), m1.mean())
+        self.assertAlmostEqual(float(var), np.var(m1, ddof=1))
+
+    def test_estimate(self):
+        X = sml.matrix(csr_matrix(np.eye(1000)))
+        m = X.transpose().dot(X) + 1
+        est = m.estimate(budget=1024*1024*1024)
+        nodes = est['nodes']
+        self.assertEqual(list(nodes['operation']), [ 'input', 'transpose', 'dot', '+' ])
+        self.assertTrue(nodes['sparse_bytes'][X.ID] < nodes['dense_bytes'][X.ID])
+        self.assertEqual(nodes['output_bytes'][X.ID], nodes['sparse_bytes'][X.ID])
+        self.assertEqual(est['output_bytes'], 8*1000*1000 + 44)
+        self.assertEqual(est['exec_type'], 'CP')
+        self.assertTrue(est['peak_bytes'] >= est['output_bytes'])
+        self.assertEqual(m.estimate(budget=1024*1024)['exec_type'], 'SPARK')
+        self.assertEqual(m.sum().estimate(budget=1024*1024*1024)['output_bytes'], 8)
+
+    def test_profile(self):
+        with sml.profile() as p:
+            X = sml.matrix(m1)
+            Y = (X.dot(X.transpose()) + 1).sum(axis=0)
+            self.assertTrue(np.allclose(Y.toNumPy(), (m1.dot(m1.T) + 1).sum(axis=0)))
+        report = p.report()
+        self.assertTrue(report['time'].is_monotonic_decreasing)
+        self.assertTrue(any('test_matrix_dag.py' in x for x in report.index.get_level_values('location')))
+        self.assertTrue(any('ba+*' in x for x in report['instructions']))
+
+    def test_memory_release(self):
+        import gc
+        import resource
+        import weakref
+        X = sml.matrix(m1)
+        A = X + 1
+        B = A * 2
+        ref = weakref.ref(A)
+        del A
+        self.assertTrue(np.allclose(B, (m1 + 1) * 2))
+        gc.collect()
+        self.assertTrue(ref() is None)
+        def evaluate(n):
+            for i in range(n):
+                Y = sml.matrix(np.full((dim, dim), float(i)))
+                self.assertEqual((Y * 2 + 1).sum().toNumPy()[0, 0], (2*i + 1) * dim * dim)
+        def assertFlatMemory(warmup, n):
+            evaluate(warmup)
+            gc.collect()
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            evaluate(n)
+            gc.collect()
+            # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+            growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+            self.assertTrue(growth < (10*1024*1024 if sys.platform == 'darwin' else 10*1024))
+        # Default evaluation via MLContext (each script is compiled, hence fewer iterations)
+        assertFlatMemory(200, 2000)
+        sml.set_plan_cache(True)
+        sml.set_input_cache(True)
+        try:
+            assertFlatMemory(1000, 10000)
+            self.assertTrue(len(sml.matrix.input_blocks) < 10)
+        finally:
+            sml.set_plan_cache(False)
+            sml.set_input_cache(False)
+
+if __name__ == "__main__":
+    unittest.main()
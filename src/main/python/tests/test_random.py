@@ -0,0 +1,95 @@
+#-------------------------------------------------------------
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#-------------------------------------------------------------
+
+# To run:
+#   - Python 2: `PYSPARK_PYTHON=python2 spark-submit --master local[*] --driver-class-path SystemML.jar test_random.py`
+#   - Python 3: `PYSPARK_PYTHON=python3 spark-submit --master local[*] --driver-class-path SystemML.jar test_random.py`
+
+# Make the `systemml` package importable
+import os
+import sys
+path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../")
+sys.path.insert(0, path)
+
+import unittest
+import systemml as sml
+import numpy as np
+from systemml import random
+from pyspark.context import SparkContext
+sc = SparkContext.getOrCreate()
+
+size = (2000, 50)
+mu = np.linspace(1, 10, size[1]).reshape(1, size[1])
+
+class TestRandom(unittest.TestCase):
+
+    def test_seed(self):
+        m1 = sml.random.normal(size=(10, 10), seed=7).toNumPy()
+        m2 = sml.random.normal(size=(10, 10), seed=7).toNumPy()
+        m3 = sml.random.normal(size=(10, 10), seed=8).toNumPy()
+        self.assertTrue(np.allclose(m1, m2))
+        self.assertFalse(np.allclose(m1, m3))
+
+    def test_matrix_valued_normal(self):
+        m = sml.random.normal(loc=sml.matrix(mu), scale=0.1, size=size, seed=1).toNumPy()
+        self.assertTrue(np.allclose(m.mean(axis=0), mu.ravel(), atol=0.05))
+
+    def test_matrix_valued_poisson(self):
+        m = sml.random.poisson(lam=sml.matrix(mu), size=size, seed=2).toNumPy()
+        self.assertTrue(np.all(m == np.round(m)))
+        self.assertTrue(np.allclose(m.mean(axis=0), mu.ravel(), rtol=0.15))
+
+    def test_binomial(self):
+        m = sml.random.binomial(20, 0.7, size=size, seed=3).toNumPy()
+        self.assertTrue(np.all((m >= 0) & (m <= 20)))
+        self.assertTrue(np.allclose(m.mean(), 14, rtol=0.02))
+        self.assertTrue(np.allclose(m.var(), 4.2, rtol=0.1))
+
+    def test_exponential(self):
+        m = sml.random.exponential(scale=2.0, size=size, seed=4).toNumPy()
+        self.assertTrue(np.all(m >= 0))
+        self.assertTrue(np.allclose(m.mean(), 2.0, rtol=0.05))
+
+    def test_categorical(self):
+        p = [0.2, 0.3, 0.5]
+        m = sml.random.categorical(p, size=size, seed=5).toNumPy()
+        self.assertTrue(np.allclose(np.bincount(m.astype(int).ravel(), minlength=3) / float(m.size), p, atol=0.02))
+        rows = np.array([[1.0, 0.0], [0.0, 1.0]])
+        self.assertTrue(np.array_equal(sml.random.categorical(sml.matrix(rows), size=(2, 5)).toNumPy(), np.array([[0.0]*5, [1.0]*5])))
+
+    def test_batch(self):
+        ms1 = [ m.toNumPy() for m in sml.random.batch(sml.random.uniform, 3, seed=11, size=(5, 5)) ]
+        ms2 = [ m.toNumPy() for m in sml.random.batch(sml.random.uniform, 3, seed=11, size=(5, 5)) ]
+        self.assertTrue(all(np.allclose(x, y) for x, y in zip(ms1, ms2)))
+        self.assertFalse(np.allclose(ms1[0], ms1[1]))
+
+    def test_eval_policy(self):
+        # Unseeded draws are never shared, and the size of the sampled matrices counts toward the evaluation policy
+        self.assertEqual(sml.eval([sml.random.uniform(size=(5, 5)) + sml.random.uniform(size=(5, 5))], execute=False).count('rand('), 2)
+        sml.set_eval_policy(max_memory=1024)
+        try:
+            m = sml.random.normal(size=(100, 100), seed=1)
+            self.assertTrue(m.eval_data is not None)
+        finally:
+            sml.set_eval_policy()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -66,6 +66,21 @@ public class PythonTestRunner extends AutomatedTestBase
 		runPythonTest("test_matrix_agg_fn.py");
 	}
 	
+	@Test
+	public void testMatrixDAG() throws IOException, InterruptedException  {
+		runPythonTest("test_matrix_dag.py");
+	}
+	
+	@Test
+	public void testLinalg() throws IOException, InterruptedException  {
+		runPythonTest("test_linalg.py");
+	}
+	
+	@Test
+	public void testRandom() throws IOException, InterruptedException  {
+		runPythonTest("test_random.py");
+	}
+	
 	@Test
 	public void testMLLearn_df() throws IOException, InterruptedException  {
 		runPythonTest("test_mllearn_df.py");